@@ -0,0 +1,129 @@
+"""
+async_endpoints.py - requests per second of one worker, sync versus async database access
+-----------------------------------------------------------------------------------------
+Serves the resale marketplace query (one page of resale_listings, like
+GET /resale/marketplace) from a single event loop in three ways, and drives
+each with --concurrency clients for --seconds:
+
+- blocking:   async def endpoint on a sync session, as the hot endpoints used
+              to be; every query stalls the event loop, requests run one by one
+- threadpool: def endpoint on a sync session; FastAPI runs it in its thread
+              pool (40 threads), which bounds the requests in flight
+- async:      async def endpoint on the asyncpg session (get_async_db); the
+              loop overlaps the database waits of all requests, bounded by the
+              connection pool
+
+Each request first waits --db-latency-ms in the database (pg_sleep), standing
+in for the network round trip and query time of a real deployment. Both
+engines are the service's own, so DB_POOL_SIZE and DB_MAX_OVERFLOW apply;
+with the defaults at most 15 requests hold a connection at once. Nothing is
+written. Database settings are read the same way as the events service
+(DB_URL, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD).
+
+Run with:
+    python backend/benchmarks/async_endpoints.py --concurrency 100 --seconds 10 --db-latency-ms 5
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+# Make the events service importable regardless of the working directory. The imports below
+# depend on it, hence their noqa: E402.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "event_ticketing_service"))
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import async_engine, engine, get_async_db, get_db  # noqa: E402
+from app.models.ticket import TicketModel  # noqa: E402, F401 - resolves the models' relationships
+from app.models.ticket_type import TicketTypeModel  # noqa: E402, F401
+from app.models.ticket_type_shard import TicketTypeShardModel  # noqa: E402, F401
+from app.repositories.resale_listing_repository import (  # noqa: E402
+    AsyncResaleListingRepository, ResaleListingRepository
+)
+
+VARIANTS = ["blocking", "threadpool", "async"]
+
+_LATENCY_SQL = text("SELECT pg_sleep(:seconds)")
+
+
+def build_app(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking(db: Session = Depends(get_db)):
+        db.execute(_LATENCY_SQL, {"seconds": latency})
+        listings, _ = ResaleListingRepository(db).search(page=1, limit=20)
+        return len(listings)
+
+    @app.get("/threadpool")
+    def threadpool(db: Session = Depends(get_db)):
+        db.execute(_LATENCY_SQL, {"seconds": latency})
+        listings, _ = ResaleListingRepository(db).search(page=1, limit=20)
+        return len(listings)
+
+    @app.get("/async")
+    async def native(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(_LATENCY_SQL, {"seconds": latency})
+        listings, _ = await AsyncResaleListingRepository(db).search(page=1, limit=20)
+        return len(listings)
+
+    return app
+
+
+async def drive(client: httpx.AsyncClient, path: str, concurrency: int, seconds: float):
+    """Runs concurrency clients in a loop for seconds, returns (requests per second, latencies in ms)"""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return len(latencies) / (time.perf_counter() - started), latencies
+
+
+async def run(args) -> None:
+    transport = httpx.ASGITransport(app=build_app(args.db_latency_ms / 1000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for variant in VARIANTS:
+            # Warm up the pool and the statement caches
+            await drive(client, f"/{variant}", args.concurrency, 1)
+
+        print(f"{args.concurrency} concurrent clients, {args.seconds:.0f}s per variant, "
+              f"{args.db_latency_ms:.1f} ms database latency, one worker")
+        print(f"{'variant':>10} | {'req/s':>8} | {'p50 ms':>8} | {'p99 ms':>8}")
+        print("-" * 44)
+        for variant in VARIANTS:
+            throughput, latencies = await drive(client, f"/{variant}", args.concurrency, args.seconds)
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{variant:>10} | {throughput:>8.0f} | {statistics.median(latencies):>8.1f} | {p99:>8.1f}")
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=100, help="Concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10, help="Measured duration per variant")
+    parser.add_argument("--db-latency-ms", type=float, default=5, help="Simulated database latency per request")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
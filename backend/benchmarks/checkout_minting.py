@@ -0,0 +1,116 @@
+"""
+checkout_minting.py - Ticket minting latency vs. cart quantity
+--------------------------------------------------------------
+Compares the two ways checkout has persisted the tickets of a cart:
+
+- legacy: one TicketModel per unit added to the session, then one refresh
+  (SELECT) per ticket after commit to learn its ID
+- bulk:   CartRepository._mint_tickets, a single multi-row INSERT ... RETURNING
+
+Everything runs inside an outer transaction that is rolled back at the end,
+so the benchmark leaves no tickets behind. Database settings are read the
+same way as the events service (DB_URL, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD).
+
+Run with:
+    python backend/benchmarks/checkout_minting.py --type-id 1 --quantities 1,2,5,10,20,50 --repeat 20
+"""
+
+import sys
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# Make the events service importable regardless of the working directory. The imports below
+# depend on it, hence their noqa: E402.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "event_ticketing_service"))
+
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.models.ticket import TicketModel  # noqa: E402
+from app.models.ticket_type import TicketTypeModel  # noqa: E402
+from app.repositories.cart_repository import CartRepository  # noqa: E402
+
+BENCH_OWNER_ID = -1  # Never a real customer, makes leftovers easy to spot if a run is interrupted
+
+
+def mint_legacy(session: Session, type_id: int, quantity: int) -> List[int]:
+    tickets = []
+    for _ in range(quantity):
+        ticket = TicketModel(type_id=type_id, owner_id=BENCH_OWNER_ID, seat=None, resell_price=None)
+        session.add(ticket)
+        tickets.append(ticket)
+    session.commit()
+    for ticket in tickets:
+        session.refresh(ticket)
+    return [ticket.ticket_id for ticket in tickets]
+
+
+def mint_bulk(session: Session, type_id: int, quantity: int) -> List[int]:
+    tickets_info = [{"type_id": type_id, "seat": None} for _ in range(quantity)]
+    CartRepository(session)._mint_tickets(tickets_info, BENCH_OWNER_ID)
+    session.commit()
+    return [info["ticket_id"] for info in tickets_info]
+
+
+def measure(
+    strategy: Callable[[Session, int, int], List[int]], type_id: int, quantity: int, repeat: int
+) -> List[float]:
+    timings = []
+    with engine.connect() as connection:
+        outer = connection.begin()
+        # Session commits become savepoint releases; the outer rollback discards all rows.
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                ids = strategy(session, type_id, quantity)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert len(ids) == quantity and all(ids), "Every minted ticket must have an ID"
+        finally:
+            session.close()
+            outer.rollback()
+    return timings
+
+
+def p95(samples: List[float]) -> float:
+    """95th percentile (nearest rank) of sorted samples"""
+    return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--type-id", type=int, default=None, help="Ticket type to mint against (default: first one)")
+    parser.add_argument("--quantities", default="1,2,5,10,20,50", help="Comma-separated cart quantities")
+    parser.add_argument("--repeat", type=int, default=20, help="Samples per quantity and strategy")
+    args = parser.parse_args()
+
+    type_id = args.type_id
+    if type_id is None:
+        with Session(engine) as session:
+            type_id = session.query(TicketTypeModel.type_id).order_by(TicketTypeModel.type_id).limit(1).scalar()
+        if type_id is None:
+            raise SystemExit("No ticket types found, seed the database or pass --type-id")
+
+    quantities = [int(q) for q in args.quantities.split(",")]
+
+    print(f"Minting against ticket type {type_id}, {args.repeat} samples per cell (times in ms)")
+    print(
+        f"{'quantity':>8} | {'legacy p50':>10} | {'legacy p95':>10} | "
+        f"{'bulk p50':>10} | {'bulk p95':>10} | {'speedup':>7}"
+    )
+    print("-" * 72)
+    for quantity in quantities:
+        legacy = sorted(measure(mint_legacy, type_id, quantity, args.repeat))
+        bulk = sorted(measure(mint_bulk, type_id, quantity, args.repeat))
+        legacy_p50, bulk_p50 = statistics.median(legacy), statistics.median(bulk)
+        print(
+            f"{quantity:>8} | {legacy_p50:>10.2f} | {p95(legacy):>10.2f} | "
+            f"{bulk_p50:>10.2f} | {p95(bulk):>10.2f} | {legacy_p50 / bulk_p50:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+event_search.py - Event search on a large synthetic catalog
+-----------------------------------------------------------
+Inserts --events synthetic events (100k by default) with generated names and
+descriptions, then times the search behind GET /events?search= against the
+ILIKE search it replaced:
+
+- ilike:     name ILIKE '%q%' OR description ILIKE '%q%' (the old search)
+- search:    app.services.event_search.search_filter, newest first
+- relevance: the same filter, sorted by relevance (sort_by=relevance)
+
+for a few kinds of queries: a whole word, a word prefix, a substring of a
+name, a misspelled name and a word that matches nothing. Each cell is the
+median of --repeat runs of one 50 row page, and whether the plan still has a
+sequential scan on events. The synthetic events are deleted at the end.
+Database settings are read the same way as the events service (DB_URL,
+DB_PORT, DB_NAME, DB_USER, DB_PASSWORD).
+
+Run with:
+    python backend/benchmarks/event_search.py --events 100000 --repeat 5
+
+Pass --events 1000000 to see how the methods scale; seeding that many takes much longer.
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Make the events service importable regardless of the working directory. The imports below
+# depend on it, hence their noqa: E402.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "event_ticketing_service"))
+
+from sqlalchemy import create_engine, or_, text  # noqa: E402
+from sqlalchemy.orm import Session, with_expression  # noqa: E402
+
+from app.database import DATABASE_URL  # noqa: E402
+from app.models.events import EventModel  # noqa: E402
+from app.models.location import LocationModel  # noqa: E402
+from app.models.ticket import TicketModel  # noqa: E402, F401 - resolves EventModel's relationships
+from app.models.ticket_type import TicketTypeModel  # noqa: E402, F401
+from app.models.ticket_type_shard import TicketTypeShardModel  # noqa: E402, F401
+from app.services.event_search import relevance, search_filter  # noqa: E402
+
+BENCH_ORGANIZER_ID = -1  # Never a real organizer, makes leftovers easy to spot if a run is interrupted
+PAGE_SIZE = 50
+
+# Names like "Midnight Jazz Festival 123456", descriptions of eight words drawn from a small vocabulary
+_SEED_SQL = text("""
+    INSERT INTO events (organizer_id, location_id, name, description, start_date, end_date, minimum_age, status)
+    SELECT :organizer_id, :location_id,
+           initcap(a[1 + n % 20] || ' ' || g[1 + (n / 20) % 20] || ' ' || k[1 + (n / 400) % 10]) || ' ' || n,
+           (SELECT string_agg(v[1 + (hashtext(n || '-' || w) & 2147483647) % 40], ' ') FROM generate_series(1, 8) AS w),
+           TIMESTAMP '2030-01-01' + (n % 50000) * INTERVAL '1 hour',
+           TIMESTAMP '2030-01-01' + (n % 50000) * INTERVAL '1 hour' + INTERVAL '2 hours',
+           0, 'created'
+    FROM generate_series(1, :count) AS n,
+         LATERAL (SELECT
+             ARRAY['midnight', 'summer', 'winter', 'grand', 'open', 'royal', 'urban', 'silent', 'golden', 'electric',
+                   'acoustic', 'classic', 'modern', 'wild', 'little', 'northern', 'baltic', 'velvet', 'neon',
+                   'crystal'] AS a,
+             ARRAY['jazz', 'rock', 'opera', 'techno', 'folk', 'comedy', 'ballet', 'poetry', 'film', 'chess',
+                   'football', 'tennis', 'theater', 'blues', 'metal', 'choir', 'circus', 'magic', 'wine',
+                   'design'] AS g,
+             ARRAY['festival', 'night', 'concert', 'show', 'gala', 'tour', 'marathon', 'session', 'cup', 'fair'] AS k,
+             ARRAY['live', 'music', 'stage', 'band', 'crowd', 'tickets', 'evening', 'family', 'outdoor', 'indoor',
+                   'premiere', 'legendary', 'local', 'artists', 'guests', 'food', 'drinks', 'dance', 'lights', 'sound',
+                   'warsaw', 'krakow', 'gdansk', 'poznan', 'wroclaw', 'lodz', 'history', 'future', 'workshop', 'kids',
+                   'students', 'vip', 'acoustic', 'orchestra', 'strings', 'piano', 'drums', 'vocal', 'encore',
+                   'finale'] AS v
+         ) AS words
+""")
+
+QUERIES = [
+    ("word", "jazz"),
+    ("prefix", "orch"),
+    ("substring", "ctric Jaz"),
+    ("misspelled", "Midnihgt Jazz Festivl"),
+    ("no match", "zzyzx"),
+]
+
+
+def ilike_query(session: Session, search: str):
+    pattern = f"%{search}%"
+    return (
+        session.query(EventModel)
+        .filter(or_(EventModel.name.ilike(pattern), EventModel.description.ilike(pattern)))
+        .order_by(EventModel.event_id.desc())
+    )
+
+
+def search_query(session: Session, search: str):
+    return session.query(EventModel).filter(search_filter(search)).order_by(EventModel.event_id.desc())
+
+
+def relevance_query(session: Session, search: str):
+    score = relevance(search)
+    return (
+        session.query(EventModel)
+        .filter(search_filter(search))
+        .options(with_expression(EventModel.relevance, score))
+        .order_by(score.desc(), EventModel.event_id.desc())
+    )
+
+
+def measure(session: Session, query, repeat: int):
+    page = query.limit(PAGE_SIZE)
+    compiled = page.statement.compile(dialect=session.get_bind().dialect)
+    cursor = session.connection().connection.cursor()
+    cursor.execute("EXPLAIN " + str(compiled), compiled.params)
+    plan = "\n".join(row[0] for row in cursor.fetchall())
+    cursor.close()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page.all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), "Seq Scan on events" in plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000, help="Synthetic events to insert")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query and method")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    with Session(engine) as session:
+        location = session.query(LocationModel).order_by(LocationModel.location_id).first()
+        if location is None:
+            raise SystemExit("No locations found, seed the database first")
+
+        started = time.perf_counter()
+        session.execute(_SEED_SQL, {
+            "organizer_id": BENCH_ORGANIZER_ID, "location_id": location.location_id, "count": args.events
+        })
+        session.commit()
+        session.execute(text("ANALYZE events"))
+        session.commit()
+        print(f"Inserted {args.events} events in {time.perf_counter() - started:.1f}s")
+
+        try:
+            print(f"Median of {args.repeat} runs per {PAGE_SIZE} row page, ms (* = sequential scan on events)")
+            print(f"{'query':>10} | {'ilike':>12} | {'search':>12} | {'relevance':>12}")
+            print("-" * 56)
+            for label, search in QUERIES:
+                cells = []
+                for build in (ilike_query, search_query, relevance_query):
+                    ms, seq_scan = measure(session, build(session, search), args.repeat)
+                    cells.append(f"{ms:>11.2f}{'*' if seq_scan else ' '}")
+                print(f"{label:>10} | {' | '.join(cells)}")
+        finally:
+            session.rollback()
+            session.query(EventModel).filter(EventModel.organizer_id == BENCH_ORGANIZER_ID).delete(
+                synchronize_session=False
+            )
+            session.commit()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+inventory_shards.py - Hold + sell throughput of one hot ticket type vs. shard count
+-----------------------------------------------------------------------------------
+Simulates a flash sale on a single ticket type. Every worker thread repeatedly
+runs the inventory part of add-to-cart and checkout, one transaction each:
+
+- hold: reserve 1 unit (InventoryRepository.reserve / reserve_on_shard)
+- sell: turn the hold into a sale (sell_locked / sell_sharded)
+
+--work-ms keeps each transaction open a little longer after its UPDATE, standing
+in for the rest of the request (minting, outbox, cart bookkeeping). That is the
+time the row lock is held, and the time other buyers of the same counter wait.
+
+The benchmark creates a scratch ticket type with a large max_count on the given
+event, runs every shard count against it and deletes it at the end. Database
+settings are read the same way as the events service (DB_URL, DB_PORT, DB_NAME,
+DB_USER, DB_PASSWORD).
+
+Run with:
+    python backend/benchmarks/inventory_shards.py --event-id 1 --shards 1,2,4,8,16 --threads 32 --seconds 10
+"""
+
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+# Make the events service importable regardless of the working directory. The imports below
+# depend on it, hence their noqa: E402.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "event_ticketing_service"))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import DATABASE_URL  # noqa: E402
+from app.models.events import EventModel  # noqa: E402
+from app.models.ticket_type import TicketTypeModel  # noqa: E402
+from app.repositories.inventory_repository import InventoryRepository  # noqa: E402
+
+BENCH_DESCRIPTION = "inventory_shards benchmark"  # Makes leftovers easy to spot if a run is interrupted
+
+
+def worker(engine, type_id: int, shards: int, work_seconds: float, deadline: float, results: List[int],
+           slot: int) -> None:
+    done = 0
+    while time.monotonic() < deadline:
+        with Session(engine) as session:
+            inventory = InventoryRepository(session)
+            if shards > 1:
+                shard = inventory.reserve_on_shard(type_id, 1, shards)
+                held = shard is not None
+            else:
+                shard = None
+                held = inventory.reserve(type_id, 1)
+            if not held:
+                break
+            time.sleep(work_seconds)
+            session.commit()
+
+            if shards > 1:
+                inventory.sell_sharded(type_id, shards, held=1, unheld=0, hold_shard=shard)
+            else:
+                inventory.sell_locked({type_id: (1, 1)})
+            time.sleep(work_seconds)
+            session.commit()
+        done += 1
+    results[slot] = done
+
+
+def run(engine, type_id: int, shards: int, threads: int, seconds: float, work_ms: float) -> float:
+    with Session(engine) as session:
+        # Start every shard count from an empty ticket type
+        session.execute(text("DELETE FROM ticket_type_shards WHERE type_id = :type_id"), {"type_id": type_id})
+        session.execute(
+            text(
+                "UPDATE ticket_types SET sold_count = 0, reserved_count = 0, inventory_shards = 1 "
+                "WHERE type_id = :type_id"
+            ),
+            {"type_id": type_id},
+        )
+        InventoryRepository(session).set_shards(type_id, shards)
+        session.commit()
+
+    results = [0] * threads
+    deadline = time.monotonic() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(engine, type_id, shards, work_ms / 1000, deadline, results, slot))
+        for slot in range(threads)
+    ]
+    started = time.monotonic()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(results) / (time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--event-id", type=int, default=None, help="Event to attach the scratch ticket type to (default: first one)"
+    )
+    parser.add_argument("--shards", default="1,2,4,8,16", help="Comma-separated shard counts")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent buyers")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration per shard count")
+    parser.add_argument("--work-ms", type=float, default=5, help="Time each transaction stays open after its UPDATE")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, pool_size=args.threads, max_overflow=0)
+
+    with Session(engine) as session:
+        event_id = args.event_id
+        if event_id is None:
+            event_id = session.query(EventModel.event_id).order_by(EventModel.event_id).limit(1).scalar()
+        if event_id is None:
+            raise SystemExit("No events found, seed the database or pass --event-id")
+        scratch = TicketTypeModel(
+            event_id=event_id,
+            description=BENCH_DESCRIPTION,
+            max_count=10_000_000,
+            price=0,
+            currency="PLN",
+            available_from=datetime(2000, 1, 1),
+        )
+        session.add(scratch)
+        session.commit()
+        type_id = scratch.type_id
+
+    try:
+        print(f"Scratch ticket type {type_id} on event {event_id}, {args.threads} threads, "
+              f"{args.seconds:g}s per run, {args.work_ms:g} ms of work per transaction")
+        print(f"{'shards':>6} | {'sales/s':>10} | {'speedup':>7}")
+        print("-" * 30)
+        baseline = None
+        for shards in [int(s) for s in args.shards.split(",")]:
+            throughput = run(engine, type_id, shards, args.threads, args.seconds, args.work_ms)
+            baseline = baseline or throughput
+            print(f"{shards:>6} | {throughput:>10.1f} | {throughput / baseline:>6.1f}x")
+    finally:
+        with Session(engine) as session:
+            session.execute(text("DELETE FROM ticket_types WHERE type_id = :type_id"), {"type_id": type_id})
+            session.commit()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
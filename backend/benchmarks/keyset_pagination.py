@@ -0,0 +1,118 @@
+"""
+keyset_pagination.py - OFFSET pages versus cursor pages at increasing depth
+----------------------------------------------------------------------------
+Inserts --events synthetic events, then reads one page of them (sorted by
+start_date, like GET /events) at several depths, twice per depth:
+
+- offset: ?page=N, the database reads and discards every row before the page
+- cursor: ?after=<cursor of the row before the page>, an index range scan that
+  starts at the page
+
+Both go through app.utils.pagination.paginate, the helper behind the list
+endpoints. Offset latency grows with the depth, cursor latency should stay
+flat. The synthetic events are deleted at the end. Database settings are read
+the same way as the events service (DB_URL, DB_PORT, DB_NAME, DB_USER,
+DB_PASSWORD).
+
+Run with:
+    python backend/benchmarks/keyset_pagination.py --events 200000 --limit 50 --repeat 20
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Make the events service importable regardless of the working directory. The imports below
+# depend on it, hence their noqa: E402.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "event_ticketing_service"))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import DATABASE_URL  # noqa: E402
+from app.models.events import EventModel  # noqa: E402
+from app.models.location import LocationModel  # noqa: E402
+from app.models.ticket import TicketModel  # noqa: E402, F401 - resolves EventModel's relationships
+from app.models.ticket_type import TicketTypeModel  # noqa: E402, F401
+from app.models.ticket_type_shard import TicketTypeShardModel  # noqa: E402, F401
+from app.utils.pagination import encode_cursor, paginate  # noqa: E402
+
+BENCH_ORGANIZER_ID = -1  # Never a real organizer, makes leftovers easy to spot if a run is interrupted
+
+_SEED_SQL = text("""
+    INSERT INTO events (organizer_id, location_id, name, description, start_date, end_date, minimum_age, status)
+    SELECT :organizer_id, :location_id, 'Benchmark event ' || n, 'Synthetic event for pagination benchmarks',
+           TIMESTAMP '2030-01-01' + (n % 5000) * INTERVAL '1 hour',
+           TIMESTAMP '2030-01-01' + (n % 5000) * INTERVAL '1 hour' + INTERVAL '2 hours',
+           0, 'created'
+    FROM generate_series(1, :count) AS n
+""")
+
+
+def page_query(session: Session):
+    return session.query(EventModel).filter(EventModel.organizer_id == BENCH_ORGANIZER_ID)
+
+
+def time_page(session: Session, page: int, limit: int, after, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows, _ = paginate(
+            page_query(session), EventModel.start_date, EventModel.event_id, "start_date", "asc", page, limit, after
+        )
+        samples.append((time.perf_counter() - started) * 1000)
+        assert len(rows) == limit
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000, help="Synthetic events to insert")
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed reads per depth and method")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    with Session(engine) as session:
+        location = session.query(LocationModel).order_by(LocationModel.location_id).first()
+        if location is None:
+            raise SystemExit("No locations found, seed the database first")
+        session.execute(_SEED_SQL, {
+            "organizer_id": BENCH_ORGANIZER_ID, "location_id": location.location_id, "count": args.events
+        })
+        session.commit()
+        session.execute(text("ANALYZE events"))
+
+        try:
+            print(f"{args.events} events, {args.limit} per page (median of {args.repeat} reads, ms)")
+            print(f"{'page':>8} | {'offset':>10} | {'cursor':>10}")
+            print("-" * 34)
+            last_page = args.events // args.limit
+            for page in sorted({1, 10, 100, last_page // 10, last_page // 2, last_page} - {0}):
+                if page == 1:
+                    after = None
+                else:
+                    # Cursor a client walking the list would hold right before this page
+                    previous = (
+                        page_query(session)
+                        .order_by(EventModel.start_date, EventModel.event_id)
+                        .offset((page - 1) * args.limit - 1)
+                        .first()
+                    )
+                    after = encode_cursor("start_date", "asc", previous.start_date, previous.event_id)
+                offset_ms = time_page(session, page, args.limit, None, args.repeat)
+                cursor_ms = time_page(session, 1, args.limit, after, args.repeat)
+                print(f"{page:>8} | {offset_ms:>10.2f} | {cursor_ms:>10.2f}")
+        finally:
+            session.rollback()
+            session.query(EventModel).filter(EventModel.organizer_id == BENCH_ORGANIZER_ID).delete(
+                synchronize_session=False
+            )
+            session.commit()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+resale_purchase_race.py - Many buyers racing for the same resale listing
+------------------------------------------------------------------------
+Lists one ticket, then releases --buyers threads at the same instant, each
+trying to buy it with TicketRepository.claim_resale_listing (the conditional
+UPDATE behind POST /resale/purchase) and committing. Exactly one buyer must
+win every round; everyone else must get a clean "lost" answer.
+
+Reported per run:
+- winners per round (must be 1) and conflicts per round
+- p50/p95 latency of the claim + commit, for winners and losers separately;
+  losers wait on the winner's row lock only until it commits
+
+The ticket's owner and listing are restored at the end. Database settings are
+read the same way as the events service (DB_URL, DB_PORT, DB_NAME, DB_USER,
+DB_PASSWORD).
+
+Run with:
+    python backend/benchmarks/resale_purchase_race.py --ticket-id 1 --buyers 50 --rounds 20
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import threading
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Tuple
+
+# Make the events service importable regardless of the working directory. The imports below
+# depend on it, hence their noqa: E402.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "event_ticketing_service"))
+
+from sqlalchemy import create_engine, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import DATABASE_URL  # noqa: E402
+from app.models.ticket import TicketModel  # noqa: E402
+from app.repositories.ticket_repository import TicketRepository  # noqa: E402
+
+BENCH_SELLER_ID = -1  # Never a real customer, makes leftovers easy to spot if a run is interrupted
+BENCH_PRICE = Decimal("100.00")
+
+
+def buyer(engine, ticket_id: int, buyer_id: int, start: threading.Barrier, results: List[Tuple[bool, float]],
+          slot: int) -> None:
+    with Session(engine) as session:
+        start.wait()
+        started = time.perf_counter()
+        ticket = TicketRepository(session).claim_resale_listing(ticket_id, buyer_id, BENCH_SELLER_ID, BENCH_PRICE)
+        session.commit()
+        results[slot] = (ticket is not None, (time.perf_counter() - started) * 1000)
+
+
+def run_round(engine, ticket_id: int, buyers: int) -> List[Tuple[bool, float]]:
+    with Session(engine) as session:
+        session.execute(
+            update(TicketModel)
+            .where(TicketModel.ticket_id == ticket_id)
+            .values(owner_id=BENCH_SELLER_ID, resell_price=BENCH_PRICE)
+        )
+        session.commit()
+
+    results: List[Tuple[bool, float]] = [(False, 0.0)] * buyers
+    start = threading.Barrier(buyers)
+    pool = [
+        threading.Thread(target=buyer, args=(engine, ticket_id, -(slot + 2), start, results, slot))
+        for slot in range(buyers)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results
+
+
+def p95(samples: List[float]) -> float:
+    """95th percentile (nearest rank) of the samples"""
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticket-id", type=int, default=None, help="Ticket to race for (default: first one)")
+    parser.add_argument("--buyers", type=int, default=50, help="Concurrent buyers per round")
+    parser.add_argument("--rounds", type=int, default=20, help="Number of listings raced for")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, pool_size=args.buyers, max_overflow=0)
+
+    with Session(engine) as session:
+        if args.ticket_id:
+            ticket = session.get(TicketModel, args.ticket_id)
+        else:
+            ticket = session.query(TicketModel).order_by(TicketModel.ticket_id).first()
+        if ticket is None:
+            raise SystemExit("No tickets found, seed the database or pass --ticket-id")
+        ticket_id, original_owner, original_price = ticket.ticket_id, ticket.owner_id, ticket.resell_price
+
+    winners, losers, anomalies = [], [], 0
+    try:
+        for _ in range(args.rounds):
+            results = run_round(engine, ticket_id, args.buyers)
+            won = [ms for ok, ms in results if ok]
+            lost = [ms for ok, ms in results if not ok]
+            anomalies += len(won) != 1
+            winners.extend(won)
+            losers.extend(lost)
+    finally:
+        with Session(engine) as session:
+            session.execute(
+                update(TicketModel)
+                .where(TicketModel.ticket_id == ticket_id)
+                .values(owner_id=original_owner, resell_price=original_price)
+            )
+            session.commit()
+        engine.dispose()
+
+    print(f"Ticket {ticket_id}, {args.buyers} buyers x {args.rounds} rounds (times in ms)")
+    print(f"{'outcome':>8} | {'count':>6} | {'p50':>8} | {'p95':>8}")
+    print("-" * 40)
+    for label, samples in (("won", winners), ("conflict", losers)):
+        if samples:
+            print(f"{label:>8} | {len(samples):>6} | {statistics.median(samples):>8.2f} | {p95(samples):>8.2f}")
+    print(f"Rounds without exactly one winner: {anomalies}")
+    if anomalies:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+-- Runs at the end of every db-init run, after the pending migrations (see init.sh).
+
+-- Bump all catalog versions (17_catalog_versions.sql): seed data, a migration or the deploy that
+-- came with this run may have changed the catalog lists, and ETags issued before must not be
+-- answered with a 304. nextval takes no lock.
+SELECT nextval('catalog_version_events'),
+       nextval('catalog_version_ticket_types'),
+       nextval('catalog_version_inventory'),
+       nextval('catalog_version_locations'),
+       nextval('catalog_version_resale');
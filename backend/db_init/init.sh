@@ -1,11 +1,31 @@
 #!/bin/sh
 
-# This script waits for the database to be ready, then applies SQL scripts.
+# This script waits for the database to be ready, then applies the pending migrations.
 # Environment variables like PGPASSWORD, DB_HOST, DB_USER, DB_NAME are expected to be set.
 # A special variable, DB_RESET=true, will trigger a full wipe of the public schema.
+#
+# Migrations are the numbered files in /app/sql, applied once each in order of their number and
+# recorded in schema_migrations with a checksum, so deploys run without DB_RESET. Never edit an
+# applied migration (the run fails on a changed checksum), add a new file instead.
+# - A migration runs in a transaction with lock_timeout set to MIGRATION_LOCK_TIMEOUT (5s): DDL
+#   that cannot get its lock fails fast, instead of queueing every query on the table behind it.
+#   Re-run the task later.
+# - A migration whose first line is "-- migrate:no-transaction" runs statement by statement, as
+#   CREATE INDEX CONCURRENTLY and ADD CONSTRAINT ... NOT VALID followed by VALIDATE CONSTRAINT
+#   need, with the same lock_timeout. Write those to be safe to re-run after a failure.
+# - Runs are serialized with an advisory lock, so two tasks never apply the same migration.
+# - after_migrate.sql runs at the end of every run.
+# A database set up before schema_migrations existed already has migrations 01 to
+# PRE_RUNNER_VERSION, which the previous init.sh ran on every deploy. The first run records them
+# as applied without running them again, as re-running them would lock and rewrite live tables,
+# and applies only the later ones.
 
 set -e
 
+MIGRATION_LOCK_TIMEOUT="${MIGRATION_LOCK_TIMEOUT:-5s}"
+# Last migration that predates this runner
+PRE_RUNNER_VERSION=18
+
 echo "Waiting for database at $DB_HOST:$DB_PORT..."
 until psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -c '\q'; do
   >&2 echo "Postgres is unavailable - sleeping"
@@ -21,10 +41,76 @@ else
   echo "DB_RESET is not set to 'true'. Skipping database wipe."
 fi
 
-# Apply all SQL files in the /sql directory
-for f in /app/sql/*.sql; do
-  echo "Applying SQL file $f..."
-  psql -v ON_ERROR_STOP=1 --host "$DB_HOST" --port "$DB_PORT" --username "$DB_USER" --dbname "$DB_NAME" -f "$f"
+# The whole run is one psql session, which holds the advisory lock until it ends
+PLAN=/tmp/migrate.sql
+cat > "$PLAN" <<'EOF'
+SELECT pg_advisory_lock(hashtext('schema_migrations'));
+SET statement_timeout = 0;
+SELECT to_regclass('schema_migrations') IS NULL AND to_regclass('ticket_types') IS NOT NULL AS pre_runner \gset
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum CHAR(32) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+EOF
+cat >> "$PLAN" <<EOF
+\if :pre_runner
+\echo Database set up before schema_migrations, recording migrations up to $PRE_RUNNER_VERSION as applied...
+EOF
+
+# In order of the version number, not of the name: 100_x.sql runs after 99_x.sql
+MIGRATIONS=$(cd /app/sql && ls *.sql | sort -t_ -k1,1n)
+
+for name in $MIGRATIONS; do
+  version=$(echo "$name" | sed -E 's/^0*([0-9]+)_.*$/\1/')
+  if [ "$version" -le "$PRE_RUNNER_VERSION" ]; then
+    checksum=$(md5sum "/app/sql/$name" | cut -d ' ' -f 1)
+    echo "INSERT INTO schema_migrations (version, name, checksum) VALUES ($version, '$name', '$checksum');" >> "$PLAN"
+  fi
 done
+printf '%s\n' '\endif' >> "$PLAN"
+
+for name in $MIGRATIONS; do
+  f="/app/sql/$name"
+  version=$(echo "$name" | sed -E 's/^0*([0-9]+)_.*$/\1/')
+  checksum=$(md5sum "$f" | cut -d ' ' -f 1)
+  cat >> "$PLAN" <<EOF
+DO \$\$ BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE version = $version AND checksum <> '$checksum') THEN
+        RAISE EXCEPTION 'Migration $name was changed after it was applied';
+    END IF;
+END \$\$;
+SELECT NOT EXISTS (SELECT 1 FROM schema_migrations WHERE version = $version) AS pending \gset
+\if :pending
+\echo Applying migration $name...
+EOF
+  if head -n 1 "$f" | grep -q '^-- migrate:no-transaction'; then
+    cat >> "$PLAN" <<EOF
+SET lock_timeout = '$MIGRATION_LOCK_TIMEOUT';
+\i $f
+RESET lock_timeout;
+INSERT INTO schema_migrations (version, name, checksum) VALUES ($version, '$name', '$checksum');
+\endif
+EOF
+  else
+    cat >> "$PLAN" <<EOF
+BEGIN;
+SET LOCAL lock_timeout = '$MIGRATION_LOCK_TIMEOUT';
+\i $f
+INSERT INTO schema_migrations (version, name, checksum) VALUES ($version, '$name', '$checksum');
+COMMIT;
+\endif
+EOF
+  fi
+done
+
+cat >> "$PLAN" <<'EOF'
+\echo Running after_migrate.sql...
+\i /app/after_migrate.sql
+SELECT pg_advisory_unlock(hashtext('schema_migrations'));
+EOF
+
+psql -v ON_ERROR_STOP=1 --host "$DB_HOST" --port "$DB_PORT" --username "$DB_USER" --dbname "$DB_NAME" -f "$PLAN"
 
 echo "Database initialization complete."
@@ -0,0 +1,51 @@
+-- migrate:no-transaction
+-- Per-ticket-type inventory counter.
+-- Checkout claims tickets with a single conditional UPDATE on this column instead of
+-- counting the tickets table, so the cost of a sale no longer grows with the number sold.
+-- This script is idempotent and safe to re-run against an existing database.
+
+ALTER TABLE ticket_types ADD COLUMN IF NOT EXISTS sold_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill from the tickets that already exist (seed data or pre-counter installations).
+-- Units sold from shards (09_inventory_shards.sql) are counted on ticket_type_shards, and the
+-- totals are ticket_types + SUM(shards), so on a database that has shards they are left out.
+DO $$
+BEGIN
+    IF to_regclass('ticket_type_shards') IS NULL THEN
+        UPDATE ticket_types tt
+        SET sold_count = counts.issued
+        FROM (
+            SELECT ticket_types.type_id, COUNT(tickets.ticket_id) AS issued
+            FROM ticket_types
+            LEFT JOIN tickets ON tickets.type_id = ticket_types.type_id
+            GROUP BY ticket_types.type_id
+        ) AS counts
+        WHERE tt.type_id = counts.type_id
+          AND tt.sold_count <> counts.issued;
+    ELSE
+        UPDATE ticket_types tt
+        SET sold_count = counts.issued
+        FROM (
+            SELECT ticket_types.type_id,
+                   COUNT(tickets.ticket_id) - COALESCE((
+                       SELECT SUM(shards.sold_count)
+                       FROM ticket_type_shards shards
+                       WHERE shards.type_id = ticket_types.type_id
+                   ), 0) AS issued
+            FROM ticket_types
+            LEFT JOIN tickets ON tickets.type_id = ticket_types.type_id
+            GROUP BY ticket_types.type_id
+        ) AS counts
+        WHERE tt.type_id = counts.type_id
+          AND tt.sold_count <> counts.issued;
+    END IF;
+END $$;
+
+ALTER TABLE ticket_types DROP CONSTRAINT IF EXISTS chk_ticket_types_sold_count;
+-- Added NOT VALID, which only needs a brief lock, then validated in a statement of its own: the
+-- scan of the existing rows holds SHARE UPDATE EXCLUSIVE, so reads and writes carry on. The file
+-- runs statement by statement (directive above), or the ADD's ACCESS EXCLUSIVE lock would be
+-- held through the scan until the end of the transaction.
+ALTER TABLE ticket_types ADD CONSTRAINT chk_ticket_types_sold_count
+    CHECK (sold_count >= 0 AND sold_count <= max_count) NOT VALID;
+ALTER TABLE ticket_types VALIDATE CONSTRAINT chk_ticket_types_sold_count;
@@ -0,0 +1,22 @@
+-- Transactional outbox for outgoing emails.
+-- Rows are written in the same transaction as the tickets they describe and are
+-- delivered asynchronously by the email worker (event_ticketing_service/email_worker.py).
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    outbox_id SERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL, -- 'ticket_confirmation'
+    recipient VARCHAR(255) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- 'pending', 'sent', 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+-- The worker only ever polls pending rows that are due, keep that scan small.
+CREATE INDEX IF NOT EXISTS idx_email_outbox_pending
+    ON email_outbox (next_attempt_at)
+    WHERE status = 'pending';
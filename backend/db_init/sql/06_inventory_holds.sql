@@ -0,0 +1,62 @@
+-- migrate:no-transaction
+-- Time-boxed inventory holds.
+-- Adding a ticket type to the cart reserves units on ticket_types.reserved_count and records
+-- the hold on the cart line. Checkout converts the hold into sold_count, and the sweeper in
+-- the events service hands expired holds back in bulk.
+-- This script is idempotent and safe to re-run against an existing database.
+
+ALTER TABLE ticket_types ADD COLUMN IF NOT EXISTS reserved_count INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE cart_items ADD COLUMN IF NOT EXISTS held_quantity INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE cart_items ADD COLUMN IF NOT EXISTS hold_expires_at TIMESTAMP;
+
+-- Backfill from the holds recorded on cart lines, so the counter is exact after a re-run.
+-- Lines holding units on a shard (hold_shard, 09_inventory_shards.sql) are counted on
+-- ticket_type_shards instead, so on a database that has shards only the others are summed.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'cart_items' AND column_name = 'hold_shard'
+    ) THEN
+        UPDATE ticket_types tt
+        SET reserved_count = holds.held
+        FROM (
+            SELECT ticket_types.type_id, COALESCE(SUM(cart_items.held_quantity), 0) AS held
+            FROM ticket_types
+            LEFT JOIN cart_items ON cart_items.ticket_type_id = ticket_types.type_id
+            GROUP BY ticket_types.type_id
+        ) AS holds
+        WHERE tt.type_id = holds.type_id
+          AND tt.reserved_count <> holds.held;
+    ELSE
+        UPDATE ticket_types tt
+        SET reserved_count = holds.held
+        FROM (
+            SELECT ticket_types.type_id, COALESCE(SUM(cart_items.held_quantity), 0) AS held
+            FROM ticket_types
+            LEFT JOIN cart_items ON cart_items.ticket_type_id = ticket_types.type_id
+                                AND cart_items.hold_shard IS NULL
+            GROUP BY ticket_types.type_id
+        ) AS holds
+        WHERE tt.type_id = holds.type_id
+          AND tt.reserved_count <> holds.held;
+    END IF;
+END $$;
+
+-- Checks are validated after they are added, as in 04_inventory.sql, so checking the existing
+-- rows does not block writes to them.
+ALTER TABLE ticket_types DROP CONSTRAINT IF EXISTS chk_ticket_types_reserved_count;
+ALTER TABLE ticket_types ADD CONSTRAINT chk_ticket_types_reserved_count
+    CHECK (reserved_count >= 0 AND sold_count + reserved_count <= max_count) NOT VALID;
+ALTER TABLE ticket_types VALIDATE CONSTRAINT chk_ticket_types_reserved_count;
+
+ALTER TABLE cart_items DROP CONSTRAINT IF EXISTS chk_cart_items_held_quantity;
+ALTER TABLE cart_items ADD CONSTRAINT chk_cart_items_held_quantity
+    CHECK (held_quantity >= 0 AND held_quantity <= quantity) NOT VALID;
+ALTER TABLE cart_items VALIDATE CONSTRAINT chk_cart_items_held_quantity;
+
+-- The sweeper only looks at lines that still hold inventory.
+CREATE INDEX IF NOT EXISTS idx_cart_items_hold_expires_at
+    ON cart_items (hold_expires_at)
+    WHERE held_quantity > 0;
@@ -0,0 +1,19 @@
+-- Virtual waiting rooms for high-demand on-sales.
+-- An organizer can put an event behind a waiting room. Clients join the queue and receive a
+-- signed token carrying their position; the events service admits positions to the cart and
+-- checkout endpoints at admission_rate_per_minute, counted from opens_at.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE TABLE IF NOT EXISTS waiting_rooms (
+    event_id INTEGER PRIMARY KEY REFERENCES events(event_id) ON DELETE CASCADE,
+    admission_rate_per_minute INTEGER NOT NULL,
+    opens_at TIMESTAMP NOT NULL,
+    closes_at TIMESTAMP NOT NULL,
+    -- Last queue position handed out, i.e. how many clients joined so far
+    issued_count BIGINT NOT NULL DEFAULT 0,
+    CONSTRAINT chk_waiting_rooms_rate CHECK (admission_rate_per_minute > 0),
+    CONSTRAINT chk_waiting_rooms_window CHECK (opens_at < closes_at)
+);
+
+-- The services periodically load every room that has not closed yet.
+CREATE INDEX IF NOT EXISTS idx_waiting_rooms_closes_at ON waiting_rooms (closes_at);
@@ -0,0 +1,19 @@
+-- Stored results of idempotent requests (Idempotency-Key header).
+-- A row is inserted in the same transaction as the purchase it guards and only becomes
+-- visible when that purchase commits, so a visible row always carries the final response.
+-- Concurrent duplicates block on the unique key until the first execution finishes.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INTEGER NOT NULL,
+    endpoint VARCHAR(100) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    response_body JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, endpoint, idempotency_key)
+);
+
+-- Expired keys are purged in batches by the events service.
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
@@ -0,0 +1,29 @@
+-- migrate:no-transaction
+-- Optional sharded inventory for hot ticket types.
+-- With inventory_shards > 1 the free units of a ticket type are split across sub-counters in
+-- ticket_type_shards, so concurrent add-to-cart and checkout requests update different rows
+-- instead of queueing on the single ticket_types row. Units sold or held before the switch
+-- stay on the ticket_types counters; totals are always ticket_types + SUM(shards).
+-- This script is idempotent and safe to re-run against an existing database.
+
+ALTER TABLE ticket_types ADD COLUMN IF NOT EXISTS inventory_shards INTEGER NOT NULL DEFAULT 1;
+
+ALTER TABLE ticket_types DROP CONSTRAINT IF EXISTS chk_ticket_types_inventory_shards;
+-- Validated separately so the scan does not block writes, see 04_inventory.sql.
+ALTER TABLE ticket_types ADD CONSTRAINT chk_ticket_types_inventory_shards
+    CHECK (inventory_shards BETWEEN 1 AND 64) NOT VALID;
+ALTER TABLE ticket_types VALIDATE CONSTRAINT chk_ticket_types_inventory_shards;
+
+CREATE TABLE IF NOT EXISTS ticket_type_shards (
+    type_id INTEGER NOT NULL REFERENCES ticket_types(type_id) ON DELETE CASCADE,
+    shard_no SMALLINT NOT NULL,
+    capacity INTEGER NOT NULL,
+    sold_count INTEGER NOT NULL DEFAULT 0,
+    reserved_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (type_id, shard_no),
+    CONSTRAINT chk_ticket_type_shards_counts
+        CHECK (sold_count >= 0 AND reserved_count >= 0 AND sold_count + reserved_count <= capacity)
+);
+
+-- Shard holding a cart line's units; NULL means the hold is on the ticket_types counters.
+ALTER TABLE cart_items ADD COLUMN IF NOT EXISTS hold_shard SMALLINT;
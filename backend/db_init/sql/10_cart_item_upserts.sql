@@ -0,0 +1,61 @@
+-- One cart line per ticket type and per resale ticket in a cart.
+-- Adding to the cart is an INSERT ... ON CONFLICT on these constraints, so a second add merges
+-- into the existing line instead of creating a duplicate.
+-- This script is idempotent and safe to re-run against an existing database.
+
+-- Merge duplicate ticket-type lines left behind by earlier concurrent adds into the oldest line.
+-- Their holds are handed back (to the ticket type or to the shard holding them), the quantity is
+-- kept on the surviving line and will be re-checked at checkout.
+WITH ranked AS (
+    SELECT cart_item_id, cart_id, ticket_type_id, quantity, held_quantity, hold_shard,
+           row_number() OVER (PARTITION BY cart_id, ticket_type_id ORDER BY cart_item_id) AS rn
+    FROM cart_items
+    WHERE ticket_type_id IS NOT NULL
+), duplicates AS (
+    SELECT * FROM ranked WHERE rn > 1
+), released AS (
+    UPDATE ticket_types
+    SET reserved_count = ticket_types.reserved_count - held.quantity
+    FROM (
+        SELECT ticket_type_id, SUM(held_quantity) AS quantity
+        FROM duplicates
+        WHERE hold_shard IS NULL
+        GROUP BY ticket_type_id
+    ) AS held
+    WHERE ticket_types.type_id = held.ticket_type_id
+), released_from_shards AS (
+    UPDATE ticket_type_shards
+    SET reserved_count = ticket_type_shards.reserved_count - held.quantity
+    FROM (
+        SELECT ticket_type_id, hold_shard, SUM(held_quantity) AS quantity
+        FROM duplicates
+        WHERE hold_shard IS NOT NULL
+        GROUP BY ticket_type_id, hold_shard
+    ) AS held
+    WHERE ticket_type_shards.type_id = held.ticket_type_id AND ticket_type_shards.shard_no = held.hold_shard
+), merged AS (
+    UPDATE cart_items
+    SET quantity = cart_items.quantity + extra.quantity
+    FROM (
+        SELECT cart_id, ticket_type_id, SUM(quantity) AS quantity
+        FROM duplicates
+        GROUP BY cart_id, ticket_type_id
+    ) AS extra
+    WHERE cart_items.cart_id = extra.cart_id
+      AND cart_items.ticket_type_id = extra.ticket_type_id
+      AND cart_items.cart_item_id IN (SELECT cart_item_id FROM ranked WHERE rn = 1)
+)
+DELETE FROM cart_items WHERE cart_item_id IN (SELECT cart_item_id FROM duplicates);
+
+-- A resale ticket can only be in a cart once
+DELETE FROM cart_items
+WHERE ticket_id IS NOT NULL
+  AND cart_item_id NOT IN (
+      SELECT MIN(cart_item_id) FROM cart_items WHERE ticket_id IS NOT NULL GROUP BY cart_id, ticket_id
+  );
+
+ALTER TABLE cart_items DROP CONSTRAINT IF EXISTS uq_cart_items_ticket_type;
+ALTER TABLE cart_items ADD CONSTRAINT uq_cart_items_ticket_type UNIQUE (cart_id, ticket_type_id);
+
+ALTER TABLE cart_items DROP CONSTRAINT IF EXISTS uq_cart_items_ticket;
+ALTER TABLE cart_items ADD CONSTRAINT uq_cart_items_ticket UNIQUE (cart_id, ticket_id);
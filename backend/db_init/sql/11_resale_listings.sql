@@ -0,0 +1,55 @@
+-- Read model of the resale marketplace.
+-- One narrow row per ticket on resale, with the event, venue and ticket type details copied in,
+-- so the marketplace endpoints read a single table instead of joining tickets, ticket_types,
+-- events and locations. Maintained by TicketRepository (resell, cancel, purchase) and
+-- EventRepository (event renames, date and venue changes) in the same transaction as the change.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE TABLE IF NOT EXISTS resale_listings (
+    ticket_id INTEGER PRIMARY KEY REFERENCES tickets(ticket_id) ON DELETE CASCADE,
+    seller_id INTEGER,
+    resell_price DECIMAL(10,2) NOT NULL,
+    seat VARCHAR(50),
+    type_id INTEGER NOT NULL,
+    ticket_type_description VARCHAR(255),
+    original_price DOUBLE PRECISION NOT NULL,
+    event_id INTEGER NOT NULL,
+    event_name VARCHAR(255) NOT NULL,
+    event_date TIMESTAMP NOT NULL,
+    venue_name VARCHAR(255) NOT NULL,
+    listed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- One index per supported sort; ticket_id makes the order total
+CREATE INDEX IF NOT EXISTS idx_resale_listings_event_date ON resale_listings (event_date, ticket_id);
+CREATE INDEX IF NOT EXISTS idx_resale_listings_resell_price ON resale_listings (resell_price, ticket_id);
+CREATE INDEX IF NOT EXISTS idx_resale_listings_original_price ON resale_listings (original_price, ticket_id);
+CREATE INDEX IF NOT EXISTS idx_resale_listings_event_name ON resale_listings (event_name, ticket_id);
+CREATE INDEX IF NOT EXISTS idx_resale_listings_event_id ON resale_listings (event_id);
+CREATE INDEX IF NOT EXISTS idx_resale_listings_seller ON resale_listings (seller_id, event_date);
+
+-- Backfill from the tickets currently on resale and drop rows that are no longer listed
+INSERT INTO resale_listings (
+    ticket_id, seller_id, resell_price, seat, type_id, ticket_type_description, original_price,
+    event_id, event_name, event_date, venue_name
+)
+SELECT t.ticket_id, t.owner_id, t.resell_price, t.seat, tt.type_id, tt.description, tt.price,
+       e.event_id, e.name, e.start_date, l.name
+FROM tickets t
+JOIN ticket_types tt ON tt.type_id = t.type_id
+JOIN events e ON e.event_id = tt.event_id
+JOIN locations l ON l.location_id = e.location_id
+WHERE t.resell_price IS NOT NULL
+ON CONFLICT (ticket_id) DO UPDATE
+SET seller_id = EXCLUDED.seller_id,
+    resell_price = EXCLUDED.resell_price,
+    seat = EXCLUDED.seat,
+    ticket_type_description = EXCLUDED.ticket_type_description,
+    original_price = EXCLUDED.original_price,
+    event_name = EXCLUDED.event_name,
+    event_date = EXCLUDED.event_date,
+    venue_name = EXCLUDED.venue_name;
+
+DELETE FROM resale_listings rl
+USING tickets t
+WHERE t.ticket_id = rl.ticket_id AND t.resell_price IS NULL;
@@ -0,0 +1,14 @@
+-- Indexes behind cursor (?after=) pagination of the event and user lists.
+-- A cursor page is a range scan on (sort column, primary key) starting right after the last row
+-- of the previous page, so every supported sort needs a matching composite index; the primary key
+-- makes the order total. The resale marketplace sorts are covered in 11_resale_listings.sql, and
+-- users.email is unique, so its own index already gives a total order.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE INDEX IF NOT EXISTS idx_events_start_date ON events (start_date, event_id);
+CREATE INDEX IF NOT EXISTS idx_events_name ON events (name, event_id);
+
+CREATE INDEX IF NOT EXISTS idx_users_creation_date ON users (creation_date, user_id);
+CREATE INDEX IF NOT EXISTS idx_users_first_name ON users (first_name, user_id);
+CREATE INDEX IF NOT EXISTS idx_users_last_name ON users (last_name, user_id);
+CREATE INDEX IF NOT EXISTS idx_users_user_type ON users (user_type, user_id);
@@ -0,0 +1,18 @@
+-- Event search: full-text over name and description, trigram matching on the name.
+-- search_vector is a generated column, so Postgres keeps it up to date on every insert and update
+-- of events; names weigh more than descriptions when ranking. The 'simple' configuration does no
+-- stemming or stop words, which suits the mixed Polish / English catalog.
+-- The trigram index serves substring (ILIKE '%x%') and fuzzy (similarity, %) matches on the name.
+-- See app/services/event_search.py in the events service.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_events_search_vector ON events USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_events_name_trgm ON events USING GIN (name gin_trgm_ops);
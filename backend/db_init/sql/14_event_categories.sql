@@ -0,0 +1,9 @@
+-- Event categories, as given by the organizer when creating the event.
+-- The GIN index serves the categories filter of GET /events: overlap (&&) for "any of" and
+-- containment (@>) for "all of". Facet counts (GET /events/categories) unnest the column of
+-- the events matching the other filters.
+-- This script is idempotent and safe to re-run against an existing database.
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS categories TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_events_categories ON events USING GIN (categories);
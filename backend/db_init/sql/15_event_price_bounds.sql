@@ -0,0 +1,26 @@
+-- Cheapest and most expensive ticket type of every event, copied onto the event row.
+-- The min_price / max_price filters of the event lists become a range predicate on events
+-- (max_price >= :min AND min_price <= :max) served by the two indexes below, instead of a
+-- DISTINCT subquery over ticket_types. price_currency is set when all ticket types of the event
+-- share a currency and NULL otherwise. Maintained by EventSummaryRepository whenever ticket
+-- types are added or removed; events without ticket types have NULL bounds.
+-- This script is idempotent and safe to re-run against an existing database.
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS min_price DECIMAL(10,2);
+ALTER TABLE events ADD COLUMN IF NOT EXISTS max_price DECIMAL(10,2);
+ALTER TABLE events ADD COLUMN IF NOT EXISTS price_currency VARCHAR(3);
+
+UPDATE events
+SET min_price = bounds.min_price, max_price = bounds.max_price, price_currency = bounds.currency
+FROM (
+    SELECT event_id, MIN(price) AS min_price, MAX(price) AS max_price,
+           CASE WHEN COUNT(DISTINCT currency) = 1 THEN MIN(currency) END AS currency
+    FROM ticket_types
+    GROUP BY event_id
+) AS bounds
+WHERE events.event_id = bounds.event_id
+  AND (events.min_price, events.max_price, events.price_currency)
+      IS DISTINCT FROM (bounds.min_price, bounds.max_price, bounds.currency);
+
+CREATE INDEX IF NOT EXISTS idx_events_min_price ON events (min_price);
+CREATE INDEX IF NOT EXISTS idx_events_max_price ON events (max_price);
@@ -0,0 +1,28 @@
+-- Sold-out flag of every event: true once no ticket type of the event has unsold tickets
+-- (tickets held in carts still count as unsold, holds expire). It backs the has_available_tickets
+-- filter of the event lists through the partial index below. Maintained by EventSummaryRepository:
+-- checkout re-checks the events of ticket types it sold out, and adding or removing ticket types
+-- re-checks their event.
+-- This script is idempotent and safe to re-run against an existing database.
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS sold_out BOOLEAN NOT NULL DEFAULT false;
+
+WITH state AS (
+    SELECT e.event_id,
+           NOT EXISTS (
+               SELECT 1
+               FROM ticket_types tt
+               WHERE tt.event_id = e.event_id
+                 AND tt.max_count > tt.sold_count + COALESCE(
+                     (SELECT SUM(s.sold_count) FROM ticket_type_shards s WHERE s.type_id = tt.type_id), 0
+                 )
+           ) AS sold_out
+    FROM events e
+)
+UPDATE events
+SET sold_out = state.sold_out
+FROM state
+WHERE events.event_id = state.event_id AND events.sold_out <> state.sold_out;
+
+-- Events that still have tickets, in the default listing order
+CREATE INDEX IF NOT EXISTS idx_events_available ON events (start_date, event_id) WHERE NOT sold_out;
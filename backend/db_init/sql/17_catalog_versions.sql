@@ -0,0 +1,13 @@
+-- Versions of the public catalog lists (events, ticket types, inventory counts, locations,
+-- resale listings), used by the events service to build ETags for conditional GETs. The service
+-- bumps a sequence with nextval right after committing a change to its tables; nextval takes no
+-- lock, so concurrent checkouts do not queue on a version row.
+-- after_migrate.sql bumps all versions at the end of every db-init run, so ETags issued before
+-- seed data, a migration or a deploy changed the lists are never answered with a 304.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE SEQUENCE IF NOT EXISTS catalog_version_events;
+CREATE SEQUENCE IF NOT EXISTS catalog_version_ticket_types;
+CREATE SEQUENCE IF NOT EXISTS catalog_version_inventory;
+CREATE SEQUENCE IF NOT EXISTS catalog_version_locations;
+CREATE SEQUENCE IF NOT EXISTS catalog_version_resale;
@@ -0,0 +1,14 @@
+-- Read-your-writes windows for read replica routing.
+-- After a successful write request of a user, both services read for that user from the primary
+-- until the window ends (DB_STICKY_PRIMARY_SECONDS), so the user sees their own changes even
+-- though the replica has not applied them yet. Every write request upserts the user's row and
+-- authenticated reads look it up, always on the primary.
+-- UNLOGGED: the rows live for a few seconds and need neither WAL nor replication. A crash empties
+-- the table, which at worst lets a user read their last seconds of writes from the replica.
+-- There is one row per user who ever wrote, so the table stays small without purging.
+-- This script is idempotent and safe to re-run against an existing database.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS primary_read_windows (
+    user_id INTEGER PRIMARY KEY,
+    until TIMESTAMP NOT NULL
+);
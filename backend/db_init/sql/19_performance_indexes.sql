@@ -0,0 +1,46 @@
+-- migrate:no-transaction
+-- Indexes on the hot foreign keys and filter columns.
+-- Built CONCURRENTLY: reads and writes on the tables carry on during the build, which takes no
+-- lock that blocks them (SHARE UPDATE EXCLUSIVE). That cannot run inside a transaction, hence
+-- the directive above, see init.sh.
+-- A failed concurrent build leaves an INVALID index behind, which IF NOT EXISTS would then keep
+-- forever; those are dropped (concurrently too) first, so the migration can simply be re-run.
+-- Already covered by earlier migrations, so not repeated here:
+-- - events.start_date: idx_events_start_date (start_date, event_id), 12_keyset_pagination.sql
+-- - cart_items.cart_id: the unique constraints (cart_id, ticket_type_id) and (cart_id, ticket_id),
+--   10_cart_item_upserts.sql
+-- This script is idempotent and safe to re-run against an existing database.
+
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %I', index_class.relname)
+FROM pg_index
+JOIN pg_class AS index_class ON index_class.oid = pg_index.indexrelid
+WHERE NOT pg_index.indisvalid
+  AND index_class.relname IN (
+      'idx_tickets_type_id', 'idx_tickets_owner_id', 'idx_tickets_on_resale',
+      'idx_ticket_types_event_id', 'idx_events_status'
+  )
+\gexec
+
+-- Joins from ticket types to their tickets, sold and resale counts per type, and the cascade
+-- when a ticket type is deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_type_id ON tickets (type_id);
+
+-- A user's tickets (GET /tickets). Covers the ticket columns the list reads, so they come from
+-- the index and only the joined ticket types, events and locations are fetched.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_owner_id
+    ON tickets (owner_id, ticket_id)
+    INCLUDE (type_id, seat, resell_price);
+
+-- Tickets on resale: a small subset of all tickets, read when listing resale tickets per ticket
+-- type or event and when filtering on is_on_resale
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_on_resale
+    ON tickets (type_id, ticket_id)
+    WHERE resell_price IS NOT NULL;
+
+-- Ticket types of events (loaded for every page of GET /events), and the cascade when an event
+-- is deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ticket_types_event_id ON ticket_types (event_id);
+
+-- The status filter of GET /events. status alone has a handful of values; leading the default
+-- sort (start_date, event_id) with it lets one index range serve both the filter and the page.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_status ON events (status, start_date, event_id);
@@ -0,0 +1,24 @@
+-- Events without ticket types are not sold out: they are drafts whose tickets are not set up yet.
+-- 16_event_availability.sql flagged them sold out, which hid them from has_available_tickets=true
+-- and listed them as sold out. Recomputes the flag of every event with the rule
+-- EventSummaryRepository applies: sold out once the event has ticket types and none of them has
+-- unsold tickets left.
+-- This script is idempotent and safe to re-run against an existing database.
+
+WITH state AS (
+    SELECT e.event_id,
+           EXISTS (SELECT 1 FROM ticket_types tt WHERE tt.event_id = e.event_id)
+           AND NOT EXISTS (
+               SELECT 1
+               FROM ticket_types tt
+               WHERE tt.event_id = e.event_id
+                 AND tt.max_count > tt.sold_count + COALESCE(
+                     (SELECT SUM(s.sold_count) FROM ticket_type_shards s WHERE s.type_id = tt.type_id), 0
+                 )
+           ) AS sold_out
+    FROM events e
+)
+UPDATE events
+SET sold_out = state.sold_out
+FROM state
+WHERE events.event_id = state.event_id AND events.sold_out <> state.sold_out;
@@ -4,9 +4,12 @@ import json
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+from app.utils.db_pool import async_engine_options, engine_options
+
 # Load .env file for local development.
 # In AWS Fargate, environment variables will be set directly.
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
@@ -18,6 +21,9 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD_SECRET_ARN = os.getenv("DB_PASSWORD_SECRET_ARN")
 AWS_REGION = os.getenv("AWS_REGION")
 DB_PASSWORD = os.getenv("DB_PASSWORD", None)
+# Reader endpoint of the cluster for read-only endpoints (see app/utils/read_routing.py); same port,
+# database and credentials as DB_URL. Unset, every query goes to DB_URL.
+DB_READ_URL = os.getenv("DB_READ_URL")
 
 # Try to get password from Secrets Manager if running in AWS
 if DB_PASSWORD_SECRET_ARN and DB_URL and DB_URL != "localhost":
@@ -76,17 +82,43 @@ if not all([DB_URL, DB_USER, DB_NAME, DB_PASSWORD, DB_PORT]):
 DATABASE_URL = (
     f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_URL}:{DB_PORT}/{DB_NAME}"
 )
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
 print(f"Event Service: Connecting to database URL: postgresql://{DB_USER}:****@{DB_URL}:{DB_PORT}/{DB_NAME}")
 
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+# SQLAlchemy setup, pool settings come from the DB_POOL_* variables (see app/utils/db_pool.py)
+engine = create_engine(DATABASE_URL, **engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base() # Even if not used for create_all, it's standard to have.
 
+# asyncpg engine for async def endpoints: waiting on the database yields the event loop instead of
+# blocking it, so one worker overlaps the queries of many requests. Loaded attributes stay usable
+# after commit, since an expired attribute cannot be lazy loaded outside an await.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **async_engine_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# asyncpg engine on the read replica, behind get_async_read_db. Sessions are marked with
+# info["replica"], so code reading catalog versions knows the data may lag the primary.
+if DB_READ_URL:
+    print(f"Event Service: Reading from replica: postgresql://{DB_USER}:****@{DB_READ_URL}:{DB_PORT}/{DB_NAME}")
+    async_read_engine = create_async_engine(
+        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_READ_URL}:{DB_PORT}/{DB_NAME}",
+        **async_engine_options(replica=True),
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        async_read_engine, autoflush=False, expire_on_commit=False, info={"replica": True}
+    )
+else:
+    async_read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,15 +1,26 @@
 from app.database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, UniqueConstraint, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, DateTime, UniqueConstraint, ForeignKey
 
 
 class CartItemModel(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # Adding to the cart upserts on these, see CartRepository
+        UniqueConstraint("cart_id", "ticket_type_id", name="uq_cart_items_ticket_type"),
+        UniqueConstraint("cart_id", "ticket_id", name="uq_cart_items_ticket"),
+    )
 
     cart_item_id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey("shopping_carts.cart_id", ondelete="CASCADE"), nullable=False)
+    ticket_id = Column(Integer, ForeignKey("tickets.ticket_id", ondelete="CASCADE"), nullable=True)
     ticket_type_id = Column(Integer, ForeignKey("ticket_types.type_id", ondelete="CASCADE"), nullable=True)
     quantity = Column(Integer, nullable=False, default=1)
+    # Part of quantity reserved on the ticket type until hold_expires_at
+    held_quantity = Column(Integer, nullable=False, default=0)
+    hold_expires_at = Column(DateTime, nullable=True)
+    # Inventory shard holding the units of a sharded ticket type, NULL when held on the ticket type itself
+    hold_shard = Column(SmallInteger, nullable=True)
 
     cart = relationship("ShoppingCartModel", back_populates="items")
     ticket_type = relationship("TicketTypeModel")
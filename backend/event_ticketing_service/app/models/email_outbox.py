@@ -0,0 +1,21 @@
+from app.database import Base
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Text, Column, String, Integer, DateTime, func
+
+
+class EmailOutboxModel(Base):
+    __tablename__ = "email_outbox"
+
+    outbox_id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # 'pending', 'sent', 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox(outbox_id={self.outbox_id}, kind={self.kind}, status={self.status})>"
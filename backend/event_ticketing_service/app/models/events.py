@@ -1,6 +1,7 @@
 from app.database import Base
-from sqlalchemy.orm import relationship
-from sqlalchemy import Text, Column, String, Integer, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy.orm import deferred, relationship, query_expression
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy import Text, Float, Column, String, Boolean, Integer, DateTime, Computed, ForeignKey, CheckConstraint
 
 
 class EventModel(Base):
@@ -16,6 +17,21 @@ class EventModel(Base):
     end_date = Column(DateTime, nullable=False)
     minimum_age = Column(Integer)
     status = Column(String(20), nullable=False, default="created")
+    categories = Column(ARRAY(Text), nullable=False, default=list, server_default="{}")
+    # Cheapest and most expensive ticket type, kept current by EventSummaryRepository
+    min_price = Column(Float)
+    max_price = Column(Float)
+    price_currency = Column(String(3))  # NULL when the ticket types use different currencies
+    # Has ticket types and none has unsold tickets left, kept current by EventSummaryRepository
+    sold_out = Column(Boolean, nullable=False, default=False, server_default="false")
+    # Maintained by Postgres, see 13_event_search.sql; deferred so event reads don't carry it
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+        persisted=True,
+    )))
+    # Search score, only loaded by searches sorted by relevance
+    relevance = query_expression()
 
     location = relationship("LocationModel", back_populates="events")
     ticket_types = relationship("TicketTypeModel", back_populates="event", cascade="all, delete-orphan")
@@ -0,0 +1,18 @@
+from app.database import Base
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, String, Integer, DateTime, func
+
+
+class IdempotencyKeyModel(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    endpoint = Column(String(100), primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    response_body = Column(JSONB, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(user_id={self.user_id}, endpoint={self.endpoint}, key={self.idempotency_key})>"
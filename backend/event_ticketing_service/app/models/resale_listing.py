@@ -0,0 +1,20 @@
+from app.database import Base
+from sqlalchemy import Float, Column, String, Integer, Numeric, DateTime, ForeignKey, func
+
+
+class ResaleListingModel(Base):
+    """Denormalized row of the resale marketplace, one per ticket on resale"""
+    __tablename__ = "resale_listings"
+
+    ticket_id = Column(Integer, ForeignKey("tickets.ticket_id", ondelete="CASCADE"), primary_key=True)
+    seller_id = Column(Integer, nullable=True)
+    resell_price = Column(Numeric(10, 2), nullable=False)
+    seat = Column(String(50), nullable=True)
+    type_id = Column(Integer, nullable=False)
+    ticket_type_description = Column(String(255), nullable=True)
+    original_price = Column(Float, nullable=False)
+    event_id = Column(Integer, nullable=False)
+    event_name = Column(String(255), nullable=False)
+    event_date = Column(DateTime, nullable=False)
+    venue_name = Column(String(255), nullable=False)
+    listed_at = Column(DateTime, nullable=False, server_default=func.now())
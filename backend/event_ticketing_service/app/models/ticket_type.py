@@ -1,10 +1,17 @@
 from app.database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy import Float, Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Float, Column, String, Integer, DateTime, ForeignKey, CheckConstraint
 
 
 class TicketTypeModel(Base):
     __tablename__ = "ticket_types"
+    __table_args__ = (
+        CheckConstraint("sold_count >= 0 AND sold_count <= max_count", name="chk_ticket_types_sold_count"),
+        CheckConstraint(
+            "reserved_count >= 0 AND sold_count + reserved_count <= max_count", name="chk_ticket_types_reserved_count"
+        ),
+        CheckConstraint("inventory_shards BETWEEN 1 AND 64", name="chk_ticket_types_inventory_shards"),
+    )
 
     type_id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.event_id", ondelete="CASCADE"), nullable=False)
@@ -13,6 +20,20 @@ class TicketTypeModel(Base):
     price = Column(Float, nullable=False)
     currency = Column(String(3), nullable=False, default="PLN")
     available_from = Column(DateTime, nullable=False)
+    # Number of tickets already issued for this type, kept in step with the tickets table by checkout
+    sold_count = Column(Integer, nullable=False, default=0)
+    # Units held by shopping carts that have not been checked out yet
+    reserved_count = Column(Integer, nullable=False, default=0)
+    # Number of sub-counters in ticket_type_shards; 1 means the counters above are used directly
+    inventory_shards = Column(Integer, nullable=False, default=1)
 
     event = relationship("EventModel", back_populates="ticket_types")
     tickets = relationship("TicketModel", back_populates="ticket_type")
+    shards = relationship("TicketTypeShardModel", back_populates="ticket_type", cascade="all, delete-orphan")
+
+    @property
+    def remaining_count(self) -> int:
+        used = (self.sold_count or 0) + (self.reserved_count or 0)
+        if (self.inventory_shards or 1) > 1:
+            used += sum(shard.sold_count + shard.reserved_count for shard in self.shards)
+        return max(0, self.max_count - used)
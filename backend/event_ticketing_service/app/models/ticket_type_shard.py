@@ -0,0 +1,22 @@
+from app.database import Base
+from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, ForeignKey, CheckConstraint
+
+
+class TicketTypeShardModel(Base):
+    __tablename__ = "ticket_type_shards"
+    __table_args__ = (
+        CheckConstraint(
+            "sold_count >= 0 AND reserved_count >= 0 AND sold_count + reserved_count <= capacity",
+            name="chk_ticket_type_shards_counts",
+        ),
+    )
+
+    type_id = Column(Integer, ForeignKey("ticket_types.type_id", ondelete="CASCADE"), primary_key=True)
+    shard_no = Column(SmallInteger, primary_key=True)
+    # Units this shard may sell or hold; capacity moves between shards when one runs dry
+    capacity = Column(Integer, nullable=False)
+    sold_count = Column(Integer, nullable=False, default=0)
+    reserved_count = Column(Integer, nullable=False, default=0)
+
+    ticket_type = relationship("TicketTypeModel", back_populates="shards")
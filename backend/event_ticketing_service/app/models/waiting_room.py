@@ -0,0 +1,20 @@
+from app.database import Base
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, CheckConstraint
+
+
+class WaitingRoomModel(Base):
+    __tablename__ = "waiting_rooms"
+    __table_args__ = (
+        CheckConstraint("admission_rate_per_minute > 0", name="chk_waiting_rooms_rate"),
+        CheckConstraint("opens_at < closes_at", name="chk_waiting_rooms_window"),
+    )
+
+    event_id = Column(Integer, ForeignKey("events.event_id", ondelete="CASCADE"), primary_key=True)
+    admission_rate_per_minute = Column(Integer, nullable=False)
+    opens_at = Column(DateTime, nullable=False)
+    closes_at = Column(DateTime, nullable=False)
+    # Last queue position handed out, i.e. how many clients joined so far
+    issued_count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<WaitingRoom(event_id={self.event_id}, rate={self.admission_rate_per_minute}/min)>"
@@ -1,9 +1,10 @@
 import logging
 import pytz
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import Depends
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload, selectinload
 from datetime import datetime
 
@@ -11,30 +12,129 @@ from app.models.shopping_cart_model import ShoppingCartModel
 from app.models.cart_item_model import CartItemModel
 from app.models.ticket_type import TicketTypeModel
 from app.models.ticket import TicketModel
-from app.models.events import EventModel
-from app.services.email import send_ticket_email
-from app.database import get_db
+from app.repositories.inventory_repository import InventoryRepository, CART_HOLD_TTL_SECONDS
+from app.repositories.event_summary_repository import EventSummaryRepository
+from app.schemas.cart_scheme import CartItemWithDetails
+from app.schemas.ticket import TicketType
+from app.services.email_outbox import enqueue_ticket_emails
+from app.services.idempotency import IdempotencyGuard
+from app.services.catalog_versions import INVENTORY, bump_versions
+from app.database import get_async_db, get_db
 
 logger = logging.getLogger(__name__)
 
+# Locks and validates every ticket-type line of a cart in one round trip. Cart lines are locked
+# first, then their ticket types in type_id order, so concurrent multi-line checkouts (and the
+# hold sweeper, which also locks cart lines first) always acquire locks in the same order.
+# All ticket types get a KEY SHARE lock, which keeps their inventory mode stable until commit;
+# unsharded types are then locked for update of their counters. Sharded types are left unlocked,
+# their lines are settled shard by shard in _sell_cart_lines.
+# Availability is checked per ticket type: the cart's own holds count as available to it.
+_CHECKOUT_LINES_SQL = text("""
+    WITH lines AS MATERIALIZED (
+        SELECT cart_item_id, ticket_type_id, quantity, held_quantity, hold_shard
+        FROM cart_items
+        WHERE cart_id = :cart_id AND ticket_type_id IS NOT NULL
+        ORDER BY cart_item_id
+        FOR UPDATE
+    ), per_type AS (
+        SELECT ticket_type_id, SUM(quantity) AS quantity, SUM(held_quantity) AS held
+        FROM lines
+        GROUP BY ticket_type_id
+    ), types AS MATERIALIZED (
+        SELECT type_id, event_id, description, max_count, sold_count, reserved_count, available_from, inventory_shards
+        FROM ticket_types
+        WHERE type_id IN (SELECT ticket_type_id FROM per_type)
+        ORDER BY type_id
+        FOR KEY SHARE
+    ), locked_types AS MATERIALIZED (
+        SELECT type_id, max_count - sold_count - reserved_count AS free
+        FROM ticket_types
+        WHERE type_id IN (SELECT type_id FROM types WHERE inventory_shards = 1)
+        ORDER BY type_id
+        FOR NO KEY UPDATE
+    ), shard_totals AS (
+        SELECT type_id, SUM(sold_count + reserved_count) AS used
+        FROM ticket_type_shards
+        WHERE type_id IN (SELECT type_id FROM types WHERE inventory_shards > 1)
+        GROUP BY type_id
+    ), availability AS (
+        SELECT
+            types.type_id,
+            COALESCE(
+                locked_types.free,
+                types.max_count - types.sold_count - types.reserved_count - COALESCE(shard_totals.used, 0)
+            ) + per_type.held AS available
+        FROM types
+        JOIN per_type ON per_type.ticket_type_id = types.type_id
+        LEFT JOIN locked_types ON locked_types.type_id = types.type_id
+        LEFT JOIN shard_totals ON shard_totals.type_id = types.type_id
+    )
+    SELECT
+        lines.cart_item_id,
+        lines.ticket_type_id,
+        lines.quantity,
+        lines.held_quantity,
+        lines.hold_shard,
+        per_type.quantity AS type_quantity,
+        per_type.held AS type_held,
+        types.description,
+        types.inventory_shards,
+        availability.available,
+        events.name AS event_name,
+        events.status AS event_status,
+        events.start_date,
+        locations.name AS venue_name,
+        events.status <> 'created' AS not_on_sale,
+        types.available_from > :now AS sale_not_started,
+        events.end_date < :now AS event_ended,
+        types.inventory_shards = 1 AND per_type.quantity > availability.available AS insufficient
+    FROM lines
+    JOIN per_type ON per_type.ticket_type_id = lines.ticket_type_id
+    JOIN types ON types.type_id = lines.ticket_type_id
+    JOIN availability ON availability.type_id = lines.ticket_type_id
+    JOIN events ON events.event_id = types.event_id
+    JOIN locations ON locations.location_id = events.location_id
+    ORDER BY lines.ticket_type_id, lines.cart_item_id
+""")
+
+# Adds units of a ticket type to the customer's cart in one round trip: the cart is created on
+# first use, a second add merges into the existing line and extends its hold. held_quantity is
+# raised together with quantity; the caller reserves the units and rolls back if that fails.
+_UPSERT_TICKET_TYPE_LINE_SQL = text("""
+    WITH cart AS (
+        INSERT INTO shopping_carts (customer_id) VALUES (:customer_id)
+        ON CONFLICT (customer_id) DO UPDATE SET customer_id = EXCLUDED.customer_id
+        RETURNING cart_id
+    )
+    INSERT INTO cart_items (cart_id, ticket_type_id, quantity, held_quantity, hold_expires_at)
+    SELECT cart_id, :ticket_type_id, :quantity, :quantity, now() + CAST(:hold_seconds AS INTEGER) * INTERVAL '1 second'
+    FROM cart
+    ON CONFLICT (cart_id, ticket_type_id) DO UPDATE
+    SET quantity = cart_items.quantity + EXCLUDED.quantity,
+        held_quantity = cart_items.held_quantity + EXCLUDED.held_quantity,
+        hold_expires_at = EXCLUDED.hold_expires_at
+    RETURNING cart_item_id, cart_id, quantity, held_quantity, hold_expires_at, hold_shard
+""")
+
+# Puts a resale ticket in the customer's cart, creating the cart on first use.
+# Returns no row when the ticket is already in the cart.
+_INSERT_TICKET_LINE_SQL = text("""
+    WITH cart AS (
+        INSERT INTO shopping_carts (customer_id) VALUES (:customer_id)
+        ON CONFLICT (customer_id) DO UPDATE SET customer_id = EXCLUDED.customer_id
+        RETURNING cart_id
+    )
+    INSERT INTO cart_items (cart_id, ticket_id, quantity)
+    SELECT cart_id, :ticket_id, 1 FROM cart
+    ON CONFLICT (cart_id, ticket_id) DO NOTHING
+    RETURNING cart_item_id, cart_id, quantity
+""")
+
 class CartRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_or_create_cart(self, customer_id: int) -> ShoppingCartModel:
-        # get shopping cart if there is one
-        cart = self.db.query(ShoppingCartModel).filter(ShoppingCartModel.customer_id == customer_id).first()
-
-        # if there is no cart, create one
-        if not cart:
-            cart = ShoppingCartModel(customer_id=customer_id)
-            self.db.add(cart)
-            self.db.commit()
-            self.db.refresh(cart)
-            logger.info(f"Created new cart_id {cart.cart_id} for customer_id {customer_id}")
-
-        return cart
-
     def get_cart_items_details(self, customer_id: int) -> List[CartItemModel]:
         # Get the shopping cart for the customer
         cart = self.db.query(ShoppingCartModel).filter(ShoppingCartModel.customer_id == customer_id).first()
@@ -49,7 +149,9 @@ class CartRepository:
             .all()
         )
 
-    def add_item_from_detailed_sell(self, customer_id: int, ticket_type_id: int, quantity: int = 1) -> CartItemModel:
+    def add_item_from_detailed_sell(
+        self, customer_id: int, ticket_type_id: int, quantity: int = 1
+    ) -> CartItemWithDetails:
         if quantity < 1:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be at least 1")
 
@@ -104,33 +206,76 @@ class CartRepository:
                 detail=f"Event '{ticket_type.event.name}' has already ended.",
             )
 
-        # Get or create the shopping cart for the customer
-        cart = self.get_or_create_cart(customer_id)
-        existing_cart_item = (
-            self.db.query(CartItemModel)
-            .filter(CartItemModel.cart_id == cart.cart_id, CartItemModel.ticket_type_id == ticket_type_id)
-            .first()
-        )
-
-        # If the item already exists in the cart, update the quantity
-        if existing_cart_item:
-            existing_cart_item.quantity += quantity
-            logger.info(
-                f"Updated quantity for ticket_type_id {ticket_type_id} in cart_id {cart.cart_id}. New quantity: {existing_cart_item.quantity}")
+        ticket_type_details = TicketType.model_validate(ticket_type)
+
+        # Create the cart if needed and add to (or merge into) the line in one statement. This also
+        # locks the cart line before the ticket type, the same order used by checkout and the hold sweeper.
+        line = self.db.execute(
+            _UPSERT_TICKET_TYPE_LINE_SQL,
+            {
+                "customer_id": customer_id,
+                "ticket_type_id": ticket_type_id,
+                "quantity": quantity,
+                "hold_seconds": CART_HOLD_TTL_SECONDS,
+            },
+        ).one()
+
+        # Hold the units for this cart, so availability is settled now instead of at checkout
+        inventory = InventoryRepository(self.db)
+        hold_shard = line.hold_shard
+        if ticket_type.inventory_shards > 1:
+            # Keep the whole line on one shard: hand back what the line held before and hold it again
+            # together with the new units, preferably on the same shard
+            inventory.release(ticket_type_id, line.held_quantity - quantity, shard=line.hold_shard)
+            hold_shard = inventory.reserve_on_shard(
+                ticket_type_id, line.held_quantity, ticket_type.inventory_shards, shard=line.hold_shard
+            )
+            reserved = hold_shard is not None
         else:
-            existing_cart_item = CartItemModel(
-                cart_id=cart.cart_id,
-                ticket_type_id=ticket_type_id,
-                quantity=quantity,
+            reserved = inventory.reserve(ticket_type_id, quantity)
+
+        if not reserved:
+            available_tickets = inventory.get_available(ticket_type_id)
+            self.db.rollback()
+            # The rollback also undid the sweep of expired holds done by the failed reservation.
+            # Sweep again in a transaction of its own, so those holds stop blocking the stock now
+            # instead of at the next run of the hold sweeper.
+            if inventory.sweep_expired_holds(type_id=ticket_type_id):
+                self.db.commit()
+                bump_versions(self.db, INVENTORY)
+            else:
+                self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough tickets available for '{ticket_type.event.name} - "
+                       f"{ticket_type.description or 'selected type'}'. Only {available_tickets} left.",
+            )
+
+        if hold_shard != line.hold_shard:
+            self.db.execute(
+                update(CartItemModel)
+                .where(CartItemModel.cart_item_id == line.cart_item_id)
+                .values(hold_shard=hold_shard)
+                .execution_options(synchronize_session=False)
             )
-            self.db.add(existing_cart_item)
-            logger.info(f"Added ticket_type_id {ticket_type_id} with quantity {quantity} to cart_id {cart.cart_id}")
 
         self.db.commit()
-        self.db.refresh(existing_cart_item)
-        return existing_cart_item
+        bump_versions(self.db, INVENTORY)
+        logger.info(f"Added {quantity} of ticket_type_id {ticket_type_id} to cart_id {line.cart_id}. "
+                    f"New quantity: {line.quantity}")
+
+        return CartItemWithDetails(
+            cart_item_id=line.cart_item_id,
+            # Counters were loaded before this request's hold was taken
+            ticket_type=ticket_type_details.model_copy(
+                update={"remaining_count": max(0, (ticket_type_details.remaining_count or 0) - quantity)}
+            ),
+            quantity=line.quantity,
+            held_quantity=line.held_quantity,
+            hold_expires_at=line.hold_expires_at,
+        )
 
-    def add_item_from_resell(self, customer_id: int, ticket_id: int) -> CartItemModel:
+    def add_item_from_resell(self, customer_id: int, ticket_id: int) -> CartItemWithDetails:
         if not ticket_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Ticket ID must be provided")
 
@@ -142,32 +287,20 @@ class CartRepository:
         if ticket.owner_id == customer_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot add your own ticket to the cart")
 
-        # Get or create the shopping cart for the customer
-        cart = self.get_or_create_cart(customer_id)
-
-        # Check if the ticket is already in the cart
-        existing_cart_item = (
-            self.db.query(CartItemModel)
-            .filter(CartItemModel.cart_id == cart.cart_id, CartItemModel.ticket_id == ticket.ticket_id)
-            .first()
-        )
-        if existing_cart_item:
+        # Create the cart if needed and add the line in one statement; nothing comes back if it is already there
+        line = self.db.execute(
+            _INSERT_TICKET_LINE_SQL, {"customer_id": customer_id, "ticket_id": ticket_id}
+        ).first()
+        if line is None:
+            self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Ticket with ID {ticket_id} is already in your cart",
             )
-
-        existing_cart_item = CartItemModel(
-            cart_id=cart.cart_id,
-            ticket_id=ticket_id,
-            quantity=1,
-        )
-        self.db.add(existing_cart_item)
-        logger.info(f"Added ticket with ticket_id {ticket_id} to cart_id {cart.cart_id}")
-
         self.db.commit()
-        self.db.refresh(existing_cart_item)
-        return existing_cart_item
+        logger.info(f"Added ticket with ticket_id {ticket_id} to cart_id {line.cart_id}")
+
+        return CartItemWithDetails(cart_item_id=line.cart_item_id, ticket_id=ticket_id, quantity=line.quantity)
 
     def remove_item(self, customer_id: int, cart_item_id: int) -> bool:
         # Get the shopping cart for the customer
@@ -180,6 +313,7 @@ class CartRepository:
         cart_item_to_remove = (
             self.db.query(CartItemModel)
             .filter(CartItemModel.cart_item_id == cart_item_id, CartItemModel.cart_id == cart.cart_id)
+            .with_for_update()
             .first()
         )
 
@@ -189,125 +323,179 @@ class CartRepository:
                 detail=f"Item with ID {cart_item_id} not found in your cart",
             )
 
+        # Give back the units this line still holds
+        held_inventory = cart_item_to_remove.ticket_type_id is not None
+        if held_inventory:
+            InventoryRepository(self.db).release(
+                cart_item_to_remove.ticket_type_id,
+                cart_item_to_remove.held_quantity,
+                shard=cart_item_to_remove.hold_shard,
+            )
+
         self.db.delete(cart_item_to_remove)
         self.db.commit()
+        if held_inventory:
+            bump_versions(self.db, INVENTORY)
         return True
 
     #----------------------------------------------------------
     # Checkout methods
     #----------------------------------------------------------
-    def _checkout_detailed_ticket(self, item: CartItemModel, customer_id: int) -> List[Dict[str, Any]]:
+    def _lock_and_validate_cart(self, cart_id: int) -> List[Any]:
         """
-        Processes a single detailed/standard cart item:
-        - Validates ticket type, event, and location.
-        - Checks ticket availability.
-        - Creates new TicketModel instances.
-        Returns a list of dictionaries, each for a created ticket, for email processing.
+        Locks and validates all ticket-type lines of the cart with _CHECKOUT_LINES_SQL.
+        Raises a single 400 that lists every failing line; otherwise returns the lines,
+        carrying the event details needed for minting and confirmation emails.
         """
-        item_processed_tickets_info: List[Dict[str, Any]] = []
-
-        # It's crucial that item.ticket_type and its nested relationships are loaded.
-        # If not loaded by the caller, load them here.
-        if not item.ticket_type:
-            item.ticket_type = self.db.query(TicketTypeModel).options(
-                joinedload(TicketTypeModel.event).joinedload(EventModel.location)
-            ).filter(TicketTypeModel.type_id == item.ticket_type_id).first()
-
-        ticket_type = item.ticket_type
-        event = ticket_type.event
-        location = event.location
-
-        # Basic validation
-        if not all([ticket_type, event, location]):
-            logger.error(f"Incomplete data for detailed cart_item_id {item.cart_item_id}. "
-                         f"TicketType: {bool(ticket_type)}, Event: {bool(event)}, Location: {bool(location)}")
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error processing standard cart item details.")
-
-        # Check if there are enough tickets available
-        existing_tickets_count = (
-            self.db.query(func.count(TicketModel.ticket_id))
-            .filter(TicketModel.type_id == ticket_type.type_id)
-            .scalar() or 0
-        )
+        warsaw_tz = pytz.timezone('Europe/Warsaw')
+        now_warsaw = datetime.now(warsaw_tz).replace(tzinfo=None)
+        lines = self.db.execute(_CHECKOUT_LINES_SQL, {"cart_id": cart_id, "now": now_warsaw}).all()
+
+        errors: List[str] = []
+        for line in lines:
+            label = f"'{line.event_name} - {line.description or 'selected type'}'"
+            if line.not_on_sale:
+                errors.append(f"Event '{line.event_name}' is not on sale (status: {line.event_status}).")
+            elif line.event_ended:
+                errors.append(f"Event '{line.event_name}' has already ended.")
+            elif line.sale_not_started:
+                errors.append(f"Ticket type {label} is not available for sale yet.")
+            elif line.insufficient:
+                errors.append(f"Not enough tickets available for {label}. Only {max(0, line.available)} left.")
+
+        if errors:
+            # Lines of the same ticket type share one availability verdict, report it once
+            errors = list(dict.fromkeys(errors))
+            logger.warning(f"Checkout of cart_id {cart_id} rejected: {errors}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=" ".join(errors))
+
+        return lines
+
+    def _sell_cart_lines(self, lines: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Converts the validated lines into sold inventory and returns one dictionary per ticket
+        to be minted, used for minting and confirmation emails. Unsharded ticket types are sold
+        with one UPDATE; lines of sharded types are sold on their shards, and if any of them no
+        longer fits a single 400 lists them all.
+        """
+        inventory = InventoryRepository(self.db)
+        per_type = {
+            line.ticket_type_id: (line.type_quantity, line.type_held) for line in lines if line.inventory_shards == 1
+        }
+        inventory.sell_locked(per_type)
+
+        errors: List[str] = []
+        for line in lines:
+            if line.inventory_shards > 1 and not inventory.sell_sharded(
+                line.ticket_type_id, line.inventory_shards, line.held_quantity,
+                line.quantity - line.held_quantity, line.hold_shard,
+            ):
+                errors.append(
+                    f"Not enough tickets available for '{line.event_name} - {line.description or 'selected type'}'. "
+                    f"Only {inventory.get_available(line.ticket_type_id)} left."
+                )
+        if errors:
+            errors = list(dict.fromkeys(errors))
+            logger.warning(f"Checkout rejected: {errors}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=" ".join(errors))
+
+        tickets_info: List[Dict[str, Any]] = []
+        for line in lines:
+            for _ in range(line.quantity):
+                tickets_info.append({
+                    "type_id": line.ticket_type_id,
+                    "event_name": line.event_name,
+                    "event_date": line.start_date.strftime("%B %d, %Y"),
+                    "event_time": line.start_date.strftime("%I:%M %p"),
+                    "venue_name": line.venue_name,
+                    "seat": None, # Will be None unless logic is added
+                })
+        return tickets_info
+
+    def _mint_tickets(self, tickets_info: List[Dict[str, Any]], customer_id: int) -> None:
+        """
+        Inserts all tickets of a checkout with a single multi-row INSERT ... RETURNING.
+        The generated ticket IDs are written back into each entry of tickets_info under "ticket_id",
+        so no per-ticket refresh is needed after commit.
+        """
+        if not tickets_info:
+            return
+
+        rows = [
+            {
+                "type_id": info["type_id"],
+                "owner_id": customer_id,
+                "seat": info["seat"],
+                "resell_price": None,
+            }
+            for info in tickets_info
+        ]
+        minted = self.db.execute(
+            insert(TicketModel).returning(TicketModel.ticket_id, sort_by_parameter_order=True),
+            rows,
+        ).all()
+
+        for info, row in zip(tickets_info, minted):
+            info["ticket_id"] = row.ticket_id
+
+    def checkout(self, customer_id: int, user_email: str, user_name: str,
+                 idempotency: Optional[IdempotencyGuard] = None) -> bool:
+        # Look the cart up without creating it, so the whole checkout stays a single transaction.
+        # A customer who never had a cart has nothing to check out.
+        cart = self.db.query(ShoppingCartModel).filter(ShoppingCartModel.customer_id == customer_id).first()
+        if not cart:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Shopping cart is empty")
 
-        if existing_tickets_count + item.quantity > ticket_type.max_count:
-            available_tickets = ticket_type.max_count - existing_tickets_count
-            logger.warning(
-                f"Not enough tickets for event '{event.name}', type '{ticket_type.description or ticket_type.type_id}'. "
-                f"Requested: {item.quantity}, Available: {max(0, available_tickets)}, "
-                f"Existing: {existing_tickets_count}, Max: {ticket_type.max_count}"
-            )
+        # Resale tickets are bought one by one with POST /resale/purchase, at the listed price. Checkout
+        # only mints ticket types, so resale lines are refused rather than dropped with the cart.
+        resale_lines = [
+            row.cart_item_id
+            for row in self.db.query(CartItemModel.cart_item_id)
+            .filter(CartItemModel.cart_id == cart.cart_id, CartItemModel.ticket_id.isnot(None))
+            .order_by(CartItemModel.cart_item_id)
+        ]
+        if resale_lines:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Not enough tickets available for '{event.name} - {ticket_type.description or 'selected type'}'. "
-                       f"Only {max(0, available_tickets)} left."
-            )
-
-        for _ in range(item.quantity):
-            new_ticket = TicketModel(
-                type_id=ticket_type.type_id,
-                owner_id=customer_id,
-                seat=None,
-                resell_price=None,
+                detail="Resale tickets cannot be checked out from the cart, buy them on the resale marketplace. "
+                       f"Remove cart item(s) {', '.join(map(str, resale_lines))} first.",
             )
-            self.db.add(new_ticket) # Add to session, will be committed in the main checkout
-            item_processed_tickets_info.append({
-                "ticket_model": new_ticket,
-                "event_name": event.name,
-                "event_date": event.start_date.strftime("%B %d, %Y"),
-                "event_time": event.start_date.strftime("%I:%M %p"),
-                "venue_name": location.name,
-                "seat": new_ticket.seat, # Will be None unless logic is added
-            })
-        return item_processed_tickets_info
-
-    def checkout(self, customer_id: int, user_email: str, user_name: str) -> bool:
-        # Get or create the shopping cart for the customer to handle cases where the user has never had a cart.
-        cart = self.get_or_create_cart(customer_id)
-
-        # Eagerly load relationships. This helps ensure data is available.
-        cart_items = (
-            self.db.query(CartItemModel)
-            .filter(CartItemModel.cart_id == cart.cart_id)
-            .options(
-                selectinload(CartItemModel.ticket_type)  # For standard tickets
-                .selectinload(TicketTypeModel.event)
-                .selectinload(EventModel.location)
-            )
-            .all()
-        )
-
-        if not cart_items:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Shopping cart is empty")
-
-        processed_tickets_info: List[Dict[str, Any]] = []
 
         try:
-            for item in cart_items:
-                if item.ticket_type: # Detailed/standard ticket
-                    item_processed_info = self._checkout_detailed_ticket(item, customer_id)
-                    processed_tickets_info.extend(item_processed_info)
+            lines = self._lock_and_validate_cart(cart.cart_id)
+            if not lines:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Shopping cart is empty")
+
+            processed_tickets_info = self._sell_cart_lines(lines)
+            self._mint_tickets(processed_tickets_info, customer_id)
+            EventSummaryRepository(self.db).refresh_after_sale({line.ticket_type_id for line in lines})
+
+            # Confirmation emails are queued in the same transaction and delivered by the email worker
+            enqueue_ticket_emails(
+                self.db,
+                to_email=user_email,
+                user_name=user_name,
+                tickets=[
+                    {
+                        "event_name": info["event_name"],
+                        "ticket_id": str(info["ticket_id"]),
+                        "event_date": info["event_date"],
+                        "event_time": info["event_time"],
+                        "venue": info["venue_name"],
+                        "seat": info["seat"],
+                    }
+                    for info in processed_tickets_info
+                ],
+            )
 
             # Clear the cart items after successful checkout
-            for item in cart_items:
-                self.db.delete(item)
-            self.db.commit()
+            self.db.query(CartItemModel).filter(CartItemModel.cart_id == cart.cart_id).delete(synchronize_session=False)
 
-            # Refresh tickets to get their IDs and send emails
-            for info in processed_tickets_info:
-                self.db.refresh(info["ticket_model"])
-                email_sent = send_ticket_email(
-                    to_email=user_email,
-                    user_name=user_name,
-                    event_name=info["event_name"],
-                    ticket_id=str(info["ticket_model"].ticket_id),
-                    event_date=info["event_date"],
-                    event_time=info["event_time"],
-                    venue=info["venue_name"],
-                    seat=info["seat"],
-                )
-                if not email_sent:
-                    logger.error(f"Failed to send confirmation email for ticket {info['ticket_model'].ticket_id} to {user_email}")
+            # Store the response for Idempotency-Key replays in the same transaction
+            if idempotency:
+                idempotency.complete(True)
+            self.db.commit()
+            bump_versions(self.db, INVENTORY)
 
             logger.info(f"Checkout successful for user_id {customer_id}. {len(processed_tickets_info)} ticket(s) created.")
             return True
@@ -323,6 +511,49 @@ class CartRepository:
                 detail=f"Checkout failed due to an internal error.",
             )
 
+class AsyncCartRepository:
+    """
+    Cart operations on an async session, for async def endpoints. The cart read is a native
+    async query; adding and removing lines run CartRepository's implementation on the same
+    connection (run_sync), keeping a single copy of the hold and lock ordering logic.
+    Checkout stays on CartRepository: its Idempotency-Key guard writes in the same transaction.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_cart_items_details(self, customer_id: int) -> List[CartItemModel]:
+        # Items of the customer's cart in one query, ticket types (and their shards, for remaining_count)
+        # loaded up front since nothing can be lazy loaded later
+        items = await self.db.scalars(
+            select(CartItemModel)
+            .join(ShoppingCartModel, ShoppingCartModel.cart_id == CartItemModel.cart_id)
+            .where(ShoppingCartModel.customer_id == customer_id)
+            .options(selectinload(CartItemModel.ticket_type).selectinload(TicketTypeModel.shards))
+        )
+        return list(items)
+
+    async def add_item_from_detailed_sell(
+        self, customer_id: int, ticket_type_id: int, quantity: int = 1
+    ) -> CartItemWithDetails:
+        return await self.db.run_sync(
+            lambda session: CartRepository(session).add_item_from_detailed_sell(customer_id, ticket_type_id, quantity)
+        )
+
+    async def add_item_from_resell(self, customer_id: int, ticket_id: int) -> CartItemWithDetails:
+        return await self.db.run_sync(
+            lambda session: CartRepository(session).add_item_from_resell(customer_id, ticket_id)
+        )
+
+    async def remove_item(self, customer_id: int, cart_item_id: int) -> bool:
+        return await self.db.run_sync(lambda session: CartRepository(session).remove_item(customer_id, cart_item_id))
+
+
 # Dependency to get the CartRepository instance
 def get_cart_repository(db: Session = Depends(get_db)) -> CartRepository:
     return CartRepository(db)
+
+
+# Dependency to get the AsyncCartRepository instance
+def get_async_cart_repository(db: AsyncSession = Depends(get_async_db)) -> AsyncCartRepository:
+    return AsyncCartRepository(db)
@@ -4,18 +4,22 @@ Fixed event_repository.py - Eliminates duplicate validation logic
 
 from typing import List
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload, selectinload
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models.events import EventModel
 from app.models.ticket import TicketModel
 from app.models.ticket_type import TicketTypeModel
 from fastapi import HTTPException, status, Depends
 from app.models.location import LocationModel
 from app.filters.events_filter import EventsFilter
+from app.repositories.resale_listing_repository import ResaleListingRepository
 from app.repositories.ticket_repository import get_ticket_repository
-from app.schemas.event import EventBase, EventUpdate
+from app.schemas.event import EventBase, EventDetails, EventUpdate
 from app.schemas.ticket import TicketType
+from app.services.catalog_versions import EVENTS, RESALE, bump_versions, bump_versions_async
 
 
 
@@ -52,9 +56,11 @@ class EventRepository:
             end_date=data.end_date,
             minimum_age=data.minimum_age,
             status="pending",
+            categories=data.category,
         )
         self.db.add(event)
         self.db.commit()
+        bump_versions(self.db, EVENTS)
         self.db.refresh(event)
 
         # Create standard ticket type
@@ -86,6 +92,7 @@ class EventRepository:
         self._validate_event_status_change(event, "pending", "authorize")
         event.status = "created"
         self.db.commit()
+        bump_versions(self.db, EVENTS)
 
     def reject_event(self, event_id: int) -> None:
         """Reject a pending event"""
@@ -93,6 +100,7 @@ class EventRepository:
         self._validate_event_status_change(event, "pending", "reject")
         event.status = "rejected"
         self.db.commit()
+        bump_versions(self.db, EVENTS)
 
     def get_events(self, filters: EventsFilter) -> List[EventModel]:
         query = self.db.query(EventModel).options(
@@ -117,8 +125,12 @@ class EventRepository:
             query = query.filter(EventModel.minimum_age >= filters.minimum_age)
         if filters.status:
             query = query.filter(EventModel.status == filters.status)
-
-        # TODO: add price filters (join ticket_types) and availability checks
+        if filters.min_price is not None:
+            query = query.filter(EventModel.max_price >= filters.min_price)
+        if filters.max_price is not None:
+            query = query.filter(EventModel.min_price <= filters.max_price)
+        if filters.has_available_tickets is not None:
+            query = query.filter(EventModel.sold_out.is_(not filters.has_available_tickets))
 
         return query.all()
 
@@ -131,7 +143,12 @@ class EventRepository:
         for field, value in updates.items():
             if value is not None:
                 setattr(event, field, value)
+        # Resale listings carry copies of the event name, date and venue
+        if {"name", "start_date", "location_id"} & {field for field, value in updates.items() if value is not None}:
+            self.db.flush()
+            ResaleListingRepository(self.db).refresh_event(event_id)
         self.db.commit()
+        bump_versions(self.db, EVENTS, RESALE)
         # Re-fetch with eager loading for the response
         return self.get_event(event_id)
 
@@ -158,8 +175,63 @@ class EventRepository:
 
         event.status = "cancelled"
         self.db.commit()
+        bump_versions(self.db, EVENTS)
+
+
+class AsyncEventRepository:
+    """
+    Event operations on an async session, for async def endpoints. Reads and status changes are
+    native async queries; creating an event runs EventRepository.create_event on the same
+    connection (run_sync), as it goes through the ticket type and event summary upkeep.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_event(self, event_id: int) -> EventModel:
+        # Everything EventDetails reads is loaded here, nothing can be lazy loaded later
+        event = await self.db.scalar(
+            select(EventModel)
+            .options(
+                joinedload(EventModel.location),
+                selectinload(EventModel.ticket_types).selectinload(TicketTypeModel.shards),
+            )
+            .where(EventModel.event_id == event_id)
+        )
+        if not event:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Event not found")
+        return event
+
+    async def create_event(self, data: EventBase, organizer_id: int) -> EventDetails:
+        return await self.db.run_sync(
+            lambda session: EventDetails.model_validate(EventRepository(session).create_event(data, organizer_id))
+        )
+
+    async def _change_status(self, event_id: int, required_status: str, action: str, new_status: str) -> None:
+        event = await self.get_event(event_id)
+        if event.status != required_status:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                detail=f"Event must be in {required_status} status to {action}. Current status: {event.status}"
+            )
+        event.status = new_status
+        await self.db.commit()
+        await bump_versions_async(self.db, EVENTS)
+
+    async def authorize_event(self, event_id: int) -> None:
+        """Authorize a pending event"""
+        await self._change_status(event_id, "pending", "authorize", "created")
+
+    async def reject_event(self, event_id: int) -> None:
+        """Reject a pending event"""
+        await self._change_status(event_id, "pending", "reject", "rejected")
 
 
 # Dependency to get the EventRepository instance
 def get_event_repository(db: Session = Depends(get_db)) -> EventRepository:
-    return EventRepository(db)
\ No newline at end of file
+    return EventRepository(db)
+
+
+# Dependency to get the AsyncEventRepository instance
+def get_async_event_repository(db: AsyncSession = Depends(get_async_db)) -> AsyncEventRepository:
+    return AsyncEventRepository(db)
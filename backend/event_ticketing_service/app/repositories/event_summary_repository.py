@@ -0,0 +1,98 @@
+from typing import Iterable, List
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models.events import EventModel
+
+# Recomputes the price bounds of an event from its ticket types
+_REFRESH_PRICE_BOUNDS_SQL = text("""
+    UPDATE events
+    SET min_price = bounds.min_price, max_price = bounds.max_price, price_currency = bounds.currency
+    FROM (
+        SELECT MIN(price) AS min_price, MAX(price) AS max_price,
+               CASE WHEN COUNT(DISTINCT currency) = 1 THEN MIN(currency) END AS currency
+        FROM ticket_types
+        WHERE event_id = :event_id
+    ) AS bounds
+    WHERE events.event_id = :event_id
+""")
+
+# Events of the given ticket types that have no unsold tickets left on them
+_SOLD_OUT_TYPE_EVENTS_SQL = text("""
+    SELECT DISTINCT tt.event_id
+    FROM ticket_types tt
+    WHERE tt.type_id = ANY(CAST(:type_ids AS INTEGER[]))
+      AND tt.max_count <= tt.sold_count + COALESCE(
+          (SELECT SUM(s.sold_count) FROM ticket_type_shards s WHERE s.type_id = tt.type_id), 0
+      )
+    ORDER BY tt.event_id
+""")
+
+# Recomputes the sold-out flag of events, writing only the rows whose flag changes. An event
+# without ticket types is a draft whose tickets are not set up yet, not a sold-out one.
+_REFRESH_SOLD_OUT_SQL = text("""
+    WITH state AS (
+        SELECT e.event_id,
+               EXISTS (SELECT 1 FROM ticket_types tt WHERE tt.event_id = e.event_id)
+               AND NOT EXISTS (
+                   SELECT 1
+                   FROM ticket_types tt
+                   WHERE tt.event_id = e.event_id
+                     AND tt.max_count > tt.sold_count + COALESCE(
+                         (SELECT SUM(s.sold_count) FROM ticket_type_shards s WHERE s.type_id = tt.type_id), 0
+                     )
+               ) AS sold_out
+        FROM events e
+        WHERE e.event_id = ANY(CAST(:event_ids AS INTEGER[]))
+    )
+    UPDATE events
+    SET sold_out = state.sold_out
+    FROM state
+    WHERE events.event_id = state.event_id AND events.sold_out <> state.sold_out
+""")
+
+
+class EventSummaryRepository:
+    """
+    Per-event aggregates of the ticket types, stored on the event row so the event lists can
+    filter on them with an index. Writers call these in the same transaction as the change to
+    ticket_types; none of these methods commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _lock_events(self, event_ids: List[int]) -> None:
+        # Serializes refreshes of an event: FOR NO KEY UPDATE conflicts with itself, unlike FOR KEY
+        # SHARE, yet still lets ticket types referencing the event be inserted. The aggregates are
+        # then read in a later statement, so under READ COMMITTED they see the changes committed
+        # by whoever held the lock before us. Callers have already changed (and locked) the ticket
+        # types, so locks go types -> event.
+        self.db.query(EventModel.event_id).filter(EventModel.event_id.in_(event_ids)).order_by(
+            EventModel.event_id
+        ).with_for_update(no_key_update=True).all()
+
+    def refresh(self, event_id: int) -> None:
+        """Recomputes all aggregates of an event after one of its ticket types was added or removed"""
+        self._lock_events([event_id])
+        self.db.execute(_REFRESH_PRICE_BOUNDS_SQL, {"event_id": event_id})
+        self.db.execute(_REFRESH_SOLD_OUT_SQL, {"event_ids": [event_id]})
+
+    def refresh_after_sale(self, type_ids: Iterable[int]) -> None:
+        """
+        Marks events sold out after tickets of the given types were sold. Only events with a type
+        that just ran out are locked and re-checked, so most checkouts add a single read.
+        """
+        event_ids = [row.event_id for row in self.db.execute(_SOLD_OUT_TYPE_EVENTS_SQL, {"type_ids": list(type_ids)})]
+        if not event_ids:
+            return
+        self._lock_events(event_ids)
+        self.db.execute(_REFRESH_SOLD_OUT_SQL, {"event_ids": event_ids})
+
+
+# Dependency to get the EventSummaryRepository instance
+def get_event_summary_repository(db: Session = Depends(get_db)) -> EventSummaryRepository:
+    return EventSummaryRepository(db)
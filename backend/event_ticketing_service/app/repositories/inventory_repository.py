@@ -0,0 +1,411 @@
+import os
+import random
+import logging
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import func, select, text, update
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models.cart_item_model import CartItemModel
+from app.models.ticket_type import TicketTypeModel
+from app.models.ticket_type_shard import TicketTypeShardModel
+
+# How long units added to a cart stay reserved for that cart
+CART_HOLD_TTL_SECONDS = int(os.getenv("CART_HOLD_TTL_SECONDS", "900"))
+# Maximum number of expired cart lines released by one sweep statement
+HOLD_SWEEP_BATCH_SIZE = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", "1000"))
+MAX_INVENTORY_SHARDS = 64
+
+logger = logging.getLogger(__name__)
+
+# Releases expired holds in one round trip: lock a batch of expired cart lines (skipping lines
+# a checkout is working on), zero their holds and give the units back to their ticket types,
+# or to the shard holding them for sharded ticket types.
+# Cart lines are locked before ticket types, the same order used by add-to-cart and checkout.
+_SWEEP_EXPIRED_HOLDS_SQL = text("""
+    WITH expired AS (
+        SELECT cart_item_id, ticket_type_id, held_quantity, hold_shard
+        FROM cart_items
+        WHERE held_quantity > 0
+          AND hold_expires_at <= now()
+          AND (CAST(:type_id AS INTEGER) IS NULL OR ticket_type_id = :type_id)
+        ORDER BY cart_item_id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ), released AS (
+        UPDATE cart_items
+        SET held_quantity = 0, hold_expires_at = NULL, hold_shard = NULL
+        FROM expired
+        WHERE cart_items.cart_item_id = expired.cart_item_id
+        RETURNING expired.ticket_type_id, expired.held_quantity, expired.hold_shard
+    ), per_type AS (
+        SELECT ticket_type_id, SUM(held_quantity) AS held, COUNT(*) AS lines
+        FROM released
+        WHERE hold_shard IS NULL
+        GROUP BY ticket_type_id
+    ), per_shard AS (
+        SELECT ticket_type_id, hold_shard, SUM(held_quantity) AS held, COUNT(*) AS lines
+        FROM released
+        WHERE hold_shard IS NOT NULL
+        GROUP BY ticket_type_id, hold_shard
+    ), returned AS (
+        UPDATE ticket_types
+        SET reserved_count = ticket_types.reserved_count - per_type.held
+        FROM per_type
+        WHERE ticket_types.type_id = per_type.ticket_type_id
+        RETURNING per_type.lines
+    ), returned_to_shards AS (
+        UPDATE ticket_type_shards
+        SET reserved_count = ticket_type_shards.reserved_count - per_shard.held
+        FROM per_shard
+        WHERE ticket_type_shards.type_id = per_shard.ticket_type_id
+          AND ticket_type_shards.shard_no = per_shard.hold_shard
+        RETURNING per_shard.lines
+    )
+    SELECT COALESCE((SELECT SUM(lines) FROM returned), 0)
+         + COALESCE((SELECT SUM(lines) FROM returned_to_shards), 0)
+""")
+
+
+# Converts the lines of a locked and validated checkout into sold units, all ticket types at once
+_SELL_LOCKED_SQL = text("""
+    UPDATE ticket_types
+    SET sold_count = ticket_types.sold_count + sold.quantity,
+        reserved_count = ticket_types.reserved_count - sold.held
+    FROM unnest(CAST(:type_ids AS INTEGER[]), CAST(:quantities AS INTEGER[]), CAST(:held AS INTEGER[]))
+        AS sold(type_id, quantity, held)
+    WHERE ticket_types.type_id = sold.type_id
+""")
+
+# Holds units on the first shard with enough free units, starting from a random shard so that
+# concurrent requests spread over all of them. The SKIP LOCKED variant never waits for a busy shard.
+_RESERVE_ON_SHARD_SQL = """
+    UPDATE ticket_type_shards
+    SET reserved_count = reserved_count + :quantity
+    WHERE type_id = :type_id
+      AND capacity - sold_count - reserved_count >= :quantity
+      AND shard_no = (
+          SELECT shard_no
+          FROM ticket_type_shards
+          WHERE type_id = :type_id AND capacity - sold_count - reserved_count >= :quantity
+          ORDER BY (shard_no + :offset) % :shards
+          LIMIT 1
+          FOR UPDATE {skip_locked}
+      )
+    RETURNING shard_no
+"""
+_RESERVE_ON_FREE_SHARD_SQL = text(_RESERVE_ON_SHARD_SQL.format(skip_locked="SKIP LOCKED"))
+_RESERVE_ON_BUSY_SHARD_SQL = text(_RESERVE_ON_SHARD_SQL.format(skip_locked=""))
+
+
+def shard_usage():
+    """Correlated SUM(sold + reserved) over the shards of TicketTypeModel, 0 for unsharded types"""
+    return (
+        select(func.coalesce(func.sum(TicketTypeShardModel.sold_count + TicketTypeShardModel.reserved_count), 0))
+        .where(TicketTypeShardModel.type_id == TicketTypeModel.type_id)
+        .scalar_subquery()
+    )
+
+
+class InventoryRepository:
+    """
+    Counter-based inventory of ticket types.
+
+    Every ticket type carries sold_count and reserved_count next to max_count. All changes are
+    single conditional UPDATEs, so the database enforces sold + reserved <= max_count without
+    counting tickets or cart lines.
+
+    Hot ticket types can be switched to sharded mode (inventory_shards > 1). Their free units are
+    then split across the rows of ticket_type_shards, and holds and sales land on one random shard,
+    so concurrent buyers update different rows. Totals are the ticket type counters plus the sum
+    over its shards.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_available(self, type_id: int) -> int:
+        """Units that are neither sold nor held by a cart"""
+        available = (
+            self.db.query(
+                TicketTypeModel.max_count - TicketTypeModel.sold_count - TicketTypeModel.reserved_count - shard_usage()
+            )
+            .filter(TicketTypeModel.type_id == type_id)
+            .scalar()
+        )
+        return max(0, available or 0)
+
+    def reserve(self, type_id: int, quantity: int) -> bool:
+        """
+        Hold quantity units for a cart. If the type looks sold out, expired holds on it are
+        released first and the reservation is retried once, so a lagging sweeper never blocks sales.
+        Only for unsharded ticket types, see reserve_on_shard.
+        """
+        if self._try_reserve(type_id, quantity):
+            return True
+        if self.sweep_expired_holds(type_id=type_id) > 0:
+            return self._try_reserve(type_id, quantity)
+        return False
+
+    def _try_reserve(self, type_id: int, quantity: int) -> bool:
+        reserved = self.db.execute(
+            update(TicketTypeModel)
+            .where(
+                TicketTypeModel.type_id == type_id,
+                # Shards own part of max_count, so sharded types can never be reserved on directly
+                TicketTypeModel.inventory_shards == 1,
+                TicketTypeModel.sold_count + TicketTypeModel.reserved_count + quantity <= TicketTypeModel.max_count,
+            )
+            .values(reserved_count=TicketTypeModel.reserved_count + quantity)
+            .returning(TicketTypeModel.type_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        return reserved is not None
+
+    def reserve_on_shard(self, type_id: int, quantity: int, shards: int, shard: Optional[int] = None) -> Optional[int]:
+        """
+        Hold quantity units of a sharded ticket type and return the shard holding them, or None
+        when the type is sold out. The given shard (e.g. the one already holding the cart line)
+        is tried first, then a random shard that is not locked, then any shard. When no single
+        shard has room left, free capacity is moved over from the other shards. Like reserve(),
+        expired holds are swept and the reservation retried once before giving up.
+        """
+        reserved = self._try_reserve_on_shard(type_id, quantity, shards, shard)
+        if reserved is None and self.sweep_expired_holds(type_id=type_id) > 0:
+            reserved = self._try_reserve_on_shard(type_id, quantity, shards, shard)
+        return reserved
+
+    def _try_reserve_on_shard(self, type_id: int, quantity: int, shards: int, shard: Optional[int]) -> Optional[int]:
+        if shard is not None and self._hold_on_shard(type_id, shard, quantity):
+            return shard
+
+        params = {"type_id": type_id, "quantity": quantity, "shards": shards, "offset": random.randrange(shards)}
+        for statement in (_RESERVE_ON_FREE_SHARD_SQL, _RESERVE_ON_BUSY_SHARD_SQL):
+            picked = self.db.execute(statement, params).first()
+            if picked is not None:
+                return picked.shard_no
+
+        target = shard if shard is not None else random.randrange(shards)
+        if self._rebalance_into(type_id, target, quantity) and self._hold_on_shard(type_id, target, quantity):
+            return target
+        return None
+
+    def _hold_on_shard(self, type_id: int, shard: int, quantity: int) -> bool:
+        held = self.db.execute(
+            update(TicketTypeShardModel)
+            .where(
+                TicketTypeShardModel.type_id == type_id,
+                TicketTypeShardModel.shard_no == shard,
+                TicketTypeShardModel.sold_count + TicketTypeShardModel.reserved_count + quantity
+                <= TicketTypeShardModel.capacity,
+            )
+            .values(reserved_count=TicketTypeShardModel.reserved_count + quantity)
+            .returning(TicketTypeShardModel.shard_no)
+            .execution_options(synchronize_session=False)
+        ).first()
+        return held is not None
+
+    def _rebalance_into(self, type_id: int, target: int, quantity: int) -> bool:
+        """
+        Make room for quantity units on the target shard by moving capacity over from the
+        unassigned remainder of the ticket type and from the other shards. Locks the ticket type,
+        then all of its shards in shard_no order. This is the slow path, taken only when no
+        single shard has enough room.
+        """
+        ticket_type = (
+            self.db.query(TicketTypeModel)
+            .filter(TicketTypeModel.type_id == type_id)
+            .with_for_update(key_share=True)
+            .populate_existing()
+            .first()
+        )
+        shard_rows = (
+            self.db.query(TicketTypeShardModel)
+            .filter(TicketTypeShardModel.type_id == type_id)
+            .order_by(TicketTypeShardModel.shard_no)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        )
+        by_no = {row.shard_no: row for row in shard_rows}
+        if not ticket_type or target not in by_no:
+            return False
+
+        unassigned = (ticket_type.max_count - ticket_type.sold_count - ticket_type.reserved_count
+                      - sum(row.capacity for row in shard_rows))
+        target_row = by_no[target]
+        missing = quantity - (target_row.capacity - target_row.sold_count - target_row.reserved_count)
+        spare = sum(row.capacity - row.sold_count - row.reserved_count for row in shard_rows if row is not target_row)
+        if missing > max(0, unassigned) + spare:
+            return False
+
+        moved = min(max(0, unassigned), missing)
+        target_row.capacity += moved
+        missing -= moved
+        for row in shard_rows:
+            if missing <= 0:
+                break
+            if row is target_row:
+                continue
+            moved = min(row.capacity - row.sold_count - row.reserved_count, missing)
+            if moved > 0:
+                row.capacity -= moved
+                target_row.capacity += moved
+                missing -= moved
+        self.db.flush()
+        logger.info(f"Moved inventory of ticket type {type_id} into shard {target}")
+        return True
+
+    def release(self, type_id: int, quantity: int, shard: Optional[int] = None) -> None:
+        """Hand held units back, e.g. when a line is removed from the cart"""
+        if quantity <= 0:
+            return
+        if shard is not None:
+            self.db.execute(
+                update(TicketTypeShardModel)
+                .where(TicketTypeShardModel.type_id == type_id, TicketTypeShardModel.shard_no == shard)
+                .values(reserved_count=TicketTypeShardModel.reserved_count - quantity)
+                .execution_options(synchronize_session=False)
+            )
+            return
+        self.db.execute(
+            update(TicketTypeModel)
+            .where(TicketTypeModel.type_id == type_id)
+            .values(reserved_count=TicketTypeModel.reserved_count - quantity)
+            .execution_options(synchronize_session=False)
+        )
+
+    def sell_locked(self, per_type: Dict[int, Tuple[int, int]]) -> None:
+        """
+        Turn checked-out cart lines into sold units with one UPDATE. per_type maps type_id to
+        (quantity, held): the held part moves from reserved_count to sold_count, the rest is new.
+        The caller must have locked the ticket types and validated availability (see checkout);
+        the check constraints remain the backstop. Only for unsharded ticket types, see sell_sharded.
+        """
+        if not per_type:
+            return
+        type_ids = list(per_type)
+        self.db.execute(
+            _SELL_LOCKED_SQL,
+            {
+                "type_ids": type_ids,
+                "quantities": [per_type[type_id][0] for type_id in type_ids],
+                "held": [per_type[type_id][1] for type_id in type_ids],
+            },
+        )
+
+    def sell_sharded(self, type_id: int, shards: int, held: int, unheld: int, hold_shard: Optional[int]) -> bool:
+        """
+        Turn a cart line of a sharded ticket type into sold units. The held part moves from
+        reserved to sold wherever it is held; the unheld part (left over from an expired hold) is
+        first reserved on a shard like a fresh add-to-cart. Returns False when it no longer fits.
+        """
+        if unheld > 0:
+            shard = self.reserve_on_shard(type_id, unheld, shards, hold_shard)
+            if shard is None:
+                return False
+            self._convert_hold(type_id, shard, unheld)
+        if held > 0:
+            self._convert_hold(type_id, hold_shard, held)
+        return True
+
+    def _convert_hold(self, type_id: int, shard: Optional[int], quantity: int) -> None:
+        if shard is None:
+            # Held on the ticket type itself, from before the type was sharded
+            self.db.execute(
+                update(TicketTypeModel)
+                .where(TicketTypeModel.type_id == type_id)
+                .values(
+                    sold_count=TicketTypeModel.sold_count + quantity,
+                    reserved_count=TicketTypeModel.reserved_count - quantity,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            return
+        self.db.execute(
+            update(TicketTypeShardModel)
+            .where(TicketTypeShardModel.type_id == type_id, TicketTypeShardModel.shard_no == shard)
+            .values(
+                sold_count=TicketTypeShardModel.sold_count + quantity,
+                reserved_count=TicketTypeShardModel.reserved_count - quantity,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def set_shards(self, type_id: int, shards: int) -> TicketTypeModel:
+        """
+        Switch a ticket type between plain (shards == 1) and sharded inventory. Existing shards
+        are folded back into the ticket type counters together with the holds on them, then the
+        free units are split evenly across the new shards. Does not commit.
+        """
+        if not 1 <= shards <= MAX_INVENTORY_SHARDS:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                detail=f"Number of inventory shards must be between 1 and {MAX_INVENTORY_SHARDS}",
+            )
+
+        # Same lock order as add-to-cart and checkout: cart lines, the ticket type, its shards.
+        # Holds on shards move to the ticket type counters together with the shard counters below.
+        self.db.execute(
+            update(CartItemModel)
+            .where(CartItemModel.ticket_type_id == type_id, CartItemModel.hold_shard.isnot(None))
+            .values(hold_shard=None)
+            .execution_options(synchronize_session=False)
+        )
+        ticket_type = (
+            self.db.query(TicketTypeModel)
+            .filter(TicketTypeModel.type_id == type_id)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
+        if not ticket_type:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Ticket type not found")
+
+        existing = (
+            self.db.query(TicketTypeShardModel)
+            .filter(TicketTypeShardModel.type_id == type_id)
+            .order_by(TicketTypeShardModel.shard_no)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        )
+        for shard in existing:
+            ticket_type.sold_count += shard.sold_count
+            ticket_type.reserved_count += shard.reserved_count
+            self.db.delete(shard)
+        self.db.flush()
+
+        if shards > 1:
+            free = ticket_type.max_count - ticket_type.sold_count - ticket_type.reserved_count
+            for shard_no in range(shards):
+                # The remainder goes to the first shards
+                capacity = free // shards + (1 if shard_no < free % shards else 0)
+                self.db.add(TicketTypeShardModel(type_id=type_id, shard_no=shard_no, capacity=capacity))
+
+        ticket_type.inventory_shards = shards
+        self.db.flush()
+        self.db.expire(ticket_type, ["shards"])
+        logger.info(f"Ticket type {type_id} now uses {shards} inventory shard(s)")
+        return ticket_type
+
+    def sweep_expired_holds(self, type_id: Optional[int] = None, batch_size: int = HOLD_SWEEP_BATCH_SIZE) -> int:
+        """
+        Release up to batch_size expired holds, optionally only for one ticket type.
+        Returns the number of cart lines released. Does not commit.
+        """
+        released = self.db.execute(
+            _SWEEP_EXPIRED_HOLDS_SQL, {"type_id": type_id, "batch_size": batch_size}
+        ).scalar() or 0
+        if released:
+            logger.info(
+                f"Released {released} expired cart hold(s)" + (f" for ticket type {type_id}" if type_id else "")
+            )
+        return released
+
+
+# Dependency to get the InventoryRepository instance
+def get_inventory_repository(db: Session = Depends(get_db)) -> InventoryRepository:
+    return InventoryRepository(db)
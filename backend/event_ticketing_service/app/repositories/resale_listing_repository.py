@@ -0,0 +1,227 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import get_async_db, get_db
+from app.utils.read_routing import get_async_read_db
+from app.models.resale_listing import ResaleListingModel
+from app.utils.pagination import paginate, paginate_async
+
+SORT_FIELDS = {
+    "event_date": ResaleListingModel.event_date,
+    "resell_price": ResaleListingModel.resell_price,
+    "original_price": ResaleListingModel.original_price,
+    "event_name": ResaleListingModel.event_name,
+}
+
+logger = logging.getLogger(__name__)
+
+# Copies a ticket that is on resale into the read model, or refreshes its row.
+# Callers have just updated the ticket row, so its lock serializes concurrent changes to the listing.
+_LIST_TICKET_SQL = text("""
+    INSERT INTO resale_listings (
+        ticket_id, seller_id, resell_price, seat, type_id, ticket_type_description, original_price,
+        event_id, event_name, event_date, venue_name, listed_at
+    )
+    SELECT t.ticket_id, t.owner_id, t.resell_price, t.seat, tt.type_id, tt.description, tt.price,
+           e.event_id, e.name, e.start_date, l.name, now()
+    FROM tickets t
+    JOIN ticket_types tt ON tt.type_id = t.type_id
+    JOIN events e ON e.event_id = tt.event_id
+    JOIN locations l ON l.location_id = e.location_id
+    WHERE t.ticket_id = :ticket_id AND t.resell_price IS NOT NULL
+    ON CONFLICT (ticket_id) DO UPDATE
+    SET seller_id = EXCLUDED.seller_id,
+        resell_price = EXCLUDED.resell_price,
+        seat = EXCLUDED.seat,
+        listed_at = EXCLUDED.listed_at
+""")
+
+# Re-copies the event details into all listings of an event after the event changed
+_REFRESH_EVENT_SQL = text("""
+    UPDATE resale_listings
+    SET event_name = e.name, event_date = e.start_date, venue_name = l.name
+    FROM events e
+    JOIN locations l ON l.location_id = e.location_id
+    WHERE e.event_id = :event_id AND resale_listings.event_id = e.event_id
+""")
+
+
+def _search_filters(
+    query,
+    sort_by: str,
+    sort_order: str,
+    seller_id: Optional[int],
+    search: Optional[str],
+    search_description: bool,
+    event_id: Optional[int],
+    venue: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    min_original_price: Optional[float],
+    max_original_price: Optional[float],
+    event_date_from: Optional[datetime],
+    event_date_to: Optional[datetime],
+    has_seat: Optional[bool],
+):
+    """Applies the search filters to a query (Query or select()) of resale listings"""
+    if sort_by not in SORT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sort_by. Must be one of: event_date, resell_price, original_price, event_name"
+        )
+    if sort_order not in ["asc", "desc"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sort_order. Must be 'asc' or 'desc'"
+        )
+
+    if seller_id is not None:
+        query = query.filter(ResaleListingModel.seller_id == seller_id)
+
+    if search:
+        search_filter = f"%{search}%"
+        columns = [ResaleListingModel.event_name, ResaleListingModel.venue_name]
+        if search_description:
+            columns.append(ResaleListingModel.ticket_type_description)
+        query = query.filter(or_(*(column.ilike(search_filter) for column in columns)))
+
+    if event_id:
+        query = query.filter(ResaleListingModel.event_id == event_id)
+    if venue:
+        query = query.filter(ResaleListingModel.venue_name.ilike(f"%{venue}%"))
+
+    if min_price is not None:
+        query = query.filter(ResaleListingModel.resell_price >= min_price)
+    if max_price is not None:
+        query = query.filter(ResaleListingModel.resell_price <= max_price)
+    if min_original_price is not None:
+        query = query.filter(ResaleListingModel.original_price >= min_original_price)
+    if max_original_price is not None:
+        query = query.filter(ResaleListingModel.original_price <= max_original_price)
+
+    if event_date_from is not None:
+        query = query.filter(ResaleListingModel.event_date >= event_date_from)
+    if event_date_to is not None:
+        query = query.filter(ResaleListingModel.event_date <= event_date_to)
+
+    if has_seat is not None:
+        if has_seat:
+            query = query.filter(ResaleListingModel.seat.isnot(None))
+        else:
+            query = query.filter(ResaleListingModel.seat.is_(None))
+
+    return query
+
+
+class ResaleListingRepository:
+    """
+    The resale_listings read model: one narrow row per ticket on resale. Writers call
+    list_ticket / unlist_ticket / refresh_event in the same transaction as the change they
+    make to tickets or events; none of these methods commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def list_ticket(self, ticket_id: int) -> None:
+        self.db.execute(_LIST_TICKET_SQL, {"ticket_id": ticket_id})
+
+    def unlist_ticket(self, ticket_id: int) -> None:
+        self.db.query(ResaleListingModel).filter(ResaleListingModel.ticket_id == ticket_id).delete(
+            synchronize_session=False
+        )
+
+    def refresh_event(self, event_id: int) -> None:
+        self.db.execute(_REFRESH_EVENT_SQL, {"event_id": event_id})
+
+    def search(
+        self,
+        page: int,
+        limit: int,
+        sort_by: str = "event_date",
+        sort_order: str = "asc",
+        seller_id: Optional[int] = None,
+        search: Optional[str] = None,
+        search_description: bool = True,
+        event_id: Optional[int] = None,
+        venue: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_original_price: Optional[float] = None,
+        max_original_price: Optional[float] = None,
+        event_date_from: Optional[datetime] = None,
+        event_date_to: Optional[datetime] = None,
+        has_seat: Optional[bool] = None,
+        after: Optional[str] = None,
+    ) -> Tuple[List[ResaleListingModel], Optional[str]]:
+        """Returns one page of listings and the cursor of the next page (None on the last page)"""
+        query = _search_filters(
+            self.db.query(ResaleListingModel), sort_by, sort_order, seller_id, search, search_description, event_id,
+            venue, min_price, max_price, min_original_price, max_original_price, event_date_from, event_date_to,
+            has_seat,
+        )
+        # ticket_id breaks ties, matching the (sort column, ticket_id) indexes
+        return paginate(
+            query, SORT_FIELDS[sort_by], ResaleListingModel.ticket_id, sort_by, sort_order, page, limit, after
+        )
+
+
+class AsyncResaleListingRepository:
+    """Reads of the resale_listings read model on an async session, for async def endpoints"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def search(
+        self,
+        page: int,
+        limit: int,
+        sort_by: str = "event_date",
+        sort_order: str = "asc",
+        seller_id: Optional[int] = None,
+        search: Optional[str] = None,
+        search_description: bool = True,
+        event_id: Optional[int] = None,
+        venue: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_original_price: Optional[float] = None,
+        max_original_price: Optional[float] = None,
+        event_date_from: Optional[datetime] = None,
+        event_date_to: Optional[datetime] = None,
+        has_seat: Optional[bool] = None,
+        after: Optional[str] = None,
+    ) -> Tuple[List[ResaleListingModel], Optional[str]]:
+        """ResaleListingRepository.search on an async session"""
+        statement = _search_filters(
+            select(ResaleListingModel), sort_by, sort_order, seller_id, search, search_description, event_id,
+            venue, min_price, max_price, min_original_price, max_original_price, event_date_from, event_date_to,
+            has_seat,
+        )
+        return await paginate_async(
+            self.db, statement, SORT_FIELDS[sort_by], ResaleListingModel.ticket_id, sort_by, sort_order, page, limit,
+            after,
+        )
+
+
+# Dependency to get the ResaleListingRepository instance
+def get_resale_listing_repository(db: Session = Depends(get_db)) -> ResaleListingRepository:
+    return ResaleListingRepository(db)
+
+
+# Dependency to get the AsyncResaleListingRepository instance
+def get_async_resale_listing_repository(db: AsyncSession = Depends(get_async_db)) -> AsyncResaleListingRepository:
+    return AsyncResaleListingRepository(db)
+
+
+# Dependency to get the AsyncResaleListingRepository instance for read-only endpoints, on the read replica
+def get_async_read_resale_listing_repository(
+    db: AsyncSession = Depends(get_async_read_db),
+) -> AsyncResaleListingRepository:
+    return AsyncResaleListingRepository(db)
@@ -1,21 +1,97 @@
+import os
 import logging
-from typing import List, Optional
+from decimal import Decimal
+from typing import List, Optional, Tuple
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from app.database import get_db
+from app.database import get_async_db, get_db
+from app.utils.read_routing import get_async_read_db
 from app.models.ticket import TicketModel
 from fastapi import HTTPException, status, Depends
 from app.filters.ticket_filter import TicketFilter
-from app.schemas.ticket import TicketPDF, ResellTicketRequest
+from app.filters.ticket_type_filter import TicketTypeFilter
+from app.schemas.ticket import TicketPDF, ResellTicketRequest, TicketDetails
 from app.models.events import EventModel
 from app.models.ticket_type import TicketTypeModel
 from app.models.location import LocationModel
-from app.services.email import send_ticket_email
+from app.repositories.event_summary_repository import EventSummaryRepository
+from app.repositories.resale_listing_repository import ResaleListingRepository
+from app.services.email_outbox import enqueue_ticket_emails
+from app.services.idempotency import IdempotencyGuard
+from app.services.cache import TTLCache
+from app.services.catalog_versions import (
+    EVENTS, INVENTORY, RESALE, TICKET_TYPES, bump_versions, read_versions, read_versions_async
+)
 from app.schemas.ticket import TicketType
 
+TICKET_TYPE_CACHE_TTL_SECONDS = float(os.getenv("TICKET_TYPE_CACHE_TTL_SECONDS", "300"))
+TICKET_TYPE_CACHE_SIZE = int(os.getenv("TICKET_TYPE_CACHE_SIZE", "1024"))
+
 logger = logging.getLogger(__name__)
 
+# Ticket types by ID and filtered lists of them. Keys carry the ticket type and inventory versions
+# the value was read at, so writes that bump them turn lookups into misses on every instance.
+_ticket_type_cache = TTLCache("ticket_types", maxsize=TICKET_TYPE_CACHE_SIZE, ttl_seconds=TICKET_TYPE_CACHE_TTL_SECONDS)
+
+# Columns of TicketDetails, labelled with its field names
+_TICKET_DETAILS_COLUMNS = (
+    TicketModel.ticket_id,
+    TicketModel.type_id,
+    TicketModel.seat,
+    TicketModel.owner_id,
+    TicketModel.resell_price,
+    TicketTypeModel.price.label('original_price'),
+    EventModel.name.label('event_name'),
+    EventModel.start_date.label('event_start_date'),
+    LocationModel.name.label('event_location'),
+    TicketTypeModel.description.label('ticket_type_description'),
+)
+
+
+def _filter_tickets(query, filters: TicketFilter):
+    """Joins and filters a query (Query or select()) of _TICKET_DETAILS_COLUMNS"""
+    query = (
+        query
+        .join(TicketTypeModel, TicketModel.type_id == TicketTypeModel.type_id)
+        .join(EventModel, TicketTypeModel.event_id == EventModel.event_id)
+        .join(LocationModel, EventModel.location_id == LocationModel.location_id)
+    )
+
+    if filters.ticket_id is not None:
+        query = query.filter(TicketModel.ticket_id == filters.ticket_id)
+    if filters.type_id is not None:
+        query = query.filter(TicketModel.type_id == filters.type_id)
+    if filters.owner_id is not None:
+        query = query.filter(TicketModel.owner_id == filters.owner_id)
+    if filters.is_on_resale is not None:
+        if filters.is_on_resale:
+            query = query.filter(TicketModel.resell_price.isnot(None))
+        else:
+            query = query.filter(TicketModel.resell_price.is_(None))
+    return query
+
+
+def _filter_ticket_types(query, filters: TicketTypeFilter):
+    """Filters a query (Query or select()) of ticket types, loading their shards for remaining_count"""
+    query = query.options(selectinload(TicketTypeModel.shards))
+    if filters.type_id is not None:
+        query = query.filter(TicketTypeModel.type_id == filters.type_id)
+    if filters.event_id is not None:
+        query = query.filter(TicketTypeModel.event_id == filters.event_id)
+    if filters.min_price is not None:
+        query = query.filter(TicketTypeModel.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(TicketTypeModel.price <= filters.max_price)
+    return query
+
+
+def _ticket_types_key(filters: TicketTypeFilter, versions: Tuple[int, ...]) -> Tuple:
+    return ("list", filters.type_id, filters.event_id, filters.min_price, filters.max_price, versions)
+
+
 class TicketRepository:
     """Service layer for ticket operations."""
 
@@ -23,55 +99,10 @@ class TicketRepository:
         self.db = db
 
     def list_tickets(self, filters: TicketFilter) -> List[dict]:
-        query = (
-            self.db.query(
-                TicketModel.ticket_id,
-                TicketModel.type_id,
-                TicketModel.seat,
-                TicketModel.owner_id,
-                TicketModel.resell_price,
-                TicketTypeModel.price.label('original_price'),
-                EventModel.name.label('event_name'),
-                EventModel.start_date.label('event_start_date'),
-                LocationModel.name.label('event_location'),
-                TicketTypeModel.description.label('ticket_type_description')
-            )
-            .join(TicketTypeModel, TicketModel.type_id == TicketTypeModel.type_id)
-            .join(EventModel, TicketTypeModel.event_id == EventModel.event_id)
-            .join(LocationModel, EventModel.location_id == LocationModel.location_id)
-        )
-
-        if filters.ticket_id is not None:
-            query = query.filter(TicketModel.ticket_id == filters.ticket_id)
-        if filters.type_id is not None:
-            query = query.filter(TicketModel.type_id == filters.type_id)
-        if filters.owner_id is not None:
-            query = query.filter(TicketModel.owner_id == filters.owner_id)
-        if filters.is_on_resale is not None:
-            if filters.is_on_resale:
-                query = query.filter(TicketModel.resell_price.isnot(None))
-            else:
-                query = query.filter(TicketModel.resell_price.is_(None))
-        results = query.all()
+        results = _filter_tickets(self.db.query(*_TICKET_DETAILS_COLUMNS), filters).all()
 
         # Convert to dictionaries that match the TicketDetails schema
-        tickets = []
-        for result in results:
-            ticket_dict = {
-                'ticket_id': result.ticket_id,
-                'type_id': result.type_id,
-                'seat': result.seat,
-                'owner_id': result.owner_id,
-                'resell_price': result.resell_price,
-                'original_price': result.original_price,
-                'event_name': result.event_name,
-                'event_start_date': result.event_start_date,
-                'event_location': result.event_location,
-                'ticket_type_description': result.ticket_type_description
-            }
-            tickets.append(ticket_dict)
-
-        return tickets
+        return [result._asdict() for result in results]
 
     def get_ticket(self, ticket_id: int) -> Optional[TicketModel]:
         ticket = self.db.get(TicketModel, ticket_id)
@@ -79,11 +110,27 @@ class TicketRepository:
             raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Ticket not found")
         return ticket
 
-    def get_ticket_type_by_id(self, type_id: int) -> Optional[TicketTypeModel]:
+    def get_ticket_type_by_id(self, type_id: int) -> Optional[TicketType]:
         """
-        Retrieves a ticket type by its ID.
+        Retrieves a ticket type by its ID, from the cache while its versions are unchanged.
         """
-        return self.db.get(TicketTypeModel, type_id)
+        def load() -> Optional[TicketType]:
+            model = self.db.get(TicketTypeModel, type_id)
+            return TicketType.model_validate(model) if model else None
+
+        versions = read_versions(self.db, [TICKET_TYPES, INVENTORY])
+        return _ticket_type_cache.get_or_load(("id", type_id, versions), load)
+
+    def get_ticket_types(self, filters: TicketTypeFilter) -> List[TicketType]:
+        """
+        Retrieves the ticket types matching the filters, from the cache while their versions are unchanged.
+        """
+        def load() -> List[TicketType]:
+            query = _filter_ticket_types(self.db.query(TicketTypeModel), filters)
+            return [TicketType.model_validate(t) for t in query.all()]
+
+        versions = read_versions(self.db, [TICKET_TYPES, INVENTORY])
+        return _ticket_type_cache.get_or_load(_ticket_types_key(filters, versions), load)
 
     def download_ticket(self, ticket_id: int) -> TicketPDF:
         ticket = self.get_ticket(ticket_id)
@@ -98,46 +145,98 @@ class TicketRepository:
 
         return query.all()
 
-    def buy_resale_ticket(self, ticket_id: int, buyer_id: int, buyer_email: str, buyer_name: str) -> TicketModel:
-        ticket = self.get_ticket(ticket_id)
+    def claim_resale_listing(self, ticket_id: int, buyer_id: int, seller_id: Optional[int],
+                             listed_price: Decimal) -> Optional[TicketDetails]:
+        """
+        Compare-and-swap the ownership of a listed ticket: one conditional UPDATE that only matches
+        while the ticket still belongs to seller_id at listed_price. Returns the ticket as bought,
+        or None when another buyer (or a price change) got there first. The row stays locked only
+        until the caller commits. Does not commit.
+        """
+        claimed = self.db.execute(
+            update(TicketModel)
+            .where(
+                TicketModel.ticket_id == ticket_id,
+                TicketModel.owner_id.is_not_distinct_from(seller_id),
+                TicketModel.resell_price == listed_price,
+            )
+            .values(owner_id=buyer_id, resell_price=None)
+            .returning(
+                TicketModel.ticket_id, TicketModel.type_id, TicketModel.seat,
+                TicketModel.owner_id, TicketModel.resell_price,
+            )
+            .execution_options(synchronize_session=False)
+        ).first()
+        if claimed is None:
+            return None
+        return TicketDetails.model_validate(claimed)
 
-        if ticket.resell_price is None:
+    def buy_resale_ticket(self, ticket_id: int, buyer_id: int, buyer_email: str, buyer_name: str,
+                          idempotency: Optional[IdempotencyGuard] = None,
+                          expected_price: Optional[float] = None) -> TicketDetails:
+        # Plain read of the listing and everything the confirmation email needs; no lock is taken
+        listing = (
+            self.db.query(
+                TicketModel.ticket_id,
+                TicketModel.owner_id,
+                TicketModel.resell_price,
+                TicketModel.seat,
+                EventModel.name.label("event_name"),
+                EventModel.start_date,
+                LocationModel.name.label("venue_name"),
+            )
+            .join(TicketTypeModel, TicketModel.type_id == TicketTypeModel.type_id)
+            .join(EventModel, TicketTypeModel.event_id == EventModel.event_id)
+            .join(LocationModel, EventModel.location_id == LocationModel.location_id)
+            .filter(TicketModel.ticket_id == ticket_id)
+            .first()
+        )
+        if not listing:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Ticket not found")
+
+        if listing.resell_price is None:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Ticket is not for resale")
 
-        if ticket.owner_id == buyer_id:
+        if listing.owner_id == buyer_id:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Cannot buy your own ticket")
 
-        ticket.owner_id = buyer_id
-        ticket.resell_price = None
-
-        self.db.commit()
-        self.db.refresh(ticket)
-
-        ticket_info = self.db.query(TicketModel).options(
-            joinedload(TicketModel.ticket_type)
-            .joinedload(TicketTypeModel.event)
-            .joinedload(EventModel.location)
-        ).filter(TicketModel.ticket_id == ticket_id).first()
+        if expected_price is not None and Decimal(str(expected_price)) != listing.resell_price:
+            raise HTTPException(
+                status.HTTP_409_CONFLICT,
+                detail=f"The price of this ticket changed to {listing.resell_price}. Please review it and try again.",
+            )
 
-        # Format the date and time as strings
-        event_datetime = ticket_info.ticket_type.event.start_date
-        formatted_event_date = event_datetime.strftime("%B %d, %Y")  # e.g., "June 15, 2025"
-        formatted_event_time = event_datetime.strftime("%I:%M %p")  # e.g., "02:30 PM"
+        ticket = self.claim_resale_listing(ticket_id, buyer_id, listing.owner_id, listing.resell_price)
+        if ticket is None:
+            self.db.rollback()
+            logger.info(f"Resale purchase of ticket_id {ticket_id} by user_id {buyer_id} lost the race")
+            raise HTTPException(
+                status.HTTP_409_CONFLICT,
+                detail="This ticket was just bought by someone else or its listing changed.",
+            )
+        ResaleListingRepository(self.db).unlist_ticket(ticket_id)
 
-        email_sent = send_ticket_email(
+        # Queue the confirmation in the same transaction as the ownership transfer
+        enqueue_ticket_emails(
+            self.db,
             to_email=buyer_email,
             user_name=buyer_name,
-            event_name=ticket_info.ticket_type.event.name,
-            ticket_id=str(ticket_info.ticket_id),
-            event_date=formatted_event_date,
-            event_time=formatted_event_time,
-            venue=ticket_info.ticket_type.event.location.name,
-            seat=ticket_info.seat,
+            tickets=[{
+                "event_name": listing.event_name,
+                "ticket_id": str(listing.ticket_id),
+                "event_date": listing.start_date.strftime("%B %d, %Y"),  # e.g., "June 15, 2025"
+                "event_time": listing.start_date.strftime("%I:%M %p"),  # e.g., "02:30 PM"
+                "venue": listing.venue_name,
+                "seat": listing.seat,
+            }],
         )
-        if not email_sent:
-            logger.error(
-                f"Failed to send confirmation email for ticket {ticket_id} to {buyer_email}")
 
+        # Store the response for Idempotency-Key replays in the same transaction
+        if idempotency:
+            idempotency.complete(ticket.model_dump(mode="json"))
+
+        self.db.commit()
+        bump_versions(self.db, RESALE)
         return ticket
 
     def resell_ticket(self, data: ResellTicketRequest, user_id: int) -> TicketModel:
@@ -147,7 +246,10 @@ class TicketRepository:
         if data.price is None:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Resell price required")
         ticket.resell_price = data.price
+        self.db.flush()
+        ResaleListingRepository(self.db).list_ticket(ticket.ticket_id)
         self.db.commit()
+        bump_versions(self.db, RESALE)
         self.db.refresh(ticket)
         return ticket
 
@@ -156,7 +258,10 @@ class TicketRepository:
         if ticket.owner_id != user_id:
             raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Not the ticket owner")
         ticket.resell_price = None
+        self.db.flush()
+        ResaleListingRepository(self.db).unlist_ticket(ticket_id)
         self.db.commit()
+        bump_versions(self.db, RESALE)
         self.db.refresh(ticket)
         return ticket
 
@@ -182,11 +287,68 @@ class TicketRepository:
         )
 
         self.db.add(db_ticket_type)
+        self.db.flush()
+        EventSummaryRepository(self.db).refresh(db_ticket_type.event_id)
         self.db.commit()
+        bump_versions(self.db, EVENTS, TICKET_TYPES)
         self.db.refresh(db_ticket_type)
 
         return TicketType.model_validate(db_ticket_type)
 
+
+class AsyncTicketRepository:
+    """
+    Ticket operations on an async session, for async def endpoints. Reads are native async
+    queries; writes run TicketRepository's implementation on the same connection (run_sync),
+    so there is one copy of their locking and read model upkeep.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def list_tickets(self, filters: TicketFilter) -> List[dict]:
+        results = await self.db.execute(_filter_tickets(select(*_TICKET_DETAILS_COLUMNS), filters))
+        return [result._asdict() for result in results]
+
+    async def get_ticket_type_by_id(self, type_id: int) -> Optional[TicketType]:
+        """TicketRepository.get_ticket_type_by_id on an async session, sharing its cache"""
+        async def load() -> Optional[TicketType]:
+            model = await self.db.get(TicketTypeModel, type_id, options=[selectinload(TicketTypeModel.shards)])
+            return TicketType.model_validate(model) if model else None
+
+        versions = await read_versions_async(self.db, [TICKET_TYPES, INVENTORY])
+        return await _ticket_type_cache.aget_or_load(("id", type_id, versions), load)
+
+    async def get_ticket_types(self, filters: TicketTypeFilter) -> List[TicketType]:
+        """TicketRepository.get_ticket_types on an async session, sharing its cache"""
+        async def load() -> List[TicketType]:
+            ticket_types = await self.db.scalars(_filter_ticket_types(select(TicketTypeModel), filters))
+            return [TicketType.model_validate(t) for t in ticket_types]
+
+        versions = await read_versions_async(self.db, [TICKET_TYPES, INVENTORY])
+        return await _ticket_type_cache.aget_or_load(_ticket_types_key(filters, versions), load)
+
+    async def resell_ticket(self, data: ResellTicketRequest, user_id: int) -> TicketDetails:
+        return await self.db.run_sync(
+            lambda session: TicketDetails.model_validate(TicketRepository(session).resell_ticket(data, user_id))
+        )
+
+    async def cancel_resell(self, ticket_id: int, user_id: int) -> TicketDetails:
+        return await self.db.run_sync(
+            lambda session: TicketDetails.model_validate(TicketRepository(session).cancel_resell(ticket_id, user_id))
+        )
+
+
 # Dependency to get the TicketRepository instance
 def get_ticket_repository(db: Session = Depends(get_db)) -> TicketRepository:
     return TicketRepository(db)
+
+
+# Dependency to get the AsyncTicketRepository instance
+def get_async_ticket_repository(db: AsyncSession = Depends(get_async_db)) -> AsyncTicketRepository:
+    return AsyncTicketRepository(db)
+
+
+# Dependency to get the AsyncTicketRepository instance for read-only endpoints, on the read replica
+def get_async_read_ticket_repository(db: AsyncSession = Depends(get_async_read_db)) -> AsyncTicketRepository:
+    return AsyncTicketRepository(db)
@@ -0,0 +1,122 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models.events import EventModel
+from app.models.cart_item_model import CartItemModel
+from app.models.shopping_cart_model import ShoppingCartModel
+from app.models.ticket_type import TicketTypeModel
+from app.models.waiting_room import WaitingRoomModel
+from app.schemas.waiting_room import WaitingRoomConfig
+
+# How long a waiting room stays active when the organizer does not say otherwise
+WAITING_ROOM_DEFAULT_DURATION_MINUTES = int(os.getenv("WAITING_ROOM_DEFAULT_DURATION_MINUTES", "120"))
+
+logger = logging.getLogger(__name__)
+
+
+class WaitingRoomRepository:
+    """Persistence of waiting rooms and the lookups the admission gate needs"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_room(self, event_id: int) -> WaitingRoomModel:
+        room = self.db.get(WaitingRoomModel, event_id)
+        if not room:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"No waiting room for event {event_id}")
+        return room
+
+    def get_open_rooms(self, now: datetime) -> List[WaitingRoomModel]:
+        """Rooms that have not closed yet, including the ones still waiting for their opening time"""
+        return self.db.query(WaitingRoomModel).filter(WaitingRoomModel.closes_at > now).all()
+
+    def configure_room(
+        self, event_id: int, config: WaitingRoomConfig, organizer_id: int, now: datetime
+    ) -> WaitingRoomModel:
+        event = self.db.query(EventModel).filter(EventModel.event_id == event_id).first()
+        if not event:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Event not found")
+        if event.organizer_id != organizer_id:
+            raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Not authorized to manage this event")
+
+        opens_at = config.opens_at
+        if opens_at is None:
+            # Open when the first ticket type goes on sale, or right away if sales already started
+            sales_start = (
+                self.db.query(func.min(TicketTypeModel.available_from))
+                .filter(TicketTypeModel.event_id == event_id)
+                .scalar()
+            )
+            opens_at = max(now, sales_start) if sales_start else now
+        closes_at = config.closes_at or opens_at + timedelta(minutes=WAITING_ROOM_DEFAULT_DURATION_MINUTES)
+        if closes_at <= opens_at:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Waiting room must close after it opens")
+
+        room = self.db.get(WaitingRoomModel, event_id)
+        if not room:
+            room = WaitingRoomModel(event_id=event_id, issued_count=0)
+            self.db.add(room)
+        room.admission_rate_per_minute = config.admission_rate_per_minute
+        room.opens_at = opens_at
+        room.closes_at = closes_at
+        self.db.commit()
+        self.db.refresh(room)
+        logger.info(f"Waiting room for event {event_id} set to {room.admission_rate_per_minute}/min "
+                    f"from {room.opens_at} to {room.closes_at}")
+        return room
+
+    def delete_room(self, event_id: int, organizer_id: int) -> None:
+        room = self.get_room(event_id)
+        event = self.db.query(EventModel).filter(EventModel.event_id == event_id).first()
+        if event.organizer_id != organizer_id:
+            raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Not authorized to manage this event")
+        self.db.delete(room)
+        self.db.commit()
+
+    def issue_position(self, event_id: int, now: datetime) -> Tuple[int, WaitingRoomModel]:
+        """
+        Hand out the next queue position with one atomic UPDATE ... RETURNING and commit right away,
+        so the row lock is held only for the duration of the increment.
+        """
+        issued = self.db.execute(
+            update(WaitingRoomModel)
+            .where(WaitingRoomModel.event_id == event_id, WaitingRoomModel.closes_at > now)
+            .values(issued_count=WaitingRoomModel.issued_count + 1)
+            .returning(WaitingRoomModel.issued_count)
+            .execution_options(synchronize_session=False)
+        ).first()
+        self.db.commit()
+        if issued is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"No open waiting room for event {event_id}")
+        return issued.issued_count, self.get_room(event_id)
+
+    def get_event_id_for_ticket_type(self, ticket_type_id: int) -> Optional[int]:
+        return (
+            self.db.query(TicketTypeModel.event_id)
+            .filter(TicketTypeModel.type_id == ticket_type_id)
+            .scalar()
+        )
+
+    def get_cart_event_ids(self, customer_id: int) -> List[int]:
+        """Events with at least one ticket type in the customer's cart"""
+        rows = (
+            self.db.query(TicketTypeModel.event_id)
+            .join(CartItemModel, CartItemModel.ticket_type_id == TicketTypeModel.type_id)
+            .join(ShoppingCartModel, ShoppingCartModel.cart_id == CartItemModel.cart_id)
+            .filter(ShoppingCartModel.customer_id == customer_id)
+            .distinct()
+            .all()
+        )
+        return [row.event_id for row in rows]
+
+
+# Dependency to get the WaitingRoomRepository instance
+def get_waiting_room_repository(db: Session = Depends(get_db)) -> WaitingRoomRepository:
+    return WaitingRoomRepository(db)
@@ -1,58 +1,63 @@
 from typing import List, Optional
 from datetime import datetime
 
-from app.database import get_db
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc, asc
-from fastapi import Path, Depends, APIRouter, Query, HTTPException, status
-from app.filters.events_filter import EventsFilter
-from app.repositories.event_repository import EventRepository, get_event_repository
-from app.schemas.event import EventBase, EventUpdate, EventDetails, NotificationRequest
+from app.utils.read_routing import get_async_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, selectinload, with_expression
+from sqlalchemy import Select, func, select
+from fastapi import Path, Depends, APIRouter, Query, HTTPException, Response, status
+from app.repositories.event_repository import (
+    AsyncEventRepository, EventRepository, get_async_event_repository, get_event_repository
+)
+from app.schemas.event import CategoryFacet, EventBase, EventUpdate, EventDetails, NotificationRequest
 from app.utils.jwt_auth import get_current_organizer, get_current_admin
+from app.utils.pagination import NEXT_CURSOR_HEADER, paginate_async
+from app.services.event_search import relevance, search_filter
+from app.services.catalog_versions import EVENTS, INVENTORY, LOCATIONS, conditional_get
 from app.models.events import EventModel
 from app.models.location import LocationModel
 from app.models.ticket_type import TicketTypeModel
+from app.utils.sync_limiter import SyncLimitedRoute
 
-router = APIRouter(prefix="/events", tags=["events"])
+router = APIRouter(prefix="/events", tags=["events"], route_class=SyncLimitedRoute)
 
 
 @router.post("/", response_model=EventDetails)
 async def create_event(
         event_data: EventBase,
-        event_repo: EventRepository = Depends(get_event_repository),
+        event_repo: AsyncEventRepository = Depends(get_async_event_repository),
         current_organizer=Depends(get_current_organizer)
 ):
     """Create a new event (requires authentication)"""
-    return event_repo.create_event(event_data, current_organizer["role_id"])
+    return await event_repo.create_event(event_data, current_organizer["role_id"])
 
 
 @router.post("/authorize/{event_id}", response_model=bool)
 async def authorize_event(
         event_id: int = Path(..., title="Event ID"),
-        event_repo: EventRepository = Depends(get_event_repository),
+        event_repo: AsyncEventRepository = Depends(get_async_event_repository),
         current_admin=Depends(get_current_admin)
 ):
     """Authorize an event (requires admin authentication)"""
-    event_repo.authorize_event(event_id)
+    await event_repo.authorize_event(event_id)
     return True
 
 
 @router.post("/reject/{event_id}", response_model=bool)
 async def reject_event(
         event_id: int = Path(..., title="Event ID"),
-        event_repo: EventRepository = Depends(get_event_repository),
+        event_repo: AsyncEventRepository = Depends(get_async_event_repository),
         current_admin=Depends(get_current_admin)
 ):
     """Reject an event (requires admin authentication)"""
-    event_repo.reject_event(event_id)
+    await event_repo.reject_event(event_id)
     return True
 
 
-@router.get("", response_model=List[EventDetails])
-def get_events_endpoint(
-        page: int = Query(1, ge=1, description="Page number"),
-        limit: int = Query(50, ge=1, le=100, description="Items per page"),
-        search: Optional[str] = Query(None, description="Search by event name or description"),
+def filtered_events(
+        search: Optional[str] = Query(
+            None, description="Search by event name or description (words, substrings of the name, close spellings)"
+        ),
         location: Optional[str] = Query(None, description="Filter by location name"),
         start_date_from: Optional[datetime] = Query(None,
                                                     description="Events starting after this date"),
@@ -65,30 +70,23 @@ def get_events_endpoint(
         organizer_id: Optional[int] = Query(None, description="Filter by specific organizer"),
         minimum_age: Optional[int] = Query(None, ge=0,
                                            description="Minimum required age for attendees"),
-        status: Optional[str] = Query(None, description="Filter by event status"),
+        event_status: Optional[str] = Query(None, alias="status", description="Filter by event status"),
         categories: Optional[str] = Query(None,
                                           description="Filter by categories (comma-separated)"),
-        sort_by: str = Query("start_date",
-                             description="Sort field (start_date, name, creation_date)"),
-        sort_order: str = Query("asc", description="Sort order (asc/desc)"),
-        db: Session = Depends(get_db),
-):
-    """
-    Get list of events with advanced filtering, searching, and pagination
-    """
+        categories_match: str = Query("any",
+                                      description="Match events in any (any) or all (all) of the categories"),
+        has_available_tickets: Optional[bool] = Query(
+            None, description="Only events that are (true) or are not (false) sold out"
+        ),
+) -> Select:
+    """Events matching the list filters, shared by the event list and the category facets"""
     # Build the query with joins for filtering
-    query = db.query(EventModel).join(LocationModel,
-                                      EventModel.location_id == LocationModel.location_id)
+    query = select(EventModel).join(LocationModel,
+                                    EventModel.location_id == LocationModel.location_id)
 
     # Apply search filter
     if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            or_(
-                EventModel.name.ilike(search_filter),
-                EventModel.description.ilike(search_filter)
-            )
-        )
+        query = query.filter(search_filter(search))
 
     # Apply location filter
     if location:
@@ -109,37 +107,96 @@ def get_events_endpoint(
         query = query.filter(EventModel.minimum_age >= minimum_age)
 
     # Apply status filter
-    if status:
-        if status not in ["pending", "created", "rejected", "cancelled"]:
+    if event_status:
+        if event_status not in ["pending", "created", "rejected", "cancelled"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid status. Must be one of: pending, created, rejected, cancelled"
             )
-        query = query.filter(EventModel.status == status)
+        query = query.filter(EventModel.status == event_status)
 
-    # Apply price filters (requires subquery on ticket types)
-    if min_price is not None or max_price is not None:
-        price_subquery = db.query(TicketTypeModel.event_id).distinct()
-        if min_price is not None:
-            price_subquery = price_subquery.filter(TicketTypeModel.price >= min_price)
-        if max_price is not None:
-            price_subquery = price_subquery.filter(TicketTypeModel.price <= max_price)
+    # Apply price filters, events whose ticket price range overlaps the requested one
+    if min_price is not None:
+        query = query.filter(EventModel.max_price >= min_price)
+    if max_price is not None:
+        query = query.filter(EventModel.min_price <= max_price)
 
-        query = query.filter(EventModel.event_id.in_(price_subquery))
+    # Apply availability filter
+    if has_available_tickets is not None:
+        query = query.filter(EventModel.sold_out.is_(not has_available_tickets))
 
-    # Apply categories filter (simplified - assuming categories are stored as comma-separated values in description or using JSON)
+    # Apply categories filter, && and @> on the GIN-indexed categories array
+    if categories_match not in ["any", "all"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid categories_match. Must be 'any' or 'all'"
+        )
     if categories:
-        category_list = [cat.strip() for cat in categories.split(",")]
-        category_filters = [EventModel.description.ilike(f"%{cat}%") for cat in category_list]
-        query = query.filter(or_(*category_filters))
+        category_list = [cat.strip() for cat in categories.split(",") if cat.strip()]
+        if categories_match == "all":
+            query = query.filter(EventModel.categories.contains(category_list))
+        else:
+            query = query.filter(EventModel.categories.overlap(category_list))
+
+    return query
+
 
+@router.get("/categories", response_model=List[CategoryFacet], dependencies=[Depends(conditional_get(EVENTS))])
+async def get_category_facets(
+        limit: int = Query(50, ge=1, le=200, description="Number of categories"),
+        query: Select = Depends(filtered_events),
+        db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Count the events per category among the events matching the filters, most common first
+    """
+    matching = query.with_only_columns(func.unnest(EventModel.categories).label("category")).subquery()
+    events = func.count().label("events")
+    facets = await db.execute(
+        select(matching.c.category, events)
+        .group_by(matching.c.category)
+        .order_by(events.desc(), matching.c.category)
+        .limit(limit)
+    )
+    return [CategoryFacet(category=category, events=count) for category, count in facets]
+
+
+@router.get("", response_model=List[EventDetails],
+            dependencies=[Depends(conditional_get(EVENTS, INVENTORY, LOCATIONS))])
+async def get_events_endpoint(
+        response: Response,
+        page: int = Query(1, ge=1, description="Page number"),
+        limit: int = Query(50, ge=1, le=100, description="Items per page"),
+        after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        search: Optional[str] = Query(
+            None, description="Search by event name or description (words, substrings of the name, close spellings)"
+        ),
+        sort_by: str = Query("start_date",
+                             description="Sort field (start_date, name, creation_date, relevance)"),
+        sort_order: Optional[str] = Query(
+            None, description="Sort order (asc/desc), desc by default for relevance and asc for the other fields"
+        ),
+        query: Select = Depends(filtered_events),
+        db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Get list of events with advanced filtering, searching, and pagination
+    """
     # Apply sorting
-    if sort_by not in ["start_date", "name", "creation_date"]:
+    if sort_by not in ["start_date", "name", "creation_date", "relevance"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sort_by. Must be one of: start_date, name, creation_date, relevance"
+        )
+    if sort_by == "relevance" and not search:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid sort_by. Must be one of: start_date, name, creation_date"
+            detail="sort_by=relevance requires a search"
         )
 
+    # Most relevant first unless asked otherwise
+    if sort_order is None:
+        sort_order = "desc" if sort_by == "relevance" else "asc"
     if sort_order not in ["asc", "desc"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -152,19 +209,22 @@ def get_events_endpoint(
         "name": EventModel.name,
         "creation_date": EventModel.event_id  # Assuming event_id correlates with creation order
     }
-
-    sort_field = sort_field_map[sort_by]
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_field))
-    else:
-        query = query.order_by(asc(sort_field))
-
-    # Apply pagination
-    offset = (page - 1) * limit
-    query = query.offset(offset).limit(limit)
-
-    # Execute query and get results
-    events = query.all()
+    if sort_by == "relevance":
+        sort_field_map["relevance"] = relevance(search)
+        query = query.options(with_expression(EventModel.relevance, sort_field_map["relevance"]))
+
+    # Load what EventDetails reads up front: the location from the filter join, ticket types in one query
+    query = query.options(
+        contains_eager(EventModel.location),
+        selectinload(EventModel.ticket_types).selectinload(TicketTypeModel.shards),
+    )
+
+    # Apply pagination, event_id breaks ties between equal sort keys
+    events, next_cursor = await paginate_async(
+        db, query, sort_field_map[sort_by], EventModel.event_id, sort_by, sort_order, page, limit, after
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     # Convert to response models
     return [EventDetails.model_validate(e) for e in events]
@@ -202,4 +262,4 @@ async def notify_participants(
         "event_id": event_id,
         "message": notification.message if notification else "Default notification",
         "recipients_affected": 150,
-    }
\ No newline at end of file
+    }
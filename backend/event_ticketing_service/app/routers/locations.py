@@ -1,18 +1,31 @@
+import os
 from typing import List
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.utils.read_routing import get_async_read_db
 from app.models.location import LocationModel
 from app.schemas.location import LocationDetails
+from app.services.cache import TTLCache
+from app.services.catalog_versions import LOCATIONS, conditional_get, read_versions_async
+from app.utils.sync_limiter import SyncLimitedRoute
 
-router = APIRouter(prefix="/locations", tags=["locations"])
+LOCATIONS_CACHE_TTL_SECONDS = float(os.getenv("LOCATIONS_CACHE_TTL_SECONDS", "3600"))
 
+router = APIRouter(prefix="/locations", tags=["locations"], route_class=SyncLimitedRoute)
 
-@router.get("/", response_model=List[LocationDetails])
-async def get_all_locations(db: Session = Depends(get_db)):
+# Keyed by the locations version, so a new version is a miss without explicit invalidation
+_locations_cache = TTLCache("locations", maxsize=2, ttl_seconds=LOCATIONS_CACHE_TTL_SECONDS)
+
+
+@router.get("/", response_model=List[LocationDetails], dependencies=[Depends(conditional_get(LOCATIONS))])
+async def get_all_locations(db: AsyncSession = Depends(get_async_read_db)):
     """
     Retrieve a list of all available event locations.
     """
-    locations = db.query(LocationModel).order_by(LocationModel.name).all()
-    return locations
+    async def load() -> List[LocationDetails]:
+        locations = await db.scalars(select(LocationModel).order_by(LocationModel.name))
+        return [LocationDetails.model_validate(location, from_attributes=True) for location in locations]
+
+    return await _locations_cache.aget_or_load(await read_versions_async(db, [LOCATIONS]), load)
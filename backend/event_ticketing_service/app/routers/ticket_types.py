@@ -3,46 +3,36 @@ from typing import List
 from app.database import get_db
 from sqlalchemy.orm import Session
 from app.models.events import EventModel
-from app.repositories.ticket_repository import get_ticket_repository
-from app.schemas.ticket import TicketType
+from app.repositories.ticket_repository import (
+    AsyncTicketRepository, get_async_read_ticket_repository, get_ticket_repository
+)
+from app.repositories.inventory_repository import InventoryRepository, get_inventory_repository
+from app.repositories.event_summary_repository import EventSummaryRepository, get_event_summary_repository
+from app.schemas.ticket import TicketType, InventoryShardsUpdate
+from app.utils.jwt_auth import get_current_organizer
 from fastapi.exceptions import HTTPException
 from app.models.ticket_type import TicketTypeModel
 from fastapi import Path, Depends, APIRouter, status
 from app.filters.ticket_type_filter import TicketTypeFilter
+from app.services.catalog_versions import EVENTS, INVENTORY, TICKET_TYPES, bump_versions, conditional_get
+from app.utils.sync_limiter import SyncLimitedRoute
 
-router = APIRouter(prefix="/ticket-types", tags=["ticket_types"])
+router = APIRouter(prefix="/ticket-types", tags=["ticket_types"], route_class=SyncLimitedRoute)
 
 
-@router.get("/", response_model=List[TicketType])
-def get_ticket_types(
+@router.get("/", response_model=List[TicketType], dependencies=[Depends(conditional_get(TICKET_TYPES, INVENTORY))])
+async def get_ticket_types(
     filters: TicketTypeFilter = Depends(),
-    db: Session = Depends(get_db),
+    ticket_repo: AsyncTicketRepository = Depends(get_async_read_ticket_repository),
 ):
     """
     Retrieve ticket types, optionally filtering by:
     - event_id
     - min_price
     - max_price
+    Served from the in-process cache while no ticket type or inventory change was made.
     """
-    query = db.query(TicketTypeModel)
-
-    # 1) Filter by specific ticket type ID
-    if filters.type_id is not None:
-        query = query.filter(TicketTypeModel.type_id == filters.type_id)
-
-    # 2) Filter by event ID
-    if filters.event_id is not None:
-        query = query.filter(TicketTypeModel.event_id == filters.event_id)
-
-    # 3) Price range filters
-    if filters.min_price is not None:
-        query = query.filter(TicketTypeModel.price >= filters.min_price)
-    if filters.max_price is not None:
-        query = query.filter(TicketTypeModel.price <= filters.max_price)
-
-    # Execute and serialize
-    types = query.all()
-    return [TicketType.model_validate(t) for t in types]
+    return await ticket_repo.get_ticket_types(filters)
 
 
 @router.post("/", response_model=TicketType)
@@ -54,14 +44,44 @@ def create_ticket_type(
     return ticket_repo.create_ticket_type(ticket_type)
 
 
+@router.put("/{type_id}/inventory-shards", response_model=TicketType)
+def set_inventory_shards(
+    update: InventoryShardsUpdate,
+    type_id: int = Path(..., title="Ticket Type ID", ge=1, description="Must be a positive integer"),
+    db: Session = Depends(get_db),
+    inventory: InventoryRepository = Depends(get_inventory_repository),
+    current_organizer=Depends(get_current_organizer),
+):
+    """
+    Spread the inventory of a hot ticket type over several counters, so concurrent buyers do not
+    queue on a single row. shards=1 switches back to a single counter. Requires organizer authentication.
+    """
+    model = db.get(TicketTypeModel, type_id)
+    if not model:
+        raise HTTPException(status_code=404, detail="Ticket type not found")
+    event = db.get(EventModel, model.event_id)
+    if event.organizer_id != current_organizer["role_id"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to manage this event")
+
+    model = inventory.set_shards(type_id, update.shards)
+    db.commit()
+    bump_versions(db, TICKET_TYPES)
+    db.refresh(model)
+    return TicketType.model_validate(model)
+
+
 @router.delete("/{type_id}", response_model=bool)
 def delete_ticket_type(
     type_id: int = Path(..., title="Ticket Type ID", ge=1, description="Must be a positive integer"),
     db: Session = Depends(get_db),
+    summaries: EventSummaryRepository = Depends(get_event_summary_repository),
 ):
     model = db.get(TicketTypeModel, type_id)
     if not model:
         raise HTTPException(status_code=404, detail="Ticket type not found")
     db.delete(model)
+    db.flush()
+    summaries.refresh(model.event_id)
     db.commit()
+    bump_versions(db, EVENTS, TICKET_TYPES)
     return True
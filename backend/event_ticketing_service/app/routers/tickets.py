@@ -1,27 +1,26 @@
 from typing import List
 
-from app.database import get_db
-from sqlalchemy.orm import Session
 from fastapi import Path, Depends, APIRouter, Header, HTTPException, status
 from app.filters.ticket_filter import TicketFilter
-from app.repositories.ticket_repository import TicketRepository
+from app.repositories.ticket_repository import (
+    AsyncTicketRepository, get_async_read_ticket_repository, get_async_ticket_repository
+)
 from app.schemas.ticket import TicketPDF, TicketDetails, ResellTicketRequest
 from app.utils.jwt_auth import get_user_from_token
+from app.utils.sync_limiter import SyncLimitedRoute
 
-router = APIRouter(prefix="/tickets", tags=["tickets"])
+router = APIRouter(prefix="/tickets", tags=["tickets"], route_class=SyncLimitedRoute)
 
 
 @router.get("/", response_model=List[TicketDetails])
-def list_tickets_endpoint(
+async def list_tickets_endpoint(
         filters: TicketFilter = Depends(),
-        db: Session = Depends(get_db),
+        repository: AsyncTicketRepository = Depends(get_async_read_ticket_repository),
         user: dict = Depends(get_user_from_token)):
-    repository = TicketRepository(db)
-
     if filters.owner_id is None:
         filters.owner_id = user["user_id"]
 
-    tickets = repository.list_tickets(filters)
+    tickets = await repository.list_tickets(filters)
     return [TicketDetails(**ticket_dict) for ticket_dict in tickets]
 
 @router.get("/{ticket_id}/download", response_model=TicketPDF)
@@ -37,7 +36,7 @@ async def resell_ticket(
         ticket_id: int = Path(..., title="ticket ID"),
         resell_data: ResellTicketRequest = None,
         authorization: str = Header(..., description="Bearer token"),
-        db: Session = Depends(get_db)
+        repository: AsyncTicketRepository = Depends(get_async_ticket_repository),
 ) -> TicketDetails:
     """List a ticket for resale"""
     user = get_user_from_token(authorization)
@@ -45,19 +44,17 @@ async def resell_ticket(
 
     resell_data.ticket_id = ticket_id
 
-    repository = TicketRepository(db)
-    return TicketDetails.model_validate(repository.resell_ticket(resell_data, user_id))
+    return await repository.resell_ticket(resell_data, user_id)
 
 
 @router.delete("/{ticket_id}/resell", response_model=TicketDetails)
 async def cancel_resell(
         ticket_id: int = Path(..., title="ticket ID"),
         authorization: str = Header(..., description="Bearer token"),
-        db: Session = Depends(get_db)
+        repository: AsyncTicketRepository = Depends(get_async_ticket_repository),
 ) -> TicketDetails:
     """Remove a ticket from resale"""
     user = get_user_from_token(authorization)
     user_id = user["user_id"]
 
-    repository = TicketRepository(db)
-    return TicketDetails.model_validate(repository.cancel_resell(ticket_id, user_id))
+    return await repository.cancel_resell(ticket_id, user_id)
@@ -0,0 +1,95 @@
+from typing import Optional
+
+from app.database import get_db
+from sqlalchemy.orm import Session
+from fastapi import Path, Depends, APIRouter, Header, HTTPException, status
+from app.repositories.waiting_room_repository import WaitingRoomRepository, get_waiting_room_repository
+from app.schemas.waiting_room import (
+    QueueTicket, WaitingRoomConfig, WaitingRoomDetails, WaitingRoomMetrics
+)
+from app.services.waiting_room import (
+    decode_queue_token, get_metrics, get_open_room, invalidate_rooms, issue_queue_token,
+    queue_status, refresh_queue_token, warsaw_now
+)
+from app.utils.jwt_auth import get_current_organizer, get_user_from_token
+from app.utils.sync_limiter import SyncLimitedRoute
+
+router = APIRouter(prefix="/waiting-room", tags=["waiting_room"], route_class=SyncLimitedRoute)
+
+
+def _open_room_or_404(db: Session, event_id: int):
+    room = get_open_room(db, event_id)
+    if not room:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"No open waiting room for event {event_id}")
+    return room
+
+
+@router.put("/{event_id}", response_model=WaitingRoomDetails)
+def configure_waiting_room(
+        config: WaitingRoomConfig,
+        event_id: int = Path(..., title="Event ID"),
+        waiting_room_repo: WaitingRoomRepository = Depends(get_waiting_room_repository),
+        current_organizer=Depends(get_current_organizer)
+):
+    """Put an event behind a waiting room or change its admission rate (requires organizer authentication)"""
+    room = waiting_room_repo.configure_room(event_id, config, current_organizer["role_id"], warsaw_now())
+    invalidate_rooms()
+    return WaitingRoomDetails.model_validate(room)
+
+
+@router.delete("/{event_id}", response_model=bool)
+def remove_waiting_room(
+        event_id: int = Path(..., title="Event ID"),
+        waiting_room_repo: WaitingRoomRepository = Depends(get_waiting_room_repository),
+        current_organizer=Depends(get_current_organizer)
+):
+    """Let everyone through to the event again (requires organizer authentication)"""
+    waiting_room_repo.delete_room(event_id, current_organizer["role_id"])
+    invalidate_rooms()
+    return True
+
+
+@router.post("/{event_id}/join", response_model=QueueTicket)
+def join_queue(
+        event_id: int = Path(..., title="Event ID"),
+        user: dict = Depends(get_user_from_token),
+        waiting_room_repo: WaitingRoomRepository = Depends(get_waiting_room_repository),
+):
+    """Take a place in the queue. Send the returned queue_token in the X-Queue-Token header to the cart endpoints."""
+    position, room_model = waiting_room_repo.issue_position(event_id, warsaw_now())
+    room = WaitingRoomDetails.model_validate(room_model)
+    return QueueTicket(
+        **queue_status(room, position).model_dump(),
+        queue_token=issue_queue_token(room, user["user_id"], position),
+    )
+
+
+@router.get("/{event_id}/status", response_model=QueueTicket)
+def get_queue_status(
+        event_id: int = Path(..., title="Event ID"),
+        x_queue_token: Optional[str] = Header(None),
+        db: Session = Depends(get_db),
+):
+    """
+    Position of a queue token. Answered from the token and cached room settings, without a database round trip.
+    Comes with the token to use from now on, which expires a few minutes after its position is admitted.
+    """
+    if not x_queue_token:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="X-Queue-Token header is required")
+    payload = decode_queue_token(x_queue_token)
+    if payload["event_id"] != event_id:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Queue token belongs to another event")
+    room = _open_room_or_404(db, event_id)
+    return QueueTicket(
+        **queue_status(room, payload["position"]).model_dump(),
+        queue_token=refresh_queue_token(room, payload),
+    )
+
+
+@router.get("/{event_id}/metrics", response_model=WaitingRoomMetrics)
+def get_waiting_room_metrics(
+        event_id: int = Path(..., title="Event ID"),
+        db: Session = Depends(get_db),
+):
+    """Queue depth and admission counters of the waiting room"""
+    return get_metrics(_open_room_or_404(db, event_id))
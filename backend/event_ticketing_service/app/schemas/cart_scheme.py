@@ -1,11 +1,15 @@
 from pydantic import BaseModel, ConfigDict
 from typing import Optional
+from datetime import datetime
 
 from app.schemas.ticket import TicketType
 
 class CartItemWithDetails(BaseModel):
     cart_item_id: int
     ticket_type: Optional[TicketType] = None
+    ticket_id: Optional[int] = None  # Set for resale tickets instead of ticket_type
     quantity: int
+    held_quantity: int = 0
+    hold_expires_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Any, List, Optional
 
 from app.models.events import EventModel
-from pydantic import BaseModel, ConfigDict, model_validator
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 
 
 # EventBase is the base model for creating and handling events
@@ -18,6 +18,17 @@ class EventBase(BaseModel):
     standard_ticket_price: float
     ticket_sales_start: datetime
 
+    @field_validator("category")
+    @classmethod
+    def clean_categories(cls, value: List[str]) -> List[str]:
+        """Trim categories and drop blanks and repeats, keeping the organizer's order"""
+        cleaned = []
+        for category in value:
+            category = category.strip()
+            if category and category not in cleaned:
+                cleaned.append(category)
+        return cleaned
+
 
 # EventBase is the base model for creating and handling events
 class EventDetails(BaseModel):
@@ -31,9 +42,15 @@ class EventDetails(BaseModel):
     location_name: str
     status: str
     categories: list[str] = []
+    min_price: float | None = None
+    max_price: float | None = None
+    price_currency: str | None = None
+
+    sold_out: bool = False
 
     # Calculated fields
     total_tickets: int = 0
+    remaining_tickets: int = 0  # Can be 0 before sold_out while the last tickets are held in carts
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -46,6 +63,7 @@ class EventDetails(BaseModel):
                 **data.__dict__,
                 "location_name": data.location.name if data.location else None,
                 "total_tickets": sum(tt.max_count for tt in data.ticket_types),
+                "remaining_tickets": sum(tt.remaining_count for tt in data.ticket_types),
             }
         return data
 
@@ -60,6 +78,12 @@ class EventUpdate(BaseModel):
     minimum_age: Optional[int] = None
 
 
+class CategoryFacet(BaseModel):
+    """Number of events in a category"""
+    category: str
+    events: int
+
+
 class NotificationRequest(BaseModel):
     message: str
     urgent: bool = False
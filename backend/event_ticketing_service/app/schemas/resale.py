@@ -19,4 +19,5 @@ class ResaleTicketListing(BaseModel):
 
 class BuyResaleTicketRequest(BaseModel):
     """Request to purchase a resale ticket"""
-    ticket_id: int
\ No newline at end of file
+    ticket_id: int
+    expected_price: Optional[float] = None  # Listed price the buyer saw; a different current price is rejected with 409
\ No newline at end of file
@@ -1,7 +1,7 @@
 from typing import Optional
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 # TicketType is a model representing a type of ticket for an event.
@@ -13,10 +13,17 @@ class TicketType(BaseModel):
     price: float
     currency: str = "USD"
     available_from: Optional[datetime] = None
+    remaining_count: Optional[int] = None  # Read-only, derived from the ticket type's sold counter
+    inventory_shards: int = 1  # Read-only, changed through PUT /ticket-types/{type_id}/inventory-shards
 
     model_config = ConfigDict(from_attributes=True)
 
 
+# InventoryShardsUpdate splits the inventory of a hot ticket type across several counters
+class InventoryShardsUpdate(BaseModel):
+    shards: int = Field(..., ge=1, le=64)
+
+
 # TicketBase is a base model for ticket-related operations.
 class TicketDetails(BaseModel):
     ticket_id: int
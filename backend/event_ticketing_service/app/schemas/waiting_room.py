@@ -0,0 +1,52 @@
+from typing import Optional
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# WaitingRoomConfig is sent by the organizer to put an event behind a waiting room
+class WaitingRoomConfig(BaseModel):
+    admission_rate_per_minute: int = Field(..., gt=0)
+    opens_at: Optional[datetime] = None  # Defaults to the earliest ticket sales start of the event
+    closes_at: Optional[datetime] = None  # Defaults to opens_at + WAITING_ROOM_DEFAULT_DURATION_MINUTES
+
+
+class WaitingRoomDetails(BaseModel):
+    event_id: int
+    admission_rate_per_minute: int
+    opens_at: datetime
+    closes_at: datetime
+    issued_count: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# QueueStatus is what a client in the queue polls
+class QueueStatus(BaseModel):
+    event_id: int
+    position: int
+    now_serving: int
+    people_ahead: int
+    admitted: bool
+    estimated_wait_seconds: int
+    poll_after_seconds: int
+
+
+class QueueTicket(QueueStatus):
+    queue_token: str
+
+
+class WaitingRoomMetrics(BaseModel):
+    event_id: int
+    admission_rate_per_minute: int
+    opens_at: datetime
+    closes_at: datetime
+    issued_count: int
+    now_serving: int
+    queue_depth: int
+
+    # Counters of this service instance
+    joined: int
+    admitted_requests: int
+    rejected_requests: int
+    admitted_requests_last_minute: int
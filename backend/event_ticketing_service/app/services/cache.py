@@ -0,0 +1,102 @@
+"""
+In-process caches for reference data.
+
+TTLCache is a small LRU map whose entries also expire after a TTL. Every process of the
+service has its own copy: write paths invalidate the caches they make stale on their own
+process, and the TTL bounds how long the other processes can keep serving the old value.
+Values are shared between requests, so cache only immutable results (e.g. Pydantic models),
+never ORM objects bound to a session.
+
+Each cache registers itself under its name and reports hits, misses and evictions on
+GET /internal/caches.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple, TypeVar
+
+from app.schemas.metrics import CacheMetrics
+
+V = TypeVar("V")
+
+_registry: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """LRU cache of at most maxsize entries, each kept for ttl_seconds"""
+
+    def __init__(self, name: str, maxsize: int, ttl_seconds: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _registry[name] = self
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, load: Callable[[], V]) -> V:
+        """Cached value of key, calling load() (outside the lock) when it is missing or expired"""
+        found, value = self._lookup(key)
+        if found:
+            return value
+        # Concurrent misses may both load; the last one to finish wins, which is harmless here
+        value = load()
+        self._store(key, value)
+        return value
+
+    async def aget_or_load(self, key: Hashable, load: Callable[[], Awaitable[V]]) -> V:
+        """get_or_load for async def callers, awaiting load() on a miss"""
+        found, value = self._lookup(key)
+        if found:
+            return value
+        value = await load()
+        self._store(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> CacheMetrics:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return CacheMetrics(
+                name=self.name,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                ttl_seconds=self.ttl_seconds,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+            )
+
+
+def get_cache_metrics() -> List[CacheMetrics]:
+    return [cache.metrics() for _, cache in sorted(_registry.items())]
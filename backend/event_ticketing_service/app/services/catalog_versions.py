@@ -0,0 +1,214 @@
+"""
+Conditional GET for the public catalog lists.
+
+Each list is built from a few groups of tables, and every group has a version number kept in
+a Postgres sequence (see 17_catalog_versions.sql). Writers bump the versions of the groups
+they changed right after committing, and the list endpoints send an ETag derived from the
+versions they read plus the query string. A client that sends it back in If-None-Match gets
+a 304 while none of those versions moved, without running the list query or serializing it.
+
+Versions are bumped after the commit and read before the list query, so an ETag can only be
+older than the body it came with: at worst a client downloads a list it already had. nextval
+takes no lock, so bumping on every cart hold or checkout does not serialize writers. ETags
+are weak (W/) because they name a version of the data rather than the exact bytes.
+
+Each process reads the versions at most every CATALOG_VERSION_CACHE_TTL_SECONDS, and drops
+its copy when it bumps them itself. A cached version is at worst older than the data, so the
+guarantee above holds; a change made through another process reaches 304 answers and the
+version-keyed caches of this one within the TTL.
+
+The API gateway keys its micro-cache on the same versions (GET /catalog-versions), so a bump
+also retires the gateway's cached copies of the lists, acting as a cache tag purge.
+
+Versions are only ever read from the primary. A replica sees a sequence's last_value move in
+steps of 32, because nextval logs ahead. Lists served from a read replica (see
+app/utils/read_routing.py) are tagged with the newest versions read at least
+DB_REPLICA_MAX_LAG_SECONDS ago. Their changes were committed before that, so the replica holds
+them and the guarantee above still holds.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from app.schemas.metrics import ConditionalGetMetrics
+from app.services.cache import TTLCache
+from app.utils.read_routing import DB_REPLICA_MAX_LAG_SECONDS, get_async_read_db
+
+CATALOG_VERSION_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_CACHE_TTL_SECONDS", "1"))
+VERSION_HEADER_PREFIX = "X-Catalog-Version-"
+
+# Version scopes, one per group of tables behind the catalog lists
+EVENTS = "events"  # events, including price bounds and ticket types embedded in them
+TICKET_TYPES = "ticket_types"
+INVENTORY = "inventory"  # sold and held counts behind remaining_count, sold_out
+LOCATIONS = "locations"  # only changed by the SQL scripts, which bump every version
+RESALE = "resale"  # resale_listings
+
+_SEQUENCES = {
+    EVENTS: "catalog_version_events",
+    TICKET_TYPES: "catalog_version_ticket_types",
+    INVENTORY: "catalog_version_inventory",
+    LOCATIONS: "catalog_version_locations",
+    RESALE: "catalog_version_resale",
+}
+
+
+class _Counters:
+    """Conditional GET counters of one path on this service instance"""
+
+    def __init__(self):
+        self.requests = 0
+        self.conditional_requests = 0
+        self.not_modified = 0
+
+
+_counters: Dict[str, _Counters] = {}
+_counters_lock = threading.Lock()
+# All versions, read together in one query
+_versions = TTLCache("catalog_versions", maxsize=1, ttl_seconds=CATALOG_VERSION_CACHE_TTL_SECONDS)
+# Versions as loaded from the primary, with the time.monotonic() they were read at, oldest first.
+# Keeps the newest entry older than DB_REPLICA_MAX_LAG_SECONDS and every one after it.
+_history: Deque[Tuple[float, Dict[str, int]]] = deque()
+_history_lock = threading.Lock()
+_READ_VERSIONS_SQL = text(
+    "SELECT " + ", ".join(f"(SELECT last_value FROM {sequence}) AS {scope}" for scope, sequence in _SEQUENCES.items())
+)
+
+
+def _bump_sql(scopes: Tuple[str, ...]):
+    return text("SELECT " + ", ".join(f"nextval('{_SEQUENCES[scope]}')" for scope in scopes))
+
+
+def _record(path: str, conditional: bool, not_modified: bool) -> None:
+    with _counters_lock:
+        counters = _counters.setdefault(path, _Counters())
+        counters.requests += 1
+        counters.conditional_requests += conditional
+        counters.not_modified += not_modified
+
+
+def _remember(versions: Dict[str, int]) -> Dict[str, int]:
+    now = time.monotonic()
+    with _history_lock:
+        _history.append((now, versions))
+        while len(_history) > 1 and _history[1][0] <= now - DB_REPLICA_MAX_LAG_SECONDS:
+            _history.popleft()
+    return versions
+
+
+async def _load_async(db: AsyncSession) -> Dict[str, int]:
+    return _remember((await db.execute(_READ_VERSIONS_SQL)).one()._asdict())
+
+
+async def _replica_versions() -> Dict[str, int]:
+    """Newest versions the read replica is known to contain"""
+    async with AsyncSessionLocal() as db:
+        # Keeps the history current; connects only when the cached versions expired
+        await _versions.aget_or_load(None, lambda: _load_async(db))
+    while True:
+        cutoff = time.monotonic() - DB_REPLICA_MAX_LAG_SECONDS
+        with _history_lock:
+            settled = [versions for read_at, versions in _history if read_at <= cutoff]
+            if settled:
+                return settled[-1]
+            oldest = _history[0][0]
+        # Only in the first DB_REPLICA_MAX_LAG_SECONDS of the process
+        await asyncio.sleep(oldest - cutoff)
+
+
+def bump_versions(db: Session, *scopes: str) -> None:
+    """Moves the versions of the given scopes forward. Call right after the commit that changed them."""
+    db.execute(_bump_sql(scopes))
+    _versions.clear()
+
+
+async def bump_versions_async(db: AsyncSession, *scopes: str) -> None:
+    """bump_versions on an async session"""
+    await db.execute(_bump_sql(scopes))
+    _versions.clear()
+
+
+def read_versions(db: Session, scopes: List[str]) -> Tuple[int, ...]:
+    """Current versions of scopes, usable as part of a cache key"""
+    versions = _versions.get_or_load(None, lambda: _remember(db.execute(_READ_VERSIONS_SQL).one()._asdict()))
+    return tuple(versions[scope] for scope in scopes)
+
+
+async def read_versions_async(db: AsyncSession, scopes: List[str]) -> Tuple[int, ...]:
+    """read_versions on an async session; on a read replica session, versions the replica contains"""
+    if db.info.get("replica"):
+        versions = await _replica_versions()
+    else:
+        versions = await _versions.aget_or_load(None, lambda: _load_async(db))
+    return tuple(versions[scope] for scope in scopes)
+
+
+async def version_headers(db: AsyncSession) -> Dict[str, str]:
+    """All versions as X-Catalog-Version-<scope> headers, read by the API gateway for its cache keys"""
+    scopes = list(_SEQUENCES)
+    return {
+        f"{VERSION_HEADER_PREFIX}{scope.replace('_', '-').title()}": str(version)
+        for scope, version in zip(scopes, await read_versions_async(db, scopes))
+    }
+
+
+def make_etag(request: Request, versions: Tuple[int, ...]) -> str:
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.blake2b(f"{request.url.path}|{query}|{versions}".encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def conditional_get(*scopes: str) -> Callable:
+    """
+    Route dependency sending an ETag for the versions of scopes, and answering a matching
+    If-None-Match with 304 before the endpoint runs. The endpoint must read through
+    get_async_read_db too, so that both share the request's session and its versions.
+    """
+
+    async def check(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)) -> None:
+        etag = make_etag(request, await read_versions_async(db, list(scopes)))
+        if_none_match = request.headers.get("if-none-match")
+        not_modified = _matches(if_none_match, etag)
+        _record(request.url.path, conditional=if_none_match is not None, not_modified=not_modified)
+        if not_modified:
+            raise HTTPException(status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
+    return check
+
+
+def get_conditional_get_metrics() -> List[ConditionalGetMetrics]:
+    with _counters_lock:
+        return [
+            ConditionalGetMetrics(
+                path=path,
+                requests=counters.requests,
+                conditional_requests=counters.conditional_requests,
+                not_modified=counters.not_modified,
+                hit_rate=(
+                    counters.not_modified / counters.conditional_requests if counters.conditional_requests else 0.0
+                ),
+            )
+            for path, counters in sorted(_counters.items())
+        ]
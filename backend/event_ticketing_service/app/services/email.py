@@ -1,8 +1,11 @@
 # flake8: noqa
 import io
 import os
+import json
+import uuid
 import base64
 import logging
+from datetime import datetime
 
 import qrcode
 from sendgrid import SendGridAPIClient
@@ -11,9 +14,63 @@ from sendgrid.helpers.mail import Mail, FileName, FileType, ContentId, Attachmen
 SENDGRID_API_KEY = os.getenv("EMAIL_API_KEY")
 FROM_EMAIL = os.getenv("EMAIL_FROM_EMAIL", "tickets@resellio.com")
 APP_BASE_URL = os.getenv("APP_BASE_URL", "http://localhost:8080")
+# 'sendgrid' delivers through the SendGrid API, 'file' writes every message as JSON into EMAIL_FILE_SINK_DIR
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid").lower()
+EMAIL_FILE_SINK_DIR = os.getenv("EMAIL_FILE_SINK_DIR", "/tmp/resellio-mail")
 
 logger = logging.getLogger(__name__)
 
+_sendgrid_client = None
+
+
+class EmailDeliveryError(Exception):
+    """Raised when a message could not be handed over to the configured transport."""
+
+
+def _get_sendgrid_client() -> SendGridAPIClient:
+    """Return a process-wide SendGrid client so connections are not rebuilt for every message"""
+    global _sendgrid_client
+    if _sendgrid_client is None:
+        _sendgrid_client = SendGridAPIClient(SENDGRID_API_KEY)
+    return _sendgrid_client
+
+
+def _deliver_to_file_sink(message: Mail) -> None:
+    """Write the message to the local mail sink, used for local development and tests"""
+    os.makedirs(EMAIL_FILE_SINK_DIR, exist_ok=True)
+    file_name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}_{uuid.uuid4().hex}.json"
+    tmp_path = os.path.join(EMAIL_FILE_SINK_DIR, f".{file_name}.tmp")
+
+    # Write then rename, so readers polling the directory never see a partial message
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(message.get(), f)
+    os.replace(tmp_path, os.path.join(EMAIL_FILE_SINK_DIR, file_name))
+
+
+def deliver_email(message: Mail) -> None:
+    """
+    Deliver a prepared message through the configured transport.
+
+    Raises:
+        EmailDeliveryError: If the transport is misconfigured or rejects the message
+    """
+    if EMAIL_TRANSPORT == "file":
+        _deliver_to_file_sink(message)
+        return
+
+    if EMAIL_TRANSPORT != "sendgrid":
+        raise EmailDeliveryError(f"Unknown EMAIL_TRANSPORT '{EMAIL_TRANSPORT}'")
+    if not SENDGRID_API_KEY:
+        raise EmailDeliveryError("SendGrid API key not set - cannot send emails")
+
+    try:
+        response = _get_sendgrid_client().send(message)
+    except Exception as e:
+        raise EmailDeliveryError(f"SendGrid request failed: {str(e)}") from e
+
+    if not 200 <= response.status_code < 300:
+        raise EmailDeliveryError(f"SendGrid responded with status code {response.status_code}")
+
 
 def generate_qr_code(data):
     """Generate a QR code as a base64 encoded PNG image"""
@@ -41,7 +98,7 @@ def generate_qr_code(data):
         return None
 
 
-def send_ticket_email(
+def build_ticket_email(
     to_email,
     user_name,
     event_name,
@@ -50,13 +107,10 @@ def send_ticket_email(
     event_time,
     venue,
     seat,
-):
+) -> Mail:
     """
-    Send beautifully designed ticket confirmation email using SendGrid.
+    Build the beautifully designed ticket confirmation email, including its QR code.
     """
-    if not SENDGRID_API_KEY:
-        logger.error("SendGrid API key not set - cannot send emails")
-        return False
     if not APP_BASE_URL:
         logger.error("APP_BASE_URL not set - cannot construct email links")
         # Fallback to a generic domain if not set, but log an error
@@ -233,12 +287,28 @@ def send_ticket_email(
         attachment.content_id = ContentId("qrcode")
         message.add_attachment(attachment)
 
+    return message
+
+
+def send_ticket_email(
+    to_email,
+    user_name,
+    event_name,
+    ticket_id,
+    event_date,
+    event_time,
+    venue,
+    seat,
+):
+    """
+    Send ticket confirmation email right away. Returns True if the transport accepted it.
+    Request handlers should enqueue into the email outbox instead (see app.services.email_outbox).
+    """
+    message = build_ticket_email(to_email, user_name, event_name, ticket_id, event_date, event_time, venue, seat)
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        status_code = response.status_code
-        logger.info(f"Email sent to {to_email}, status code: {status_code}")
-        return status_code >= 200 and status_code < 300
-    except Exception as e:
+        deliver_email(message)
+        logger.info(f"Email sent to {to_email}")
+        return True
+    except EmailDeliveryError as e:
         logger.error(f"Failed to send email: {str(e)}")
         return False
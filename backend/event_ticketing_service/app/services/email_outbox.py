@@ -0,0 +1,133 @@
+"""
+Transactional email outbox.
+
+Request handlers never talk to the mail provider. They call enqueue_ticket_emails() inside
+the same transaction that creates or transfers the tickets, so an email row exists if and
+only if the purchase committed. The worker (email_worker.py) drains the table in batches,
+retrying failed deliveries with exponential backoff.
+"""
+
+import os
+import time
+import random
+import signal
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutboxModel
+from app.services.email import build_ticket_email, deliver_email, EmailDeliveryError
+
+TICKET_CONFIRMATION = "ticket_confirmation"
+
+BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+BACKOFF_MAX_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+POLL_INTERVAL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL_SECONDS", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_ticket_emails(db: Session, to_email: str, user_name: str, tickets: List[Dict[str, Any]]) -> None:
+    """
+    Add one ticket confirmation per entry of tickets to the outbox, without committing.
+    Each entry carries the keyword arguments of build_ticket_email except to_email and user_name:
+    event_name, ticket_id, event_date, event_time, venue and seat.
+    """
+    if not tickets:
+        return
+
+    rows = [
+        {
+            "kind": TICKET_CONFIRMATION,
+            "recipient": to_email,
+            "payload": {"to_email": to_email, "user_name": user_name, **ticket},
+        }
+        for ticket in tickets
+    ]
+    db.execute(insert(EmailOutboxModel), rows)
+
+
+def _retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, so a provider outage does not end in a thundering herd"""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _deliver(entry: EmailOutboxModel) -> None:
+    if entry.kind == TICKET_CONFIRMATION:
+        deliver_email(build_ticket_email(**entry.payload))
+        return
+    raise EmailDeliveryError(f"Unknown outbox message kind '{entry.kind}'")
+
+
+def drain_once(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Deliver one batch of due messages and return how many were processed.
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so several workers can drain the outbox
+    concurrently without sending the same message twice.
+    """
+    batch = (
+        db.query(EmailOutboxModel)
+        .filter(EmailOutboxModel.status == "pending", EmailOutboxModel.next_attempt_at <= func.now())
+        .order_by(EmailOutboxModel.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    for entry in batch:
+        entry.attempts += 1
+        try:
+            _deliver(entry)
+        except Exception as e:
+            entry.last_error = str(e)
+            if entry.attempts >= MAX_ATTEMPTS:
+                entry.status = "failed"
+                logger.error(f"Giving up on outbox message {entry.outbox_id} after {entry.attempts} attempts: {e}")
+            else:
+                delay = _retry_delay_seconds(entry.attempts)
+                entry.next_attempt_at = func.now() + timedelta(seconds=delay)
+                logger.warning(f"Delivery of outbox message {entry.outbox_id} failed, retrying in {delay:.0f}s: {e}")
+            continue
+
+        entry.status = "sent"
+        entry.sent_at = func.now()
+        entry.last_error = None
+
+    db.commit()
+    return len(batch)
+
+
+def run_worker() -> None:
+    """Drain the outbox until SIGTERM/SIGINT, polling when it is empty"""
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        logger.info(f"Received signal {signum}, stopping email outbox worker after the current batch")
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    logger.info(f"Email outbox worker started (batch size {BATCH_SIZE}, max attempts {MAX_ATTEMPTS})")
+    while not stopping:
+        db = SessionLocal()
+        try:
+            processed = drain_once(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Email outbox worker iteration failed: {str(e)}", exc_info=True)
+            processed = 0
+        finally:
+            db.close()
+
+        # A full batch means there is probably more waiting, go again right away
+        if processed < BATCH_SIZE and not stopping:
+            time.sleep(POLL_INTERVAL_SECONDS)
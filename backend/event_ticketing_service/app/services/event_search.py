@@ -0,0 +1,54 @@
+"""
+Event search over the indexes created in 13_event_search.sql.
+
+An event matches a search when any of these holds, each one served by an index:
+
+- every word of the search is a word (or the start of a word) of the name or description,
+  via the search_vector GIN index;
+- the search is a substring of the name, via the trigram index;
+- the name is similar to the search (typos, word order), via the same trigram index.
+
+Relevance is the full-text rank (name words count more than description words) plus the
+trigram similarity of the name. It is computed as double precision so the value a cursor
+carries compares equal to the one computed for the next page.
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import Float, cast, func, or_
+
+from app.models.events import EventModel
+
+SEARCH_CONFIG = "simple"
+
+_WORD = re.compile(r"\w+")
+
+
+def prefix_tsquery(search: str) -> Optional[str]:
+    """'rock conc' -> 'rock:* & conc:*', None when the search has no words"""
+    words = _WORD.findall(search.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def search_filter(search: str):
+    """Condition matching the events found by a search"""
+    conditions = [
+        EventModel.name.ilike(f"%{search}%"),
+        EventModel.name.op("%")(search),
+    ]
+    tsquery = prefix_tsquery(search)
+    if tsquery:
+        conditions.append(EventModel.search_vector.op("@@")(func.to_tsquery(SEARCH_CONFIG, tsquery)))
+    return or_(*conditions)
+
+
+def relevance(search: str):
+    """Relevance score of an event for a search, labelled to load into EventModel.relevance"""
+    score = func.similarity(EventModel.name, search)
+    tsquery = prefix_tsquery(search)
+    if tsquery:
+        score = score + func.ts_rank_cd(EventModel.search_vector, func.to_tsquery(SEARCH_CONFIG, tsquery))
+    return cast(score, Float(53)).label("relevance")
@@ -0,0 +1,56 @@
+"""
+Background sweeper that hands expired cart holds back to their ticket types.
+
+It runs inside every events-service process. Expired lines are claimed with
+FOR UPDATE SKIP LOCKED, so replicas sweeping at the same time split the work
+instead of blocking each other.
+"""
+
+import os
+import asyncio
+import logging
+
+from app.database import SessionLocal
+from app.repositories.inventory_repository import InventoryRepository, HOLD_SWEEP_BATCH_SIZE
+from app.services.catalog_versions import INVENTORY, bump_versions
+
+HOLD_SWEEP_INTERVAL_SECONDS = float(os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_expired_holds() -> int:
+    """Release every expired hold, one batch per transaction. Returns the number of cart lines released."""
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            released = InventoryRepository(db).sweep_expired_holds()
+            db.commit()
+            if released:
+                bump_versions(db, INVENTORY)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        total += released
+        if released < HOLD_SWEEP_BATCH_SIZE:
+            return total
+
+
+async def run_hold_sweeper(stop: asyncio.Event) -> None:
+    """Sweep every HOLD_SWEEP_INTERVAL_SECONDS until stop is set"""
+    logger.info(f"Cart hold sweeper started (interval {HOLD_SWEEP_INTERVAL_SECONDS}s)")
+    while not stop.is_set():
+        try:
+            # The sweep uses a blocking session, keep it off the event loop
+            await asyncio.to_thread(sweep_expired_holds)
+        except Exception as e:
+            logger.error(f"Cart hold sweep failed: {str(e)}", exc_info=True)
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=HOLD_SWEEP_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,189 @@
+"""
+Idempotency-Key support for purchase endpoints.
+
+The key row is inserted in the same transaction as the purchase and filled with the response
+right before that transaction commits. As a consequence:
+
+- a replay finds the committed row and gets the stored response without touching inventory;
+- a concurrent duplicate blocks on the primary key until the first execution commits (and
+  then replays it) or rolls back (and then runs itself);
+- failed requests leave nothing behind, so retrying them simply runs them again.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Depends, Header, HTTPException, status
+from sqlalchemy import delete, func, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_db
+from app.models.idempotency_key import IdempotencyKeyModel
+from app.utils.jwt_auth import get_user_from_token
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# How long a duplicate waits for the first execution before giving up with 409
+IDEMPOTENCY_WAIT_TIMEOUT_MS = int(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT_MS", "10000"))
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "300"))
+IDEMPOTENCY_PURGE_BATCH_SIZE = int(os.getenv("IDEMPOTENCY_PURGE_BATCH_SIZE", "1000"))
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyGuard:
+    """Idempotency state of one request, bound to the request's database session"""
+
+    def __init__(self, db: Session, user_id: int, endpoint: str, key: str):
+        self.db = db
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.key = key
+
+    def _pk(self):
+        return (
+            IdempotencyKeyModel.user_id == self.user_id,
+            IdempotencyKeyModel.endpoint == self.endpoint,
+            IdempotencyKeyModel.idempotency_key == self.key,
+        )
+
+    def begin(self, request_payload: Dict[str, Any]) -> Optional[Any]:
+        """
+        Claim the key inside the current transaction. Returns None when this request should run,
+        or the stored response when an earlier execution with the same key already completed.
+        """
+        request_hash = hashlib.sha256(json.dumps(request_payload, sort_keys=True).encode()).hexdigest()
+
+        # An expired row is taken over as if it did not exist
+        claim = (
+            insert(IdempotencyKeyModel)
+            .values(
+                user_id=self.user_id,
+                endpoint=self.endpoint,
+                idempotency_key=self.key,
+                request_hash=request_hash,
+                expires_at=func.now() + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS),
+            )
+            .on_conflict_do_update(
+                index_elements=["user_id", "endpoint", "idempotency_key"],
+                set_={
+                    "request_hash": request_hash,
+                    "response_body": None,
+                    "created_at": func.now(),
+                    "expires_at": func.now() + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS),
+                },
+                where=IdempotencyKeyModel.expires_at <= func.now(),
+            )
+            .returning(IdempotencyKeyModel.user_id)
+        )
+
+        # The insert waits while a duplicate is in flight; bound that wait, then restore the default
+        self.db.execute(text(f"SET LOCAL lock_timeout = {IDEMPOTENCY_WAIT_TIMEOUT_MS}"))
+        try:
+            claimed = self.db.execute(claim).first()
+        except OperationalError:
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed",
+            )
+        self.db.execute(text("SET LOCAL lock_timeout TO DEFAULT"))
+
+        if claimed is not None:
+            return None
+
+        stored = self.db.execute(
+            select(IdempotencyKeyModel.request_hash, IdempotencyKeyModel.response_body).where(*self._pk())
+        ).first()
+        if stored.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        logger.info(f"Replaying {self.endpoint} for user_id {self.user_id} (Idempotency-Key {self.key})")
+        return stored.response_body
+
+    def complete(self, response_body: Any) -> None:
+        """Store the response in the current transaction. The caller commits it together with the purchase."""
+        self.db.execute(
+            update(IdempotencyKeyModel)
+            .where(*self._pk())
+            .values(response_body=response_body)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def idempotency_guard(endpoint: str) -> Callable[..., Optional[IdempotencyGuard]]:
+    """Dependency factory: an IdempotencyGuard when the request carries an Idempotency-Key header, else None"""
+
+    def dependency(
+        idempotency_key: Optional[str] = Header(None),
+        user: dict = Depends(get_user_from_token),
+        db: Session = Depends(get_db),
+    ) -> Optional[IdempotencyGuard]:
+        if idempotency_key is None:
+            return None
+        if not idempotency_key.strip() or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Idempotency-Key must be between 1 and {MAX_KEY_LENGTH} characters",
+            )
+        return IdempotencyGuard(db, user["user_id"], endpoint, idempotency_key.strip())
+
+    return dependency
+
+
+def purge_expired_keys() -> int:
+    """Delete expired keys, one batch per transaction. Returns the number of keys deleted."""
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            expired = (
+                select(IdempotencyKeyModel.user_id, IdempotencyKeyModel.endpoint, IdempotencyKeyModel.idempotency_key)
+                .where(IdempotencyKeyModel.expires_at <= func.now())
+                .limit(IDEMPOTENCY_PURGE_BATCH_SIZE)
+            )
+            deleted = db.execute(
+                delete(IdempotencyKeyModel).where(
+                    tuple_(
+                        IdempotencyKeyModel.user_id, IdempotencyKeyModel.endpoint, IdempotencyKeyModel.idempotency_key
+                    ).in_(expired)
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        total += deleted
+        if deleted < IDEMPOTENCY_PURGE_BATCH_SIZE:
+            return total
+
+
+async def run_idempotency_key_purger(stop: asyncio.Event) -> None:
+    """Purge expired keys every IDEMPOTENCY_PURGE_INTERVAL_SECONDS until stop is set"""
+    while not stop.is_set():
+        try:
+            purged = await asyncio.to_thread(purge_expired_keys)
+            if purged:
+                logger.info(f"Purged {purged} expired idempotency key(s)")
+        except Exception as e:
+            logger.error(f"Idempotency key purge failed: {str(e)}", exc_info=True)
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
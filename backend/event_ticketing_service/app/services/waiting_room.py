@@ -0,0 +1,288 @@
+"""
+Admission control for high-demand on-sales.
+
+An organizer puts an event behind a waiting room. Clients join the queue once and get a
+signed queue token carrying their position. Positions are admitted at the room's
+admission_rate_per_minute, counted from opens_at, so the number of clients allowed to
+reach the cart and checkout endpoints grows linearly instead of arriving all at once.
+
+Polling is cheap: the status of a token is computed from the token itself and the room
+settings, which every instance caches for WAITING_ROOM_CACHE_TTL_SECONDS. Only joining the
+queue writes to the database.
+
+Queue tokens are bound to the user who joined and expire WAITING_ROOM_ADMISSION_TTL_SECONDS
+after their position is admitted, so an admitted token cannot be kept around (or handed on)
+for the rest of the sale. Each status poll returns the token again with its expiry computed
+from the current room settings, so a client keeps a valid token while the rate changes.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import jwt
+import pytz
+from fastapi import Depends, Header, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.repositories.waiting_room_repository import WaitingRoomRepository
+from app.schemas.waiting_room import QueueStatus, WaitingRoomDetails, WaitingRoomMetrics
+from app.utils.jwt_auth import SECRET_KEY, ALGORITHM, get_user_from_token
+
+WAITING_ROOM_CACHE_TTL_SECONDS = float(os.getenv("WAITING_ROOM_CACHE_TTL_SECONDS", "5"))
+WAITING_ROOM_MIN_POLL_SECONDS = int(os.getenv("WAITING_ROOM_MIN_POLL_SECONDS", "5"))
+WAITING_ROOM_MAX_POLL_SECONDS = int(os.getenv("WAITING_ROOM_MAX_POLL_SECONDS", "30"))
+WAITING_ROOM_ADMISSION_TTL_SECONDS = int(os.getenv("WAITING_ROOM_ADMISSION_TTL_SECONDS", "600"))
+
+QUEUE_TOKEN_TYPE = "queue"
+
+logger = logging.getLogger(__name__)
+warsaw_tz = pytz.timezone('Europe/Warsaw')
+
+
+def warsaw_now() -> datetime:
+    """Current Warsaw wall-clock time, naive like the timestamps stored in the database"""
+    return datetime.now(warsaw_tz).replace(tzinfo=None)
+
+
+class _RoomCache:
+    """Open waiting rooms of all events, reloaded at most every WAITING_ROOM_CACHE_TTL_SECONDS"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms: Dict[int, WaitingRoomDetails] = {}
+        self._loaded_at: Optional[float] = None
+
+    def get_rooms(self, db: Session) -> Dict[int, WaitingRoomDetails]:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < WAITING_ROOM_CACHE_TTL_SECONDS:
+            return self._rooms
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= WAITING_ROOM_CACHE_TTL_SECONDS:
+                rooms = WaitingRoomRepository(db).get_open_rooms(warsaw_now())
+                self._rooms = {room.event_id: WaitingRoomDetails.model_validate(room) for room in rooms}
+                self._loaded_at = time.monotonic()
+        return self._rooms
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+
+class _Counters:
+    """Per-event admission counters of this service instance"""
+
+    def __init__(self):
+        self.joined = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.recent_admissions = deque()
+
+
+_room_cache = _RoomCache()
+_counters: Dict[int, _Counters] = {}
+_counters_lock = threading.Lock()
+# Ticket types never move between events, so this mapping is safe to keep for the process lifetime
+_ticket_type_events: Dict[int, int] = {}
+
+
+def _record(event_id: int, joined: int = 0, admitted: int = 0, rejected: int = 0) -> None:
+    with _counters_lock:
+        counters = _counters.setdefault(event_id, _Counters())
+        counters.joined += joined
+        counters.admitted += admitted
+        counters.rejected += rejected
+        if admitted:
+            now = time.monotonic()
+            counters.recent_admissions.append(now)
+            while counters.recent_admissions and counters.recent_admissions[0] < now - 60:
+                counters.recent_admissions.popleft()
+
+
+def get_open_room(db: Session, event_id: int) -> Optional[WaitingRoomDetails]:
+    return _room_cache.get_rooms(db).get(event_id)
+
+
+def invalidate_rooms() -> None:
+    """Drop the cached rooms of this instance, e.g. after an organizer changed them"""
+    _room_cache.invalidate()
+
+
+def now_serving(room: WaitingRoomDetails, now: datetime) -> int:
+    """Highest position admitted so far"""
+    if now < room.opens_at:
+        return 0
+    elapsed = (now - room.opens_at).total_seconds()
+    return math.floor(elapsed * room.admission_rate_per_minute / 60)
+
+
+def queue_status(room: WaitingRoomDetails, position: int) -> QueueStatus:
+    now = warsaw_now()
+    serving = now_serving(room, now)
+    ahead = max(0, position - serving)
+    if now < room.opens_at:
+        wait = (room.opens_at - now).total_seconds() + ahead * 60 / room.admission_rate_per_minute
+    else:
+        wait = ahead * 60 / room.admission_rate_per_minute
+    return QueueStatus(
+        event_id=room.event_id,
+        position=position,
+        now_serving=serving,
+        people_ahead=ahead,
+        admitted=ahead == 0,
+        estimated_wait_seconds=math.ceil(wait),
+        # Clients far back in the queue do not need to poll as often
+        poll_after_seconds=int(min(WAITING_ROOM_MAX_POLL_SECONDS, max(WAITING_ROOM_MIN_POLL_SECONDS, wait / 10))),
+    )
+
+
+def admitted_at(room: WaitingRoomDetails, position: int, joined_at: datetime) -> datetime:
+    """When a position is let in: as soon as it joined, or later once now_serving reaches it"""
+    return max(joined_at, room.opens_at + timedelta(seconds=position * 60 / room.admission_rate_per_minute))
+
+
+def _encode_queue_token(room: WaitingRoomDetails, user_id: int, position: int, joined_at: datetime) -> str:
+    expires_at = min(
+        room.closes_at,
+        admitted_at(room, position, joined_at) + timedelta(seconds=WAITING_ROOM_ADMISSION_TTL_SECONDS),
+    )
+    payload = {
+        "typ": QUEUE_TOKEN_TYPE,
+        "event_id": room.event_id,
+        "user_id": user_id,
+        "position": position,
+        "joined_at": int(warsaw_tz.localize(joined_at).timestamp()),
+        "exp": warsaw_tz.localize(expires_at),
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def issue_queue_token(room: WaitingRoomDetails, user_id: int, position: int) -> str:
+    _record(room.event_id, joined=1)
+    return _encode_queue_token(room, user_id, position, warsaw_now())
+
+
+def refresh_queue_token(room: WaitingRoomDetails, payload: Dict) -> str:
+    """The same queue token, with its expiry computed from the current settings of the room"""
+    if "joined_at" in payload:
+        joined_at = datetime.fromtimestamp(payload["joined_at"], warsaw_tz).replace(tzinfo=None)
+    else:
+        # Issued before tokens carried their join time
+        joined_at = warsaw_now()
+    return _encode_queue_token(room, payload["user_id"], payload["position"], joined_at)
+
+
+def decode_queue_token(token: str) -> Dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Queue token has expired")
+    except jwt.InvalidTokenError as e:
+        logger.warning(f"Invalid queue token: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid queue token")
+
+    if payload.get("typ") != QUEUE_TOKEN_TYPE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid queue token")
+    return payload
+
+
+def get_metrics(room: WaitingRoomDetails) -> WaitingRoomMetrics:
+    serving = now_serving(room, warsaw_now())
+    with _counters_lock:
+        counters = _counters.setdefault(room.event_id, _Counters())
+        cutoff = time.monotonic() - 60
+        while counters.recent_admissions and counters.recent_admissions[0] < cutoff:
+            counters.recent_admissions.popleft()
+        return WaitingRoomMetrics(
+            event_id=room.event_id,
+            admission_rate_per_minute=room.admission_rate_per_minute,
+            opens_at=room.opens_at,
+            closes_at=room.closes_at,
+            issued_count=room.issued_count,
+            now_serving=serving,
+            queue_depth=max(0, room.issued_count - serving),
+            joined=counters.joined,
+            admitted_requests=counters.admitted,
+            rejected_requests=counters.rejected,
+            admitted_requests_last_minute=len(counters.recent_admissions),
+        )
+
+
+def _require_admission(db: Session, user_id: int, event_ids: List[int], queue_tokens: Optional[str]) -> None:
+    """
+    Let the request through only if every gated event in event_ids has an admitted queue token
+    for this user. Several tokens (e.g. a cart spanning events) are sent comma-separated.
+    """
+    rooms = _room_cache.get_rooms(db)
+    gated = [rooms[event_id] for event_id in event_ids if event_id in rooms]
+    if not gated:
+        return
+
+    positions: Dict[int, int] = {}
+    for token in (queue_tokens or "").split(","):
+        if token.strip():
+            payload = decode_queue_token(token.strip())
+            if payload.get("user_id") != user_id:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Queue token belongs to another user")
+            positions[payload["event_id"]] = payload["position"]
+
+    for room in gated:
+        position = positions.get(room.event_id)
+        if position is None:
+            _record(room.event_id, rejected=1)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Event {room.event_id} is behind a waiting room. "
+                       f"Join the queue at /waiting-room/{room.event_id}/join first.",
+            )
+
+        queue = queue_status(room, position)
+        if not queue.admitted:
+            _record(room.event_id, rejected=1)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Not admitted yet. {queue.people_ahead} people ahead of you in the queue.",
+                headers={"Retry-After": str(queue.poll_after_seconds)},
+            )
+
+    for room in gated:
+        _record(room.event_id, admitted=1)
+
+
+def admit_ticket_type(
+    ticket_type_id: int,
+    user: dict = Depends(get_user_from_token),
+    x_queue_token: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+) -> None:
+    """Admission gate for adding a ticket type to the cart"""
+    if not _room_cache.get_rooms(db):
+        return
+
+    event_id = _ticket_type_events.get(ticket_type_id)
+    if event_id is None:
+        event_id = WaitingRoomRepository(db).get_event_id_for_ticket_type(ticket_type_id)
+        if event_id is None:
+            # Unknown ticket type, let the endpoint report it
+            return
+        _ticket_type_events[ticket_type_id] = event_id
+
+    _require_admission(db, user["user_id"], [event_id], x_queue_token)
+
+
+def admit_cart(
+    user: dict = Depends(get_user_from_token),
+    x_queue_token: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+) -> None:
+    """Admission gate for checking out the whole cart"""
+    if not _room_cache.get_rooms(db):
+        return
+
+    event_ids = WaitingRoomRepository(db).get_cart_event_ids(user["user_id"])
+    _require_admission(db, user["user_id"], event_ids, x_queue_token)
@@ -0,0 +1,179 @@
+"""
+Event loop lag monitor.
+
+Anything slow that runs on the event loop (a sync query, bcrypt or PDF rendering inside an
+async def endpoint) stalls every other request of the worker. A background task sleeps for
+LOOP_MONITOR_INTERVAL_SECONDS and measures how late it wakes up: that delay is the time the
+loop spent running something else. Samples later than LOOP_BLOCK_THRESHOLD_SECONDS count as
+stalls and are logged. The cost is one wakeup per interval.
+
+Settings come from the environment:
+- LOOP_MONITOR_ENABLED (true)
+- LOOP_MONITOR_INTERVAL_SECONDS (0.25): time between samples
+- LOOP_BLOCK_THRESHOLD_SECONDS (0.1): lag from which a sample counts as a stall
+- LOOP_MONITOR_DEBUG (false): also find out what blocked the loop. A watchdog thread notices
+  when the sampler is overdue by more than the threshold, and logs the route of the request
+  running on the loop and the loop thread's stack at that moment. The last few are kept and
+  returned with the metrics. Costs a thread waking up every threshold / 2 and a lookup per
+  request, still cheap enough for production when a worker needs to be investigated.
+
+Metrics of the process are served on GET /internal/event-loop.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List
+
+from app.schemas.metrics import BlockedLoop, EventLoopMetrics
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.25"))
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.1"))
+LOOP_MONITOR_DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "false").lower() == "true"
+
+STATS_WINDOW_SECONDS = 60
+RECENT_BLOCKS = 20
+
+logger = logging.getLogger(__name__)
+
+
+class _LagStats:
+    """Lag samples of this process, in total and per second over the last minute"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.stalls = 0
+        self.lag_seconds = 0.0
+        self.lag_seconds_max = 0.0
+        # [second, samples, total lag, max lag, stalls] for each second of the window
+        self._buckets: List[List[float]] = [[0, 0, 0.0, 0.0, 0] for _ in range(STATS_WINDOW_SECONDS)]
+
+    def record(self, lag: float, stalled: bool) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            self.samples += 1
+            self.stalls += stalled
+            self.lag_seconds = lag
+            self.lag_seconds_max = max(self.lag_seconds_max, lag)
+            bucket = self._buckets[second % STATS_WINDOW_SECONDS]
+            if bucket[0] != second:
+                bucket[:] = [second, 0, 0.0, 0.0, 0]
+            bucket[1] += 1
+            bucket[2] += lag
+            bucket[3] = max(bucket[3], lag)
+            bucket[4] += stalled
+
+    def window(self) -> Dict[str, float]:
+        oldest = int(time.monotonic()) - STATS_WINDOW_SECONDS
+        with self._lock:
+            recent = [bucket for bucket in self._buckets if bucket[0] > oldest]
+            count = sum(bucket[1] for bucket in recent)
+            return {
+                "lag_seconds_avg_last_minute": sum(bucket[2] for bucket in recent) / count if count else 0.0,
+                "lag_seconds_max_last_minute": max((bucket[3] for bucket in recent), default=0.0),
+                "stalls_last_minute": int(sum(bucket[4] for bucket in recent)),
+            }
+
+
+_stats = _LagStats()
+# Written by the sampler on every wakeup, read by the watchdog
+_heartbeat = time.monotonic()
+# Debug mode: route of each request task, and the last blocks found by the watchdog
+_task_routes: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+_recent_blocks: Deque[BlockedLoop] = deque(maxlen=RECENT_BLOCKS)
+
+
+def _watch(loop: asyncio.AbstractEventLoop, loop_thread_id: int, stop: threading.Event) -> None:
+    """Debug mode: captures what runs on the loop when the sampler is overdue"""
+    reported, block = None, None
+    while not stop.wait(LOOP_BLOCK_THRESHOLD_SECONDS / 2):
+        beat = _heartbeat
+        blocked = time.monotonic() - beat - LOOP_MONITOR_INTERVAL_SECONDS
+        if beat == reported:
+            # Still the block already reported, extend its duration until the loop runs again
+            block.blocked_seconds = max(block.blocked_seconds, blocked)
+            continue
+        if blocked <= LOOP_BLOCK_THRESHOLD_SECONDS:
+            continue
+        reported = beat
+
+        frame = sys._current_frames().get(loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        try:
+            task = asyncio.current_task(loop)
+        except RuntimeError:
+            task = None
+        route = _task_routes.get(task) if task is not None else None
+        block = BlockedLoop(at=datetime.now(timezone.utc), route=route, blocked_seconds=blocked, stack=stack)
+        _recent_blocks.append(block)
+        logger.warning(f"Event loop blocked for over {blocked:.3f}s by {route or 'a background task'}, "
+                       f"loop thread stack:\n{stack}")
+
+
+async def run_loop_monitor(stop: asyncio.Event) -> None:
+    """Sample the event loop lag every LOOP_MONITOR_INTERVAL_SECONDS until stop is set"""
+    global _heartbeat
+    if not LOOP_MONITOR_ENABLED:
+        return
+    logger.info(f"Event loop monitor started (interval {LOOP_MONITOR_INTERVAL_SECONDS}s, "
+                f"threshold {LOOP_BLOCK_THRESHOLD_SECONDS}s, debug {LOOP_MONITOR_DEBUG})")
+
+    watchdog_stop = threading.Event()
+    if LOOP_MONITOR_DEBUG:
+        threading.Thread(
+            target=_watch, args=(asyncio.get_running_loop(), threading.get_ident(), watchdog_stop),
+            name="loop-monitor-watchdog", daemon=True,
+        ).start()
+
+    try:
+        while not stop.is_set():
+            _heartbeat = time.monotonic()
+            await asyncio.sleep(LOOP_MONITOR_INTERVAL_SECONDS)
+            lag = max(0.0, time.monotonic() - _heartbeat - LOOP_MONITOR_INTERVAL_SECONDS)
+            stalled = lag > LOOP_BLOCK_THRESHOLD_SECONDS
+            _stats.record(lag, stalled)
+            if stalled and not LOOP_MONITOR_DEBUG:
+                logger.warning(f"Event loop blocked for {lag:.3f}s, set LOOP_MONITOR_DEBUG=true to find out by what")
+    finally:
+        watchdog_stop.set()
+
+
+class LoopMonitorMiddleware:
+    """Debug mode: remembers which route each request task serves, for the watchdog's reports"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not LOOP_MONITOR_DEBUG or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        _task_routes[task] = f"{scope['method']} {scope['path']}"
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            _task_routes.pop(task, None)
+
+
+def get_event_loop_metrics() -> EventLoopMetrics:
+    return EventLoopMetrics(
+        enabled=LOOP_MONITOR_ENABLED,
+        debug=LOOP_MONITOR_DEBUG,
+        interval_seconds=LOOP_MONITOR_INTERVAL_SECONDS,
+        block_threshold_seconds=LOOP_BLOCK_THRESHOLD_SECONDS,
+        lag_seconds=_stats.lag_seconds,
+        lag_seconds_max=_stats.lag_seconds_max,
+        samples=_stats.samples,
+        stalls=_stats.stalls,
+        **_stats.window(),
+        recent_blocks=list(_recent_blocks),
+    )
@@ -0,0 +1,176 @@
+"""
+Admission control for sync (def) endpoints.
+
+FastAPI runs def endpoints and their dependencies in a thread pool of 40 threads, while
+the database pool only has DB_POOL_SIZE + DB_MAX_OVERFLOW connections. Under load the
+extra threads wait for a connection and fail with pool timeouts after
+DB_POOL_TIMEOUT_SECONDS, by which point every request on the worker is slow.
+
+Routers created with route_class=SyncLimitedRoute run their def endpoints only once they
+get one of SYNC_CONCURRENCY slots, sized to the connection pool by default. Requests wait
+for a slot in a queue of at most SYNC_QUEUE_SIZE. When the queue is full, or a request
+waits longer than SYNC_QUEUE_TIMEOUT_SECONDS, it gets a 503 with Retry-After straight
+away, so overload turns into quick rejections instead of timeouts. async def endpoints
+are not limited, as they do not take a thread.
+
+Settings come from the environment:
+- SYNC_CONCURRENCY (DB_POOL_SIZE + DB_MAX_OVERFLOW): def endpoints running at once
+- SYNC_QUEUE_SIZE (4 x SYNC_CONCURRENCY): requests waiting for a slot
+- SYNC_QUEUE_TIMEOUT_SECONDS (5): longest wait for a slot
+
+Queue times and rejections are served on GET /internal/sync-limiter.
+"""
+
+import os
+import time
+import asyncio
+import inspect
+import threading
+from typing import Callable, Dict, List
+
+from anyio import to_thread
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+
+from app.schemas.metrics import SyncLimiterStats
+from app.utils.db_pool import DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+SYNC_QUEUE_SIZE = int(os.getenv("SYNC_QUEUE_SIZE", str(4 * SYNC_CONCURRENCY)))
+SYNC_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SYNC_QUEUE_TIMEOUT_SECONDS", "5"))
+RETRY_AFTER_SECONDS = 1
+
+STATS_WINDOW_SECONDS = 60
+
+
+class _QueueStats:
+    """Admissions of this process, in total and per second over the last minute"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.queue_seconds_total = 0.0
+        # [second, admitted, total queue time, max queue time, rejected] for each second of the window
+        self._buckets: List[List[float]] = [[0, 0, 0.0, 0.0, 0] for _ in range(STATS_WINDOW_SECONDS)]
+
+    def _bucket(self, second: int) -> List[float]:
+        bucket = self._buckets[second % STATS_WINDOW_SECONDS]
+        if bucket[0] != second:
+            bucket[:] = [second, 0, 0.0, 0.0, 0]
+        return bucket
+
+    def admit(self, waited: float) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            self.admitted += 1
+            self.queue_seconds_total += waited
+            bucket = self._bucket(second)
+            bucket[1] += 1
+            bucket[2] += waited
+            bucket[3] = max(bucket[3], waited)
+
+    def reject(self, timed_out: bool) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            if timed_out:
+                self.rejected_timeout += 1
+            else:
+                self.rejected_queue_full += 1
+            self._bucket(second)[4] += 1
+
+    def window(self) -> Dict[str, float]:
+        oldest = int(time.monotonic()) - STATS_WINDOW_SECONDS
+        with self._lock:
+            recent = [bucket for bucket in self._buckets if bucket[0] > oldest]
+            count = sum(bucket[1] for bucket in recent)
+            return {
+                "admitted_last_minute": int(count),
+                "rejected_last_minute": int(sum(bucket[4] for bucket in recent)),
+                "queue_seconds_avg_last_minute": sum(bucket[2] for bucket in recent) / count if count else 0.0,
+                "queue_seconds_max_last_minute": max((bucket[3] for bucket in recent), default=0.0),
+            }
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+class _SyncLimiter:
+    """SYNC_CONCURRENCY slots with a bounded queue in front of them; used on the event loop only"""
+
+    def __init__(self):
+        self._slots = asyncio.Semaphore(SYNC_CONCURRENCY)
+        self.running = 0
+        self.waiting = 0
+        self.stats = _QueueStats()
+
+    async def acquire(self) -> None:
+        if self.waiting >= SYNC_QUEUE_SIZE:
+            self.stats.reject(timed_out=False)
+            raise _busy()
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(SYNC_QUEUE_TIMEOUT_SECONDS):
+                await self._slots.acquire()
+        except TimeoutError:
+            self.stats.reject(timed_out=True)
+            raise _busy()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        self.stats.admit(time.perf_counter() - started)
+
+    def release(self) -> None:
+        self.running -= 1
+        self._slots.release()
+
+
+_limiter = _SyncLimiter()
+
+
+class SyncLimitedRoute(APIRoute):
+    """Route class running def endpoints (with their dependencies) in one of the limiter's slots"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if inspect.iscoroutinefunction(self.endpoint):
+            return handler
+
+        async def limited_handler(request: Request) -> Response:
+            await _limiter.acquire()
+            try:
+                return await handler(request)
+            finally:
+                _limiter.release()
+
+        return limited_handler
+
+
+def configure_threadpool() -> None:
+    """Makes sure the thread pool has a thread for every slot. Call from the lifespan."""
+    threads = to_thread.current_default_thread_limiter()
+    threads.total_tokens = max(threads.total_tokens, SYNC_CONCURRENCY)
+
+
+def get_sync_limiter_stats() -> SyncLimiterStats:
+    stats = _limiter.stats
+    return SyncLimiterStats(
+        concurrency=SYNC_CONCURRENCY,
+        queue_size=SYNC_QUEUE_SIZE,
+        queue_timeout_seconds=SYNC_QUEUE_TIMEOUT_SECONDS,
+        running=_limiter.running,
+        waiting=_limiter.waiting,
+        admitted=stats.admitted,
+        rejected_queue_full=stats.rejected_queue_full,
+        rejected_timeout=stats.rejected_timeout,
+        queue_seconds_total=stats.queue_seconds_total,
+        **stats.window(),
+    )
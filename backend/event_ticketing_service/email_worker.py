@@ -0,0 +1,14 @@
+"""
+Email outbox worker for the Tickets & Events Service.
+Delivers the confirmation emails queued by checkout and resale purchases.
+
+Run with: python email_worker.py
+"""
+
+import logging
+
+from app.services.email_outbox import run_worker
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    run_worker()
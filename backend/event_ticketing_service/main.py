@@ -1,11 +1,48 @@
+import os
+import asyncio
+from typing import List
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.database import async_engine, async_read_engine, engine
+from app.schemas.metrics import CacheMetrics, ConditionalGetMetrics, EventLoopMetrics, PoolStats, SyncLimiterStats
+from app.services.cache import get_cache_metrics
+from app.services.catalog_versions import get_conditional_get_metrics, version_headers
+from app.services.hold_sweeper import run_hold_sweeper
+from app.services.idempotency import run_idempotency_key_purger
+from app.utils.db_pool import pool_stats
+from app.utils.loop_monitor import LoopMonitorMiddleware, get_event_loop_metrics, run_loop_monitor
+from app.utils.read_routing import StickyPrimaryMiddleware, get_async_replica_db
+from app.utils.sync_limiter import configure_threadpool, get_sync_limiter_stats
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+HOLD_SWEEPER_ENABLED = os.getenv("HOLD_SWEEPER_ENABLED", "true").lower() == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background maintenance tasks for the lifetime of the service"""
+    configure_threadpool()
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(run_idempotency_key_purger(stop)), asyncio.create_task(run_loop_monitor(stop))]
+    if HOLD_SWEEPER_ENABLED:
+        tasks.append(asyncio.create_task(run_hold_sweeper(stop)))
+    yield
+    stop.set()
+    await asyncio.gather(*tasks)
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
 app = FastAPI(
     title="Resellio Tickets & Events Service",
     description="Tickets & Events microservice for Resellio ticket selling platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -14,17 +51,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
+app.add_middleware(LoopMonitorMiddleware)
+app.add_middleware(StickyPrimaryMiddleware)
 
 api_sub_app = FastAPI()
 
-from app.routers import cart, events, tickets, ticket_types, resale, locations
+from app.routers import cart, events, tickets, ticket_types, resale, locations, waiting_room
 api_sub_app.include_router(tickets.router)
 api_sub_app.include_router(events.router)
 api_sub_app.include_router(ticket_types.router)
 api_sub_app.include_router(cart.router)
 api_sub_app.include_router(resale.router)
 api_sub_app.include_router(locations.router)
+api_sub_app.include_router(waiting_room.router)
 
 app.mount("/api", api_sub_app)
 
@@ -44,5 +85,58 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/catalog-versions")
+async def catalog_versions(response: Response, db=Depends(get_async_replica_db)):
+    """
+    Catalog versions, used by the API gateway as cache tags of the cached catalog lists. The
+    anonymous requests it caches read from the replica, so these are the replica's versions.
+    """
+    headers = await version_headers(db)
+    response.headers.update(headers)
+    return headers
+
+
+@app.get("/internal/db-pool", response_model=PoolStats)
+def db_pool_stats():
+    """Connection pool usage of this process; not routed by the API gateway"""
+    return pool_stats(engine)
+
+
+@app.get("/internal/db-pool/async", response_model=PoolStats)
+def async_db_pool_stats():
+    """Connection pool usage of the async engine behind the async def endpoints"""
+    return pool_stats(async_engine.sync_engine)
+
+
+@app.get("/internal/db-pool/read", response_model=PoolStats)
+def read_db_pool_stats():
+    """Connection pool usage of the async engine on the read replica; the primary's when DB_READ_URL is unset"""
+    return pool_stats(async_read_engine.sync_engine)
+
+
+@app.get("/internal/event-loop", response_model=EventLoopMetrics)
+def event_loop_metrics():
+    """Event loop lag of this process, and what blocked it in debug mode; not routed by the API gateway"""
+    return get_event_loop_metrics()
+
+
+@app.get("/internal/sync-limiter", response_model=SyncLimiterStats)
+def sync_limiter_stats():
+    """Admission of requests to def endpoints on this process; not routed by the API gateway"""
+    return get_sync_limiter_stats()
+
+
+@app.get("/internal/conditional-get", response_model=List[ConditionalGetMetrics])
+def conditional_get_metrics():
+    """ETag revalidations and 304 hit rate of the catalog lists on this instance; not routed by the API gateway"""
+    return get_conditional_get_metrics()
+
+
+@app.get("/internal/caches", response_model=List[CacheMetrics])
+def cache_metrics():
+    """Size, hits and misses of the in-process caches of this instance; not routed by the API gateway"""
+    return get_cache_metrics()
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8001, reload=True)
@@ -0,0 +1,177 @@
+"""
+test_async_sessions.py - Async Session Tests
+--------------------------------------------
+Tests for the async layer behind the async def endpoints: the sessions get_async_db hands out,
+keyset pages read with paginate_async, and writes that run sync code on the async session
+(run_sync), as the async repositories do. AsyncSessionLocal is rebound to a SQLite file through
+aiosqlite, with its own session options, so no database server is needed.
+
+Run with: pytest tests/test_async_sessions.py -v
+"""
+
+from typing import List, Optional
+
+import pytest
+from fastapi import APIRouter, Depends
+from sqlalchemy import Integer, String, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from main import app
+from app import database
+from app.database import get_async_db
+from app.utils.pagination import decode_cursor, paginate_async
+
+pytestmark = pytest.mark.anyio
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class ItemModel(Base):
+    __tablename__ = "items"
+
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    rank: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+
+class ItemRepository:
+    """Sync repository that commits its writes, like the ones the async repositories run with run_sync"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_item(self, name: str) -> ItemModel:
+        item = ItemModel(name=name)
+        self.db.add(item)
+        self.db.commit()
+        return item
+
+
+router = APIRouter()
+sessions: List[AsyncSession] = []
+
+
+@router.post("/test/async-sessions/items")
+async def add_item(name: str, db: AsyncSession = Depends(get_async_db)):
+    sessions.append(db)
+    item = await db.run_sync(lambda session: ItemRepository(session).add_item(name))
+    # Attributes loaded before the commit stay readable, nothing is lazy loaded outside an await
+    return {"item_id": item.item_id, "name": item.name, "in_transaction": db.in_transaction()}
+
+
+app.include_router(router)
+
+
+@pytest.fixture
+async def session_factory(tmp_path, monkeypatch):
+    """AsyncSessionLocal, with the service's session options, on a SQLite file with an items table"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        factory = async_sessionmaker(**{**database.AsyncSessionLocal.kw, "bind": engine})
+        monkeypatch.setattr(database, "AsyncSessionLocal", factory)
+        sessions.clear()
+        yield factory
+    finally:
+        # aiosqlite connections run on their own threads, which keep the process alive until closed
+        await engine.dispose()
+
+
+async def add_items(factory, ranks: List[Optional[int]]) -> None:
+    async with factory() as db:
+        db.add_all(ItemModel(name=f"Item {n}", rank=rank) for n, rank in enumerate(ranks))
+        await db.commit()
+
+
+@pytest.mark.async_sessions
+class TestAsyncSessions:
+    """Test the sessions of get_async_db and the writes run on them"""
+
+    async def test_get_async_db_closes_session(self, session_factory):
+        """Test that get_async_db yields a session of AsyncSessionLocal and closes it afterwards"""
+        dependency = get_async_db()
+        db = await dependency.__anext__()
+        assert isinstance(db, AsyncSession)
+        assert db.bind is session_factory.kw["bind"]
+
+        await db.execute(select(ItemModel))
+        assert db.in_transaction()
+        with pytest.raises(StopAsyncIteration):
+            await dependency.__anext__()
+        assert not db.in_transaction(), "The session should be closed, ending its transaction"
+
+    async def test_run_sync_write_commits(self, client, session_factory):
+        """Test that a write committed inside run_sync is committed, and its result stays readable"""
+        response = await client.post("/test/async-sessions/items", params={"name": "Front row"})
+        assert response.status_code == 200
+        assert response.json()["name"] == "Front row"
+        assert response.json()["in_transaction"] is False, "The commit inside run_sync should end the transaction"
+
+        async with session_factory() as db:
+            names = (await db.scalars(select(ItemModel.name))).all()
+        assert names == ["Front row"], "The write should be visible to other sessions"
+
+    async def test_each_request_gets_its_own_session(self, client, session_factory):
+        """Test that requests do not share an async session"""
+        for name in ["First", "Second"]:
+            await client.post("/test/async-sessions/items", params={"name": name})
+        assert len(sessions) == 2
+        assert sessions[0] is not sessions[1]
+
+
+@pytest.mark.async_sessions
+class TestPaginateAsync:
+    """Test keyset pages read on an async session"""
+
+    async def read_all(self, factory, sort_order: str, limit: int) -> List[List[int]]:
+        """Pages of item ids, following the cursors until the last page"""
+        pages, after = [], None
+        async with factory() as db:
+            while True:
+                rows, after = await paginate_async(
+                    db, select(ItemModel), ItemModel.rank, ItemModel.item_id, "rank", sort_order, 1, limit, after
+                )
+                pages.append([row.item_id for row in rows])
+                if after is None:
+                    return pages
+
+    async def test_cursors_walk_every_row_once(self, session_factory):
+        """Test that following the cursors returns every row once, in order, ties broken by id"""
+        await add_items(session_factory, [3, 1, 2, 1, 3, 2, 1])
+        async with session_factory() as db:
+            expected = (await db.scalars(select(ItemModel.item_id).order_by(ItemModel.rank, ItemModel.item_id))).all()
+
+        pages = await self.read_all(session_factory, "asc", 3)
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [item_id for page in pages for item_id in page] == expected
+
+        pages = await self.read_all(session_factory, "desc", 3)
+        assert [item_id for page in pages for item_id in page] == list(reversed(expected))
+
+    async def test_cursor_of_last_row(self, session_factory):
+        """Test that a full page carries the cursor of its last row, and a final page none"""
+        await add_items(session_factory, [5, 7])
+        async with session_factory() as db:
+            rows, after = await paginate_async(
+                db, select(ItemModel), ItemModel.rank, ItemModel.item_id, "rank", "asc", 1, 1, None
+            )
+            assert decode_cursor(after, "rank", "asc") == (rows[0].rank, rows[0].item_id)
+
+            rows, after = await paginate_async(
+                db, select(ItemModel), ItemModel.rank, ItemModel.item_id, "rank", "asc", 1, 2, None
+            )
+            assert len(rows) == 2 and after is None
+
+    async def test_page_without_cursor(self, session_factory):
+        """Test that page= still reads by OFFSET when no cursor is passed"""
+        await add_items(session_factory, [1, 2, 3, 4])
+        async with session_factory() as db:
+            rows, _ = await paginate_async(
+                db, select(ItemModel), ItemModel.rank, ItemModel.item_id, "rank", "asc", 2, 2, None
+            )
+        assert [row.rank for row in rows] == [3, 4]
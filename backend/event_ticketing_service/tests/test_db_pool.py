@@ -0,0 +1,151 @@
+"""
+test_db_pool.py - Connection Pool Settings and Metrics Tests
+------------------------------------------------------------
+Tests that the DB_POOL_* and DB_PGBOUNCER settings reach the engine options, and that
+/internal/db-pool reports the pool's usage. The pool is put on a SQLite file, so no
+database server is needed.
+
+Run with: pytest tests/test_db_pool.py -v
+"""
+
+import time
+import importlib
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+import main
+from app.utils import db_pool
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def reload_db_pool(monkeypatch):
+    """Reloads db_pool with the given environment, and with the original one afterwards"""
+
+    def reload(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(db_pool)
+
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(db_pool)
+
+
+@pytest.fixture
+def pool_engine(tmp_path, monkeypatch):
+    """Engine with the service's pool options on a SQLite file, served by /internal/db-pool"""
+
+    def create(**options):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            connect_args={"check_same_thread": False},
+            **(options or db_pool.engine_options()),
+        )
+        engines.append(engine)
+        monkeypatch.setattr(main, "engine", engine)
+        return engine
+
+    engines = []
+    yield create
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.mark.db_pool
+class TestPoolSettings:
+    """Test that the environment reaches the engine options"""
+
+    def test_pool_settings_from_environment(self, reload_db_pool):
+        """Test that the DB_POOL_* variables become the QueuePool options"""
+        module = reload_db_pool(
+            DB_POOL_SIZE="7",
+            DB_MAX_OVERFLOW="3",
+            DB_POOL_TIMEOUT_SECONDS="2.5",
+            DB_POOL_RECYCLE_SECONDS="60",
+            DB_POOL_PRE_PING="false",
+        )
+        assert module.engine_options() == {
+            "poolclass": module.InstrumentedQueuePool,
+            "pool_size": 7,
+            "max_overflow": 3,
+            "pool_timeout": 2.5,
+            "pool_recycle": 60,
+            "pool_pre_ping": False,
+        }
+        assert module.async_engine_options(replica=True)["poolclass"] is module.InstrumentedAsyncReadQueuePool
+        assert module.async_engine_options()["pool_size"] == 7
+
+    def test_pgbouncer_mode(self, reload_db_pool):
+        """Test that DB_PGBOUNCER leaves pooling to PgBouncer and turns off asyncpg's statement caches"""
+        module = reload_db_pool(DB_PGBOUNCER="true", DB_POOL_SIZE="7")
+        assert module.engine_options() == {"poolclass": module.InstrumentedNullPool}
+
+        options = module.async_engine_options()
+        assert options["poolclass"] is module.InstrumentedAsyncNullPool
+        assert options["connect_args"]["statement_cache_size"] == 0
+        assert options["connect_args"]["prepared_statement_cache_size"] == 0
+        names = {options["connect_args"]["prepared_statement_name_func"]() for _ in range(2)}
+        assert len(names) == 2, "Prepared statements should get unique names"
+        assert module.async_engine_options(replica=True)["poolclass"] is module.InstrumentedAsyncReadNullPool
+
+
+@pytest.mark.db_pool
+class TestPoolStats:
+    """Test the usage reported on /internal/db-pool"""
+
+    async def test_checked_out_and_overflow(self, client, pool_engine):
+        """Test that connections in use beyond pool_size are reported as overflow"""
+        engine = pool_engine()
+        first, second = engine.connect(), engine.connect()
+        try:
+            stats = (await client.get("/internal/db-pool")).json()
+        finally:
+            first.close()
+            second.close()
+
+        assert stats["mode"] == "queue"
+        assert stats["pool_size"] == 1 and stats["max_overflow"] == 1
+        assert stats["checked_out"] == 2
+        assert stats["overflow"] == 1
+
+        stats = (await client.get("/internal/db-pool")).json()
+        assert stats["checked_out"] == 0
+        assert stats["checked_in"] == 1, "The overflow connection should be closed when returned"
+
+    async def test_wait_time_and_timeouts(self, client, pool_engine):
+        """Test that waiting for a connection and timing out are both recorded"""
+        engine = pool_engine()
+        before = (await client.get("/internal/db-pool")).json()
+
+        first, second = engine.connect(), engine.connect()
+        threading.Timer(0.3, first.close).start()
+        started = time.perf_counter()
+        third = engine.connect()
+        assert time.perf_counter() - started >= 0.25, "The checkout should wait for a returned connection"
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        second.close()
+        third.close()
+
+        stats = (await client.get("/internal/db-pool")).json()
+        assert stats["checkouts"] == before["checkouts"] + 3
+        assert stats["timeouts"] == before["timeouts"] + 1
+        assert stats["waiting"] == 0
+        assert stats["wait_seconds_total"] - before["wait_seconds_total"] >= 0.25
+        assert stats["wait_seconds_max_last_minute"] >= 0.25
+
+    async def test_pgbouncer_stats(self, client, pool_engine, monkeypatch):
+        """Test that in PgBouncer mode the pool state is not reported, only the checkouts"""
+        monkeypatch.setattr(db_pool, "DB_PGBOUNCER", True)
+        engine = pool_engine(poolclass=db_pool.InstrumentedNullPool)
+        before = (await client.get("/internal/db-pool")).json()
+        engine.connect().close()
+
+        stats = (await client.get("/internal/db-pool")).json()
+        assert stats["mode"] == "pgbouncer"
+        assert stats["checked_out"] is None and stats["overflow"] is None
+        assert stats["checkouts"] == before["checkouts"] + 1
@@ -0,0 +1,61 @@
+"""
+test_loop_monitor.py - Event Loop Monitor Tests
+-----------------------------------------------
+Tests that blocking the event loop shows up as stalls on /internal/event-loop, and that the
+debug watchdog names the route that blocked it. The conftest turns on LOOP_MONITOR_DEBUG.
+
+Run with: pytest tests/test_loop_monitor.py -v
+"""
+
+import time
+import asyncio
+
+import pytest
+from fastapi import APIRouter
+
+from main import app
+from app.utils.loop_monitor import run_loop_monitor
+
+pytestmark = pytest.mark.anyio
+
+BLOCK_SECONDS = 0.4
+
+router = APIRouter()
+
+
+@router.get("/test/loop-monitor/block")
+async def block_loop():
+    """Blocks the event loop the way a sync call inside an async def endpoint does"""
+    time.sleep(BLOCK_SECONDS)
+    return {"blocked": BLOCK_SECONDS}
+
+
+app.include_router(router)
+
+
+@pytest.mark.loop_monitor
+class TestLoopMonitor:
+    """Test the lag metric and the debug watchdog"""
+
+    async def test_blocking_route_is_reported(self, client):
+        """Test that a route blocking the loop counts as a stall and is named by the watchdog"""
+        before = (await client.get("/internal/event-loop")).json()
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(run_loop_monitor(stop))
+        await asyncio.sleep(0.2)
+
+        await client.get("/test/loop-monitor/block")
+        await asyncio.sleep(0.2)
+        stop.set()
+        await monitor
+
+        metrics = (await client.get("/internal/event-loop")).json()
+        assert metrics["debug"] is True
+        assert metrics["stalls"] > before["stalls"], "Blocking the loop should count as a stall"
+        assert metrics["lag_seconds_max"] >= BLOCK_SECONDS - 0.1
+        assert metrics["stalls_last_minute"] >= 1
+
+        blocks = [b for b in metrics["recent_blocks"] if b["route"] == "GET /test/loop-monitor/block"]
+        assert blocks, "The watchdog should name the route that blocked the loop"
+        assert blocks[-1]["blocked_seconds"] > metrics["block_threshold_seconds"]
+        assert "block_loop" in blocks[-1]["stack"], "The stack should show the blocking endpoint"
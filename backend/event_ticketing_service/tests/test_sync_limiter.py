@@ -0,0 +1,92 @@
+"""
+test_sync_limiter.py - Sync Endpoint Admission Tests
+----------------------------------------------------
+Tests that def endpoints beyond SYNC_CONCURRENCY queue for a slot, that overload is refused
+with a 503 and Retry-After, and that /internal/sync-limiter reports both. The conftest sets
+SYNC_CONCURRENCY and SYNC_QUEUE_SIZE to 1.
+
+Run with: pytest tests/test_sync_limiter.py -v
+"""
+
+import time
+import asyncio
+
+import pytest
+from fastapi import APIRouter
+
+from main import app
+from app.utils import sync_limiter
+from app.utils.sync_limiter import SyncLimitedRoute
+
+pytestmark = pytest.mark.anyio
+
+BUSY_SECONDS = 0.3
+
+router = APIRouter(route_class=SyncLimitedRoute)
+
+
+@router.get("/test/sync-limiter/busy")
+def busy():
+    """Holds a slot the way a def endpoint waiting on the database does"""
+    time.sleep(BUSY_SECONDS)
+    return {"busy": BUSY_SECONDS}
+
+
+app.include_router(router)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Fresh limiter, so its semaphore belongs to the test's event loop and its counts start at 0"""
+    limiter = sync_limiter._SyncLimiter()
+    monkeypatch.setattr(sync_limiter, "_limiter", limiter)
+    return limiter
+
+
+async def _requests(client, count: int, spacing: float = 0.05):
+    """Sends count requests to the busy route, each spacing seconds after the previous one"""
+    tasks = []
+    for _ in range(count):
+        tasks.append(asyncio.create_task(client.get("/test/sync-limiter/busy")))
+        await asyncio.sleep(spacing)
+    return await asyncio.gather(*tasks)
+
+
+@pytest.mark.sync_limiter
+class TestSyncLimiter:
+    """Test the admission of requests to def endpoints"""
+
+    async def test_full_queue_is_rejected(self, client, limiter):
+        """Test that with the slot taken and the queue full, a request gets a 503 right away"""
+        running, queued, rejected = await _requests(client, 3)
+
+        assert running.status_code == 200
+        assert queued.status_code == 200, "A request should wait in the queue for the slot"
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "1"
+        assert rejected.json()["detail"] == "Server is busy, please retry shortly"
+
+        stats = (await client.get("/internal/sync-limiter")).json()
+        assert stats["concurrency"] == 1 and stats["queue_size"] == 1
+        assert stats["running"] == 0 and stats["waiting"] == 0
+        assert stats["admitted"] == 2
+        assert stats["rejected_queue_full"] == 1
+        assert stats["rejected_timeout"] == 0
+        assert stats["rejected_last_minute"] == 1
+        assert stats["queue_seconds_max_last_minute"] >= BUSY_SECONDS - 0.1, \
+            "The queued request should have waited for the running one"
+        assert stats["queue_seconds_total"] >= stats["queue_seconds_max_last_minute"]
+
+    async def test_queue_timeout_is_rejected(self, client, limiter, monkeypatch):
+        """Test that a request waiting longer than SYNC_QUEUE_TIMEOUT_SECONDS gets a 503"""
+        monkeypatch.setattr(sync_limiter, "SYNC_QUEUE_TIMEOUT_SECONDS", 0.1)
+        running, timed_out = await _requests(client, 2)
+
+        assert running.status_code == 200
+        assert timed_out.status_code == 503
+        assert timed_out.headers["Retry-After"] == "1"
+
+        stats = (await client.get("/internal/sync-limiter")).json()
+        assert stats["admitted"] == 1
+        assert stats["rejected_timeout"] == 1
+        assert stats["rejected_queue_full"] == 0
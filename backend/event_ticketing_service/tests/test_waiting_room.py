@@ -0,0 +1,160 @@
+"""
+test_waiting_room.py - Waiting Room Admission Tests
+---------------------------------------------------
+Tests for the admission arithmetic of app/services/waiting_room.py (now_serving, queue_status,
+admitted_at) and for the lifetime and binding of queue tokens. Rooms are built in memory, so
+no database is needed.
+
+Run with: pytest tests/test_waiting_room.py -v
+"""
+
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.waiting_room import WaitingRoomDetails
+from app.services import waiting_room
+from app.services.waiting_room import (
+    WAITING_ROOM_ADMISSION_TTL_SECONDS, admitted_at, decode_queue_token, issue_queue_token, now_serving,
+    queue_status, refresh_queue_token, warsaw_now, warsaw_tz
+)
+from app.utils.jwt_auth import ALGORITHM, SECRET_KEY
+
+OPENS_AT = datetime(2030, 6, 1, 10, 0, 0)
+
+
+def _room(opens_at: datetime = OPENS_AT, rate: int = 60, hours: int = 2) -> WaitingRoomDetails:
+    return WaitingRoomDetails(
+        event_id=1, admission_rate_per_minute=rate, opens_at=opens_at, closes_at=opens_at + timedelta(hours=hours)
+    )
+
+
+def _expiry(token: str) -> datetime:
+    """exp of a token as a naive Warsaw time, like the room timestamps"""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    return datetime.fromtimestamp(payload["exp"], warsaw_tz).replace(tzinfo=None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Sets the Warsaw time queue_status sees"""
+
+    def set_now(now: datetime):
+        monkeypatch.setattr(waiting_room, "warsaw_now", lambda: now)
+
+    return set_now
+
+
+@pytest.mark.waiting_room
+class TestAdmission:
+    """Test the admission of queue positions over time"""
+
+    def test_now_serving(self):
+        """Test that positions are admitted at the room's rate, counted from opens_at"""
+        room = _room(rate=10)
+        assert now_serving(room, OPENS_AT - timedelta(minutes=1)) == 0
+        assert now_serving(room, OPENS_AT) == 0
+        assert now_serving(room, OPENS_AT + timedelta(seconds=90)) == 15
+        assert now_serving(room, OPENS_AT + timedelta(seconds=95)) == 15, "Partly elapsed slots are not admitted"
+
+    def test_queue_status_before_opening(self, clock):
+        """Test that before the room opens the wait covers the time to opening and the queue ahead"""
+        clock(OPENS_AT - timedelta(seconds=100))
+        status = queue_status(_room(rate=60), position=20)
+        assert status.now_serving == 0
+        assert status.people_ahead == 20
+        assert status.admitted is False
+        assert status.estimated_wait_seconds == 120
+        assert status.poll_after_seconds == 12
+
+    def test_queue_status_after_opening(self, clock):
+        """Test that a position is admitted once now_serving reaches it"""
+        clock(OPENS_AT + timedelta(seconds=30))
+        room = _room(rate=60)
+
+        waiting = queue_status(room, position=31)
+        assert waiting.now_serving == 30
+        assert waiting.people_ahead == 1 and waiting.admitted is False
+        assert waiting.estimated_wait_seconds == 1
+        assert waiting.poll_after_seconds == waiting_room.WAITING_ROOM_MIN_POLL_SECONDS
+
+        admitted = queue_status(room, position=30)
+        assert admitted.people_ahead == 0 and admitted.admitted is True
+
+        far_back = queue_status(room, position=10_000)
+        assert far_back.poll_after_seconds == waiting_room.WAITING_ROOM_MAX_POLL_SECONDS
+
+    def test_admitted_at(self):
+        """Test that a position is let in when now_serving reaches it, or when it joins if that is later"""
+        room = _room(rate=60)
+        early = OPENS_AT - timedelta(hours=1)
+        assert admitted_at(room, 90, early) == OPENS_AT + timedelta(seconds=90)
+
+        late = OPENS_AT + timedelta(hours=1)
+        assert admitted_at(room, 90, late) == late
+
+
+@pytest.mark.waiting_room
+class TestQueueTokens:
+    """Test the lifetime and binding of queue tokens"""
+
+    def test_token_expires_after_admission(self):
+        """Test that a token expires WAITING_ROOM_ADMISSION_TTL_SECONDS after its position is admitted"""
+        room = _room(opens_at=warsaw_now() + timedelta(minutes=5), rate=60)
+        token = issue_queue_token(room, user_id=7, position=120)
+
+        payload = decode_queue_token(token)
+        assert payload["user_id"] == 7 and payload["position"] == 120 and payload["event_id"] == 1
+        expected = room.opens_at + timedelta(seconds=120 + WAITING_ROOM_ADMISSION_TTL_SECONDS)
+        assert abs((_expiry(token) - expected).total_seconds()) <= 1
+
+    def test_token_expiry_capped_at_closing(self):
+        """Test that no token outlives its room"""
+        room = _room(opens_at=warsaw_now(), rate=1, hours=1)
+        token = issue_queue_token(room, user_id=7, position=50)
+        assert abs((_expiry(token) - room.closes_at).total_seconds()) <= 1
+
+    def test_expired_token_is_refused(self):
+        """Test that a token whose admission window has passed is refused"""
+        opens_at = warsaw_now() - timedelta(seconds=WAITING_ROOM_ADMISSION_TTL_SECONDS + 120)
+        room = _room(opens_at=opens_at, rate=60)
+        token = waiting_room._encode_queue_token(room, user_id=7, position=1, joined_at=opens_at)
+
+        with pytest.raises(HTTPException) as error:
+            decode_queue_token(token)
+        assert error.value.status_code == 403
+        assert error.value.detail == "Queue token has expired"
+
+    def test_refresh_follows_rate_changes(self):
+        """Test that a refreshed token keeps its user and position and takes the room's new rate"""
+        room = _room(opens_at=warsaw_now() + timedelta(minutes=5), rate=60)
+        payload = decode_queue_token(issue_queue_token(room, user_id=7, position=120))
+
+        slower = room.model_copy(update={"admission_rate_per_minute": 30})
+        refreshed = refresh_queue_token(slower, payload)
+        refreshed_payload = decode_queue_token(refreshed)
+        assert refreshed_payload["user_id"] == 7 and refreshed_payload["position"] == 120
+        assert refreshed_payload["joined_at"] == payload["joined_at"]
+        expected = room.opens_at + timedelta(seconds=240 + WAITING_ROOM_ADMISSION_TTL_SECONDS)
+        assert abs((_expiry(refreshed) - expected).total_seconds()) <= 1
+
+    def test_refresh_of_token_without_join_time(self):
+        """Test that tokens issued before they carried joined_at are refreshed as joined now"""
+        room = _room(opens_at=warsaw_now() - timedelta(hours=1), rate=60)
+        refreshed = refresh_queue_token(room, {"user_id": 7, "position": 1})
+        expected = warsaw_now() + timedelta(seconds=WAITING_ROOM_ADMISSION_TTL_SECONDS)
+        assert abs((_expiry(refreshed) - expected).total_seconds()) <= 2
+
+    def test_token_of_another_user_is_refused(self, monkeypatch):
+        """Test that an admitted token only admits the user it was issued to"""
+        room = _room(opens_at=warsaw_now() - timedelta(minutes=1), rate=60)
+        monkeypatch.setattr(waiting_room._room_cache, "get_rooms", lambda db: {room.event_id: room})
+        token = issue_queue_token(room, user_id=7, position=1)
+
+        waiting_room._require_admission(None, 7, [room.event_id], token)
+        with pytest.raises(HTTPException) as error:
+            waiting_room._require_admission(None, 8, [room.event_id], token)
+        assert error.value.status_code == 403
+        assert error.value.detail == "Queue token belongs to another user"
@@ -5,9 +5,11 @@ Shared utilities, fixtures, and base classes for all test modules.
 """
 
 import os
+import json
+import time
 import random
 import string
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Optional, Any, List
 from pathlib import Path
 
@@ -28,10 +30,14 @@ def get_config():
     """Get configuration from environment variables with defaults"""
     return {
         "base_url": os.getenv("API_BASE_URL", "http://localhost:8080").rstrip('/'),
+        # The events service itself, for its /internal endpoints that the gateway does not route
+        "events_service_url": os.getenv("EVENTS_SERVICE_URL", "http://localhost:8001").rstrip('/'),
         "timeout": int(os.getenv("API_TIMEOUT", "10")),
         "admin_secret": os.getenv("ADMIN_SECRET_KEY"),
         "initial_admin_email": os.getenv("INITIAL_ADMIN_EMAIL", "admin@resellio.com"),
         "initial_admin_password": os.getenv("INITIAL_ADMIN_PASSWORD", "AdminPassword123!"),
+        "email_transport": os.getenv("EMAIL_TRANSPORT", "sendgrid"),
+        "mail_sink_dir": os.getenv("MAIL_SINK_DIR", str(project_root / ".mail_sink")),
     }
 
 
@@ -924,6 +930,154 @@ class CartManager:
         return response.json()
 
 
+class MailSink:
+    """Reads messages delivered by the email worker when EMAIL_TRANSPORT=file"""
+
+    def __init__(self, sink_dir: str = None):
+        config = get_config()
+        self.enabled = config["email_transport"] == "file"
+        self.sink_dir = Path(sink_dir or config["mail_sink_dir"])
+
+    def messages_for(self, recipient: str) -> List[Dict[str, Any]]:
+        """Return all delivered messages addressed to recipient"""
+        if not self.sink_dir.exists():
+            return []
+
+        messages = []
+        for path in sorted(self.sink_dir.glob("*.json")):
+            message = json.loads(path.read_text(encoding="utf-8"))
+            recipients = [
+                to["email"]
+                for personalization in message.get("personalizations", [])
+                for to in personalization.get("to", [])
+            ]
+            if recipient in recipients:
+                messages.append(message)
+        return messages
+
+    def wait_for_messages(self, recipient: str, count: int, timeout: float = 30.0) -> List[Dict[str, Any]]:
+        """Poll the sink until at least count messages for recipient arrived or timeout expires"""
+        deadline = time.monotonic() + timeout
+        messages = self.messages_for(recipient)
+        while len(messages) < count and time.monotonic() < deadline:
+            time.sleep(0.5)
+            messages = self.messages_for(recipient)
+        return messages
+
+
+def prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager):
+    """Prepare comprehensive test data for the catalog list tests (pagination, filters, caching)"""
+    print_test_config()
+
+    # Create users
+    customer_data = user_manager.register_and_login_customer()
+    customer2_data = user_manager.register_and_login_customer2()
+    organizer_data = user_manager.register_and_login_organizer()
+    admin_data = user_manager.register_and_login_admin()
+
+    # Create multiple events with different characteristics
+    events = []
+    ticket_types = []
+
+    # Event 1: Music concert in the future
+    event1_data = {
+        "organizer_id": 1,
+        "name": "Rock Concert 2025",
+        "description": "An amazing rock concert with live music",
+        "start_date": (datetime.now() + timedelta(days=30)).isoformat(),
+        "end_date": (datetime.now() + timedelta(days=30, hours=3)).isoformat(),
+        "minimum_age": 18,
+        "location_id": 1,
+        "category": ["Music", "Rock", "Live"],  # This will be converted to categories
+        "total_tickets": 100,
+        "standard_ticket_price": 50.0,
+        "ticket_sales_start": datetime.now().isoformat(),
+    }
+    event1 = event_manager.create_event(1, event1_data)
+    events.append(event1)
+
+    # Event 2: Theater show
+    event2_data = {
+        "organizer_id": 1,
+        "name": "Shakespeare Theater",
+        "description": "Classic theater performance of Hamlet",
+        "start_date": (datetime.now() + timedelta(days=45)).isoformat(),
+        "end_date": (datetime.now() + timedelta(days=45, hours=2)).isoformat(),
+        "minimum_age": 12,
+        "location_id": 1,
+        "category": ["Theater", "Classic", "Drama"],
+        "total_tickets": 200,
+        "standard_ticket_price": 75.0,
+        "ticket_sales_start": datetime.now().isoformat(),
+    }
+    event2 = event_manager.create_event(1, event2_data)
+    events.append(event2)
+
+    # Event 3: Sports event
+    event3_data = {
+        "organizer_id": 1,
+        "name": "Football Championship",
+        "description": "Championship football match",
+        "start_date": (datetime.now() + timedelta(days=60)).isoformat(),
+        "end_date": (datetime.now() + timedelta(days=60, hours=2)).isoformat(),
+        "minimum_age": 0,
+        "location_id": 1,
+        "category": ["Sports", "Football", "Championship"],
+        "total_tickets": 500,
+        "standard_ticket_price": 100.0,
+        "ticket_sales_start": datetime.now().isoformat(),
+    }
+    event3 = event_manager.create_event(1, event3_data)
+    events.append(event3)
+
+    # Create additional ticket types with different prices
+    for i, event in enumerate(events):
+        # VIP ticket
+        vip_ticket = {
+            "event_id": event["event_id"],
+            "description": f"VIP Access - Event {i + 1}",
+            "max_count": 20,
+            "price": 150.0 + (i * 50),  # 150, 200, 250
+            "currency": "PLN",
+            "available_from": datetime.now().isoformat()
+        }
+        vip_type = event_manager.create_ticket_type(event["event_id"], vip_ticket)
+        ticket_types.append(vip_type)
+
+    # Purchase some tickets and list them for resale
+    purchased_tickets = []
+    # Get all ticket types for the events
+    all_ticket_types = event_manager.get_ticket_types()
+    available_types = [tt for tt in all_ticket_types if tt.get("type_id")]
+
+    for i, ticket_type in enumerate(available_types[:3]):  # Purchase from first 3 ticket types
+        try:
+            cart_manager.add_item_to_cart(ticket_type["type_id"], 1)
+            cart_manager.checkout()
+
+            # Get purchased tickets
+            tickets = ticket_manager.list_tickets()
+            if tickets:
+                ticket = tickets[-1]  # Get the most recently purchased ticket
+                purchased_tickets.append(ticket)
+
+                # List some tickets for resale at different prices
+                resale_price = ticket_type["price"] * (1.2 + i * 0.1)  # 20%, 30%, 40% markup
+                ticket_manager.resell_ticket(ticket["ticket_id"], resale_price)
+        except Exception as e:
+            print(f"Warning: Could not purchase/resell ticket type {ticket_type.get('type_id')}: {e}")
+
+    return {
+        "customer": customer_data,
+        "customer2": customer2_data,
+        "organizer": organizer_data,
+        "admin": admin_data,
+        "events": events,
+        "ticket_types": ticket_types,
+        "purchased_tickets": purchased_tickets
+    }
+
+
 # Utility functions
 def print_test_config():
     """Print current test configuration"""
@@ -116,6 +116,26 @@ class TestAdminUserListing:
         page2_ids = {user["user_id"] for user in users_page2}
         assert page1_ids.isdisjoint(page2_ids)
 
+    def test_list_users_with_cursor(self, api_client):
+        """Test following X-Next-Cursor through the user list"""
+        headers = self.token_manager.get_auth_header("admin")
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/auth/users?sort_by=user_type&sort_order=asc&limit=2"
+            response = api_client.get(url + (f"&after={cursor}" if cursor else ""), headers=headers)
+            seen.extend(user["user_id"] for user in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        # user_type has many ties, user_id keeps them in a stable order across pages
+        assert len(seen) == len(set(seen))
+        all_users = api_client.get(
+            "/api/auth/users?sort_by=user_type&sort_order=asc&limit=100", headers=headers
+        ).json()
+        assert seen[:len(all_users)] == [user["user_id"] for user in all_users]
+
     def test_search_users_by_email(self, api_client):
         """Test searching users by email"""
         # Search for a specific customer
@@ -0,0 +1,177 @@
+"""
+test_catalog_caching.py - Catalog List Caching Tests
+----------------------------------------------------
+Tests for revalidating the catalog lists with ETags and for the caches in front of them.
+
+Environment Variables:
+- API_BASE_URL: Base URL for API (default: http://localhost:8080)
+- EVENTS_SERVICE_URL: Events service, for its metrics on /internal (default: http://localhost:8001)
+- API_TIMEOUT: Request timeout in seconds (default: 10)
+- ADMIN_SECRET_KEY: Admin secret key for registration
+
+Run with: pytest test_catalog_caching.py -v
+"""
+
+import time
+
+import pytest
+
+from helper import (
+    APIClient, TokenManager, UserManager, EventManager, CartManager, TicketManager, get_config, prepare_test_data
+)
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """API client fixture"""
+    return APIClient()
+
+
+@pytest.fixture(scope="session")
+def token_manager():
+    """Token manager fixture"""
+    return TokenManager()
+
+
+@pytest.fixture(scope="session")
+def user_manager(api_client, token_manager):
+    """User manager fixture"""
+    return UserManager(api_client, token_manager)
+
+
+@pytest.fixture(scope="session")
+def event_manager(api_client, token_manager):
+    """Event manager fixture"""
+    return EventManager(api_client, token_manager)
+
+
+@pytest.fixture(scope="session")
+def cart_manager(api_client, token_manager):
+    """Cart manager fixture"""
+    return CartManager(api_client, token_manager)
+
+
+@pytest.fixture(scope="session")
+def ticket_manager(api_client, token_manager):
+    """Ticket manager fixture"""
+    return TicketManager(api_client, token_manager)
+
+
+@pytest.mark.conditional_get
+class TestConditionalGet:
+    """Test ETag / If-None-Match revalidation of the catalog lists"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.event_manager = event_manager
+        self.api_client = APIClient()
+
+    def test_catalog_lists_not_modified(self):
+        """Test that every catalog list answers a matching If-None-Match with 304"""
+        for url in ["/api/events?limit=5", "/api/locations/", "/api/ticket-types/", "/api/resale/marketplace"]:
+            response = self.api_client.get(url)
+            etag = response.headers.get("ETag")
+            assert etag, f"{url} should send an ETag"
+
+            response = self.api_client.get(url, headers={"If-None-Match": etag}, expected_status=304)
+            assert response.content == b"", "A 304 should have no body"
+            assert response.headers.get("ETag") == etag, "A 304 should repeat the ETag"
+
+            self.api_client.get(url, headers={"If-None-Match": 'W/"stale"'}, expected_status=200)
+        print("✓ Catalog lists answer If-None-Match with 304")
+
+    def test_etag_changes_after_write(self):
+        """Test that adding a ticket type invalidates the ETags of the events and ticket types lists"""
+        event = self.test_data["events"][0]
+        etags = {url: self.api_client.get(url).headers["ETag"] for url in ["/api/events?limit=5", "/api/ticket-types/"]}
+
+        self.event_manager.create_ticket_type(event["event_id"])
+
+        for url, etag in etags.items():
+            response = self.api_client.get(url, headers={"If-None-Match": etag}, expected_status=200)
+            assert response.headers["ETag"] != etag, f"{url} should get a new ETag after a write"
+        print("✓ Writes invalidate the ETags of the lists they change")
+
+    def test_conditional_get_metrics(self):
+        """Test that 304s are counted in the conditional GET metrics"""
+        etag = self.api_client.get("/api/locations/").headers["ETag"]
+        self.api_client.get("/api/locations/", headers={"If-None-Match": etag}, expected_status=304)
+
+        response = APIClient(base_url=get_config()["events_service_url"]).get("/internal/conditional-get")
+        locations = next(m for m in response.json() if m["path"] == "/api/locations/")
+        assert locations["not_modified"] >= 1, "The 304 should be counted"
+        assert 0 < locations["hit_rate"] <= 1, "hit_rate should be the share of revalidations answered with 304"
+
+        # Per-instance metrics are internal, the gateway must not expose them
+        self.api_client.get("/api/metrics/conditional-get", expected_status=404)
+        print("✓ 304 hit rate is reported")
+
+
+@pytest.mark.gateway_cache
+class TestGatewayMicroCache:
+    """Test the API gateway micro-cache in front of the catalog lists"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.event_manager = event_manager
+        self.api_client = APIClient()
+
+    def test_gateway_micro_cache(self):
+        """Test that the API gateway caches anonymous catalog lists, skips it with credentials and purges on writes"""
+        url = "/api/locations/"
+        if "X-Cache-Status" not in self.api_client.get(url).headers:
+            pytest.skip("Not running behind the API gateway")
+        assert self.api_client.get(url).headers["X-Cache-Status"] == "HIT", "A repeated anonymous GET should be cached"
+
+        auth = self.event_manager.token_manager.get_auth_header("organizer")
+        response = self.api_client.get(url, headers=auth)
+        assert response.headers["X-Cache-Status"] == "BYPASS", "Authenticated requests should skip the cache"
+
+        event = self.test_data["events"][0]
+        url = f"/api/events?search={event['name']}"
+        before = next(e for e in self.api_client.get(url).json() if e["event_id"] == event["event_id"])
+        created = self.event_manager.create_ticket_type(event["event_id"])
+        time.sleep(1.5)  # the gateway reuses the catalog versions for 1s
+        response = self.api_client.get(url)
+        assert response.headers["X-Cache-Status"] != "HIT", "A write should purge the cached lists it changes"
+        after = next(e for e in response.json() if e["event_id"] == event["event_id"])
+        assert after["total_tickets"] == before["total_tickets"] + created["max_count"], \
+            "The refetched list should include the write"
+        print("✓ Gateway caches anonymous catalog lists and purges them on writes")
+
+
+@pytest.mark.caching
+class TestReferenceCaches:
+    """Test the in-process caches of the reference data lists"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.event_manager = event_manager
+        self.api_client = APIClient()
+
+    def test_reference_caches(self):
+        """Test that repeated reference reads hit the cache and writes are visible right away"""
+        event = self.test_data["events"][0]
+        url = f"/api/ticket-types/?event_id={event['event_id']}"
+        before = self.api_client.get(url).json()
+        assert self.api_client.get(url).json() == before, "A cached list should match the first read"
+
+        created = self.event_manager.create_ticket_type(event["event_id"])
+        after = self.api_client.get(url).json()
+        assert any(t["type_id"] == created["type_id"] for t in after), \
+            "A new ticket type should not be hidden by the cache"
+
+        self.api_client.get("/api/locations/")
+        self.api_client.get("/api/locations/")
+        events_service = APIClient(base_url=get_config()["events_service_url"])
+        caches = {c["name"]: c for c in events_service.get("/internal/caches").json()}
+        for name in ["locations", "ticket_types"]:
+            assert caches[name]["hits"] >= 1, f"Repeated reads should hit the {name} cache"
+            assert caches[name]["size"] <= caches[name]["maxsize"], "Caches should stay within their size limit"
+        print("✓ Reference data is served from the cache and invalidated by writes")
@@ -0,0 +1,227 @@
+"""
+test_event_catalog.py - Event Catalog Search and Filter Tests
+-------------------------------------------------------------
+Tests for searching the events list and filtering it on the summaries kept per event.
+
+Environment Variables:
+- API_BASE_URL: Base URL for API (default: http://localhost:8080)
+- API_TIMEOUT: Request timeout in seconds (default: 10)
+- ADMIN_SECRET_KEY: Admin secret key for registration
+
+Run with: pytest test_event_catalog.py -v
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helper import (
+    APIClient, TokenManager, UserManager, EventManager, CartManager, TicketManager, prepare_test_data
+)
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """API client fixture"""
+    return APIClient()
+
+
+@pytest.fixture(scope="session")
+def token_manager():
+    """Token manager fixture"""
+    return TokenManager()
+
+
+@pytest.fixture(scope="session")
+def user_manager(api_client, token_manager):
+    """User manager fixture"""
+    return UserManager(api_client, token_manager)
+
+
+@pytest.fixture(scope="session")
+def event_manager(api_client, token_manager):
+    """Event manager fixture"""
+    return EventManager(api_client, token_manager)
+
+
+@pytest.fixture(scope="session")
+def cart_manager(api_client, token_manager):
+    """Cart manager fixture"""
+    return CartManager(api_client, token_manager)
+
+
+@pytest.fixture(scope="session")
+def ticket_manager(api_client, token_manager):
+    """Ticket manager fixture"""
+    return TicketManager(api_client, token_manager)
+
+
+@pytest.mark.search
+class TestEventSearch:
+    """Test full-text and trigram search of the events list"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.api_client = APIClient()
+
+    def test_events_relevance_search(self):
+        """Test word prefix and misspelled searches and sorting them by relevance"""
+        # Word prefix, matched through the full-text index
+        response = self.api_client.get("/api/events?search=Shakesp")
+        assert any("Shakespeare" in e["name"] for e in response.json()), "Should find events by word prefix"
+
+        # Misspelled name, matched through trigram similarity; relevance sorts most relevant first by default
+        response = self.api_client.get("/api/events?search=Shakespeare Theatre&sort_by=relevance")
+        events = response.json()
+        assert events, "Should find events with a misspelled name"
+        assert events[0]["name"] == "Shakespeare Theater", "Closest name should rank first"
+
+        response = self.api_client.get("/api/events?search=Shakespeare Theatre&sort_by=relevance&sort_order=asc")
+        assert response.json()[-1]["name"] == "Shakespeare Theater", "Closest name should rank last in asc order"
+
+        # Relevance only makes sense for a search
+        self.api_client.get("/api/events?sort_by=relevance", expected_status=400)
+
+
+@pytest.mark.categories
+class TestEventCategories:
+    """Test storing, filtering and counting event categories"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.api_client = APIClient()
+
+    def test_events_categories_filter_and_facets(self):
+        """Test that categories are stored, filtered with any/all matching and counted"""
+        rock_event = self.test_data["events"][0]
+        assert rock_event["categories"] == ["Music", "Rock", "Live"], "Categories should be returned as created"
+
+        response = self.api_client.get("/api/events?categories=Rock,Drama")
+        events = response.json()
+        assert any(e["event_id"] == rock_event["event_id"] for e in events), "Should find events in any category"
+        for event in events:
+            assert {"Rock", "Drama"} & set(event["categories"]), "Every event should be in one of the categories"
+
+        response = self.api_client.get("/api/events?categories=Music,Rock&categories_match=all")
+        for event in response.json():
+            assert {"Music", "Rock"} <= set(event["categories"]), "Every event should be in all categories"
+
+        response = self.api_client.get("/api/events/categories?categories=Rock")
+        facets = {facet["category"]: facet["events"] for facet in response.json()}
+        assert facets.get("Rock", 0) >= 1, "Rock events should be counted"
+        assert facets.get("Music", 0) >= 1, "Other categories of the matching events should be counted"
+        print("✓ Categories are filtered and counted")
+
+
+@pytest.mark.price_bounds
+class TestEventPriceBounds:
+    """Test the price range kept per event and filtering on it"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.api_client = APIClient()
+
+    def test_events_price_bounds(self):
+        """Test that events carry the price range of their ticket types and filter on it"""
+        rock_event = self.test_data["events"][0]
+        response = self.api_client.get(f"/api/events?search={rock_event['name']}&limit=100")
+        event = next(e for e in response.json() if e["event_id"] == rock_event["event_id"])
+        # Standard ticket at 50, VIP ticket at 150
+        assert event["min_price"] == 50.0, "min_price should be the cheapest ticket type"
+        assert event["max_price"] == 150.0, "max_price should be the most expensive ticket type"
+
+        response = self.api_client.get("/api/events?min_price=140&max_price=160&limit=100")
+        assert any(e["event_id"] == rock_event["event_id"] for e in response.json()), \
+            "Events with a ticket type in the range should match"
+        for e in response.json():
+            assert e["max_price"] >= 140 and e["min_price"] <= 160, "Price ranges should overlap the filter"
+
+        response = self.api_client.get("/api/events?min_price=151&limit=100")
+        assert all(e["event_id"] != rock_event["event_id"] for e in response.json()), \
+            "Events whose tickets are all cheaper should not match"
+        print("✓ Events are filtered by their ticket price range")
+
+
+@pytest.mark.availability
+class TestEventAvailability:
+    """Test the sold-out flag kept per event and filtering on it"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager)
+        self.event_manager = event_manager
+        self.api_client = APIClient()
+
+    def test_events_availability_filter(self):
+        """Test that events report their remaining tickets and filter on availability"""
+        rock_event = self.test_data["events"][0]
+        response = self.api_client.get(f"/api/events?search={rock_event['name']}&limit=100")
+        event = next(e for e in response.json() if e["event_id"] == rock_event["event_id"])
+        assert event["sold_out"] is False, "An event with tickets left should not be sold out"
+        assert 0 < event["remaining_tickets"] <= event["total_tickets"], "remaining_tickets should be reported"
+
+        response = self.api_client.get("/api/events?has_available_tickets=true&limit=100")
+        assert all(not e["sold_out"] for e in response.json()), "Only events with tickets left should match"
+        assert any(e["event_id"] == rock_event["event_id"] for e in response.json()), \
+            "Events with tickets left should match"
+
+        response = self.api_client.get("/api/events?has_available_tickets=false&limit=100")
+        assert all(e["sold_out"] for e in response.json()), "Only sold out events should match"
+        print("✓ Events are filtered by ticket availability")
+
+    def test_event_without_ticket_types_is_not_sold_out(self):
+        """Test that an event whose ticket types are not set up yet is listed as available, not sold out"""
+        event = self.event_manager.create_event()
+        for ticket_type in self.event_manager.get_ticket_types({"event_id": event["event_id"]}):
+            self.event_manager.delete_ticket_type(ticket_type["type_id"])
+
+        url = f"/api/events?search={event['name']}&sort_by=creation_date&sort_order=desc&limit=100"
+        listed = next(e for e in self.api_client.get(url).json() if e["event_id"] == event["event_id"])
+        assert listed["sold_out"] is False, "An event without ticket types should not be sold out"
+
+        response = self.api_client.get(f"{url}&has_available_tickets=true")
+        assert any(e["event_id"] == event["event_id"] for e in response.json()), \
+            "An event without ticket types should not be hidden by has_available_tickets=true"
+        response = self.api_client.get(f"{url}&has_available_tickets=false")
+        assert all(e["event_id"] != event["event_id"] for e in response.json()), \
+            "An event without ticket types should not be listed as sold out"
+        print("✓ Events without ticket types are not sold out")
+
+    def test_concurrent_last_units_of_two_types_sell_out_event(self, token_manager):
+        """Test that checkouts of the last unit of two ticket types at once leave the event sold out"""
+        event = self.event_manager.create_event()
+        for ticket_type in self.event_manager.get_ticket_types({"event_id": event["event_id"]}):
+            self.event_manager.delete_ticket_type(ticket_type["type_id"])
+        type_ids = [
+            self.event_manager.create_ticket_type(custom_data={
+                "event_id": event["event_id"], "description": f"Last seat {n}", "max_count": 1,
+                "price": 49.99, "currency": "PLN", "available_from": "2025-04-15T10:00:00",
+            })["type_id"]
+            for n in range(2)
+        ]
+
+        # Each customer holds the last unit of one type, then both check out at once
+        buyers = ["customer", "customer2"]
+        for buyer, type_id in zip(buyers, type_ids):
+            self.api_client.post(
+                f"/api/cart/items?ticket_type_id={type_id}&quantity=1", headers=token_manager.get_auth_header(buyer)
+            )
+
+        def checkout(buyer: str) -> bool:
+            # One client per thread, requests sessions are not thread safe
+            return APIClient().post("/api/cart/checkout", headers=token_manager.get_auth_header(buyer)).json()
+
+        with ThreadPoolExecutor(max_workers=len(buyers)) as pool:
+            assert list(pool.map(checkout, buyers)) == [True, True]
+
+        url = f"/api/events?search={event['name']}&sort_by=creation_date&sort_order=desc&limit=100"
+        listed = next(e for e in self.api_client.get(url).json() if e["event_id"] == event["event_id"])
+        assert listed["sold_out"] is True, "Selling the last units of every type at once should sell out the event"
+        print("✓ Concurrent checkouts of the last units of two types sold out the event")
@@ -11,6 +11,10 @@ Environment Variables:
 
 Run with: pytest test_events_tickets_cart.py -v
 """
+import json
+import time
+import uuid
+import base64
 from datetime import datetime
 from typing import Dict, Any
 
@@ -18,7 +22,7 @@ import pytest
 
 from helper import (
     APIClient, TokenManager, TestDataGenerator, UserManager, EventManager, CartManager,
-    TicketManager, ResaleManager, print_test_config
+    TicketManager, ResaleManager, MailSink, print_test_config
 )
 
 
@@ -84,6 +88,11 @@ def validate_ticket_type_response(ticket_data: Dict[str, Any]) -> None:
         # Should be valid datetime string
         assert isinstance(ticket_data["available_from"], str), "available_from must be string"
 
+    if "remaining_count" in ticket_data and ticket_data["remaining_count"] is not None:
+        assert isinstance(ticket_data["remaining_count"], int), "remaining_count must be integer"
+        assert 0 <= ticket_data["remaining_count"] <= ticket_data["max_count"], \
+            "remaining_count must be between 0 and max_count"
+
 
 def validate_cart_item_response(cart_item: Dict[str, Any]) -> None:
     """Validate CartItemWithDetails response structure"""
@@ -544,6 +553,22 @@ class TestShoppingCart:
 
         print(f"✓ Added {cart_item['quantity']} tickets to cart")
 
+    def test_add_same_ticket_type_merges_lines(self, cart_manager):
+        """Test adding a ticket type that is already in the cart merges into the existing line"""
+        ticket_type_id = self.test_ticket_type.get("type_id")
+
+        first = cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=1)
+        second = cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=2)
+
+        assert second["cart_item_id"] == first["cart_item_id"], "Second add should reuse the cart line"
+        assert second["quantity"] == 3
+        assert second["held_quantity"] == 3
+
+        lines = [item for item in cart_manager.get_cart_items() if item["ticket_type"]["type_id"] == ticket_type_id]
+        assert len(lines) == 1, "Cart should hold a single line per ticket type"
+
+        print("✓ Two adds merged into one cart line of 3 tickets")
+
     def test_get_cart_items_with_data(self, cart_manager):
         """Test getting cart items after adding with validation"""
         ticket_type_id = self.test_ticket_type.get("type_id")
@@ -595,6 +620,160 @@ class TestShoppingCart:
         else:
             print("! Checkout returned False (may be expected behavior)")
 
+    def test_checkout_decrements_remaining_count(self, cart_manager):
+        """Test checkout claims tickets from the ticket type's remaining count"""
+        ticket_type_id = self.test_ticket_type.get("type_id")
+        assert self.test_ticket_type["remaining_count"] == self.test_ticket_type["max_count"]
+
+        cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=3)
+        assert cart_manager.checkout() is True
+
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert len(ticket_types) == 1
+        validate_ticket_type_response(ticket_types[0])
+        assert ticket_types[0]["remaining_count"] == self.test_ticket_type["max_count"] - 3
+
+        print(f"✓ Remaining count after checkout: {ticket_types[0]['remaining_count']}")
+
+    def test_checkout_reports_every_failing_line(self, cart_manager, api_client, token_manager):
+        """Test checkout validates the whole cart and lists all failing lines in one response"""
+        other_event = self.event_manager.create_event()
+        other_ticket_type = self.event_manager.create_ticket_type(other_event["event_id"])
+
+        cart_manager.add_item_to_cart(ticket_type_id=self.test_ticket_type["type_id"], quantity=1)
+        cart_manager.add_item_to_cart(ticket_type_id=other_ticket_type["type_id"], quantity=1)
+
+        # Both events go off sale while the tickets sit in the cart
+        assert self.event_manager.delete_event(self.test_event["event_id"]) is True
+        assert self.event_manager.delete_event(other_event["event_id"]) is True
+
+        response = api_client.post(
+            "/api/cart/checkout",
+            headers=token_manager.get_auth_header("customer"),
+            expected_status=400
+        )
+        detail = response.json()["detail"]
+        assert self.test_event["name"] in detail
+        assert other_event["name"] in detail
+
+        ticket_types = self.event_manager.get_ticket_types({"type_id": other_ticket_type["type_id"]})
+        assert ticket_types[0]["remaining_count"] == other_ticket_type["max_count"] - 1, \
+            "Rejected checkout must leave the cart holds in place"
+
+        # Drop the lines that can no longer be bought, so later checkouts are not affected
+        failing_type_ids = {self.test_ticket_type["type_id"], other_ticket_type["type_id"]}
+        for item in cart_manager.get_cart_items():
+            if item["ticket_type"]["type_id"] in failing_type_ids:
+                cart_manager.remove_item_from_cart(item["cart_item_id"])
+
+        print(f"✓ Checkout rejected with every failing line reported: {detail}")
+
+    def test_checkout_replays_idempotency_key(self, cart_manager, api_client, token_manager):
+        """Test a retried checkout with the same Idempotency-Key does not mint tickets twice"""
+        ticket_type_id = self.test_ticket_type.get("type_id")
+        headers = {**token_manager.get_auth_header("customer"), "Idempotency-Key": str(uuid.uuid4())}
+
+        cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=2)
+        first = api_client.post("/api/cart/checkout", headers=headers)
+        assert first.json() is True
+
+        # The retry finds an empty cart, but must replay the stored result instead of failing
+        cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=1)
+        replay = api_client.post("/api/cart/checkout", headers=headers)
+        assert replay.json() is True
+        assert replay.headers.get("Idempotent-Replayed") == "true"
+
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert ticket_types[0]["remaining_count"] == self.test_ticket_type["max_count"] - 3, \
+            "Replay must not check out the new cart contents"
+
+        print("✓ Checkout replayed from its Idempotency-Key")
+
+    def test_add_to_cart_rejects_oversell(self, api_client, token_manager):
+        """Test adding more tickets than remain is rejected before anything is held"""
+        ticket_type_id = self.test_ticket_type.get("type_id")
+        max_count = self.test_ticket_type["max_count"]
+
+        response = api_client.post(
+            f"/api/cart/items?ticket_type_id={ticket_type_id}&quantity={max_count + 1}",
+            headers=token_manager.get_auth_header("customer"),
+            expected_status=400
+        )
+        assert "Not enough tickets" in response.json()["detail"]
+
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert ticket_types[0]["remaining_count"] == max_count, "Rejected add must not hold inventory"
+
+        print("✓ Oversell attempt rejected without holding inventory")
+
+    def test_cart_items_hold_inventory(self, cart_manager):
+        """Test adding to the cart holds units and removing the line gives them back"""
+        ticket_type_id = self.test_ticket_type.get("type_id")
+        max_count = self.test_ticket_type["max_count"]
+
+        cart_item = cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=2)
+        assert cart_item["held_quantity"] == 2
+        assert cart_item["hold_expires_at"] is not None
+
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert ticket_types[0]["remaining_count"] == max_count - 2, "Cart hold should reduce remaining tickets"
+
+        assert cart_manager.remove_item_from_cart(cart_item["cart_item_id"]) is True
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert ticket_types[0]["remaining_count"] == max_count, "Removing the line should release its hold"
+
+        print("✓ Cart line held 2 tickets and released them on removal")
+
+    def test_sharded_inventory_holds_and_sells(self, api_client, token_manager, cart_manager):
+        """Test a ticket type split over inventory shards keeps its totals through holds, checkout and unsharding"""
+        ticket_type_id = self.test_ticket_type.get("type_id")
+        max_count = self.test_ticket_type["max_count"]
+
+        def set_shards(shards: int) -> Dict[str, Any]:
+            response = api_client.put(
+                f"/api/ticket-types/{ticket_type_id}/inventory-shards",
+                headers={
+                    **token_manager.get_auth_header("organizer"),
+                    "Content-Type": "application/json"
+                },
+                json_data={"shards": shards}
+            )
+            return response.json()
+
+        assert set_shards(4)["inventory_shards"] == 4
+
+        cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=2)
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert ticket_types[0]["remaining_count"] == max_count - 2, "Sharded hold should reduce remaining tickets"
+
+        assert cart_manager.checkout() is True
+        ticket_types = self.event_manager.get_ticket_types({"type_id": ticket_type_id})
+        assert ticket_types[0]["remaining_count"] == max_count - 2, "Sold units should stay counted"
+
+        unsharded = set_shards(1)
+        assert unsharded["inventory_shards"] == 1
+        assert unsharded["remaining_count"] == max_count - 2, "Unsharding should keep the sold units"
+
+        print("✓ Sharded ticket type held, sold and folded back 2 tickets")
+
+    def test_checkout_delivers_confirmation_emails(self, cart_manager, token_manager):
+        """Test checkout queues one confirmation per ticket and the worker delivers them"""
+        mail_sink = MailSink()
+        if not mail_sink.enabled:
+            pytest.skip("Mail sink is only available with EMAIL_TRANSPORT=file")
+
+        customer_email = token_manager.get_user("customer")["email"]
+        ticket_type_id = self.test_ticket_type.get("type_id")
+        cart_manager.add_item_to_cart(ticket_type_id=ticket_type_id, quantity=2)
+        assert cart_manager.checkout() is True
+
+        messages = mail_sink.wait_for_messages(customer_email, count=2)
+        assert len(messages) == 2, f"Expected 2 confirmation emails for {customer_email}, got {len(messages)}"
+        for message in messages:
+            assert message["subject"].startswith("Your Ticket for")
+
+        print(f"✓ Worker delivered {len(messages)} confirmation emails")
+
     def test_cart_price_calculations(self, cart_manager):
         """Test cart price calculations are accurate"""
         ticket_type_id = self.test_ticket_type.get("type_id")
@@ -633,6 +812,123 @@ class TestShoppingCart:
         print("✓ Empty cart checkout properly handled")
 
 
+@pytest.mark.cart
+class TestWaitingRoom:
+    """Test admission control in front of the cart for high-demand events"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager):
+        """Setup an event with a ticket type on sale"""
+        self.test_env = prepare_test_env(user_manager, event_manager, cart_manager)
+        self.cart_manager = cart_manager
+        self.event_manager = event_manager
+
+        self.test_event = event_manager.create_event()
+        self.event_id = self.test_event["event_id"]
+        self.test_ticket_type = event_manager.create_ticket_type(self.event_id)
+
+    def configure_room(self, api_client, token_manager, rate: int) -> Dict[str, Any]:
+        response = api_client.put(
+            f"/api/waiting-room/{self.event_id}",
+            headers={
+                **token_manager.get_auth_header("organizer"),
+                "Content-Type": "application/json"
+            },
+            json_data={"admission_rate_per_minute": rate}
+        )
+        return response.json()
+
+    def join_queue(self, api_client, token_manager) -> Dict[str, Any]:
+        response = api_client.post(
+            f"/api/waiting-room/{self.event_id}/join",
+            headers=token_manager.get_auth_header("customer")
+        )
+        return response.json()
+
+    def test_queue_blocks_cart_until_admitted(self, api_client, token_manager):
+        """Test cart access needs an admitted queue token while the room is open"""
+        # One admission per minute: the first position is only let in after a minute
+        room = self.configure_room(api_client, token_manager, rate=1)
+        assert room["admission_rate_per_minute"] == 1
+
+        add_url = f"/api/cart/items?ticket_type_id={self.test_ticket_type['type_id']}&quantity=1"
+        api_client.post(add_url, headers=token_manager.get_auth_header("customer"), expected_status=403)
+
+        ticket = self.join_queue(api_client, token_manager)
+        assert ticket["position"] >= 1
+        assert ticket["admitted"] is False
+        assert ticket["queue_token"]
+
+        status = api_client.get(
+            f"/api/waiting-room/{self.event_id}/status",
+            headers={"X-Queue-Token": ticket["queue_token"]}
+        ).json()
+        assert status["position"] == ticket["position"]
+        assert status["people_ahead"] >= 1
+
+        response = api_client.post(
+            add_url,
+            headers={**token_manager.get_auth_header("customer"), "X-Queue-Token": ticket["queue_token"]},
+            expected_status=429
+        )
+        assert "Retry-After" in response.headers
+
+        metrics = api_client.get(f"/api/waiting-room/{self.event_id}/metrics").json()
+        assert metrics["queue_depth"] >= 1
+        assert metrics["rejected_requests"] >= 2
+
+        # Removing the room lets everyone through again
+        api_client.delete(f"/api/waiting-room/{self.event_id}", headers=token_manager.get_auth_header("organizer"))
+        api_client.post(add_url, headers=token_manager.get_auth_header("customer"))
+
+        print(f"✓ Position {ticket['position']} held back until admitted")
+
+    def test_admitted_token_reaches_cart_and_checkout(self, api_client, token_manager):
+        """Test an admitted queue token is accepted by add-to-cart and checkout"""
+        self.configure_room(api_client, token_manager, rate=60000)
+
+        ticket = self.join_queue(api_client, token_manager)
+        headers = {**token_manager.get_auth_header("customer"), "X-Queue-Token": ticket["queue_token"]}
+
+        api_client.post(
+            f"/api/cart/items?ticket_type_id={self.test_ticket_type['type_id']}&quantity=1",
+            headers=headers
+        )
+        assert api_client.post("/api/cart/checkout", headers=headers).json() is True
+
+        metrics = api_client.get(f"/api/waiting-room/{self.event_id}/metrics").json()
+        assert metrics["admitted_requests"] >= 2
+
+        print(f"✓ Admitted position {ticket['position']} checked out")
+
+    def test_admitted_token_is_short_lived_and_bound_to_user(self, api_client, token_manager):
+        """Test an admitted queue token expires minutes after admission and only works for its user"""
+        self.configure_room(api_client, token_manager, rate=60000)
+        ticket = self.join_queue(api_client, token_manager)
+        assert ticket["admitted"] is True
+
+        status = api_client.get(
+            f"/api/waiting-room/{self.event_id}/status",
+            headers={"X-Queue-Token": ticket["queue_token"]}
+        ).json()
+        assert status["queue_token"], "Status should hand out the token to use from now on"
+
+        for token in (ticket["queue_token"], status["queue_token"]):
+            # The payload is the middle part of the JWT, base64url without padding
+            payload_part = token.split(".")[1]
+            payload = json.loads(base64.urlsafe_b64decode(payload_part + "=" * (-len(payload_part) % 4)))
+            assert payload["exp"] - time.time() <= 15 * 60, "An admitted token should expire within minutes"
+
+        response = api_client.post(
+            f"/api/cart/items?ticket_type_id={self.test_ticket_type['type_id']}&quantity=1",
+            headers={**token_manager.get_auth_header("customer2"), "X-Queue-Token": ticket["queue_token"]},
+            expected_status=403
+        )
+        assert "another user" in response.json()["detail"]
+
+        print(f"✓ Admitted token of position {ticket['position']} is short-lived and bound to its user")
+
+
 @pytest.mark.integration
 class TestIntegrationValidation:
     """Test integration scenarios with comprehensive validation"""
@@ -829,6 +1125,31 @@ class TestTicketResale:
         # Restore original customer token
         self.token_manager.tokens["customer"] = self.token_manager.tokens["customer_backup"]
 
+    def test_purchase_resale_ticket_replays_idempotency_key(self, api_client):
+        """Test a retried resale purchase with the same Idempotency-Key returns the original result"""
+        if not self.purchased_ticket:
+            pytest.skip("No ticket available for resale test")
+
+        ticket_id = self.purchased_ticket["ticket_id"]
+        self.ticket_manager.resell_ticket(ticket_id, 150.00)
+
+        headers = {
+            **self.token_manager.get_auth_header("customer2"),
+            "Content-Type": "application/json",
+            "Idempotency-Key": str(uuid.uuid4()),
+        }
+        first = api_client.post("/api/resale/purchase", headers=headers, json_data={"ticket_id": ticket_id})
+        replay = api_client.post("/api/resale/purchase", headers=headers, json_data={"ticket_id": ticket_id})
+
+        assert replay.headers.get("Idempotent-Replayed") == "true"
+        assert replay.json() == first.json()
+
+        # Reusing the key for another request is rejected
+        api_client.post("/api/resale/purchase", headers=headers, json_data={"ticket_id": ticket_id + 1},
+                        expected_status=422)
+
+        print(f"✓ Resale purchase of ticket {ticket_id} replayed from its Idempotency-Key")
+
     def test_cancel_resale_listing(self, ticket_manager):
         """Test canceling a resale listing"""
         if not self.purchased_ticket:
@@ -849,6 +1170,29 @@ class TestTicketResale:
 
         print(f"✓ Canceled resale listing for ticket {ticket_id}")
 
+    def test_marketplace_follows_listing_changes(self, resale_manager):
+        """Test the marketplace reflects listing, repricing and cancelling a ticket"""
+        if not self.purchased_ticket:
+            pytest.skip("No ticket available for resale test")
+
+        ticket_id = self.purchased_ticket["ticket_id"]
+        event_id = self.test_event["event_id"]
+
+        def listed_price():
+            listings = resale_manager.get_marketplace({"event_id": event_id})
+            return next((l["resell_price"] for l in listings if l["ticket_id"] == ticket_id), None)
+
+        self.ticket_manager.resell_ticket(ticket_id, 120.00)
+        assert listed_price() == 120.00
+
+        self.ticket_manager.resell_ticket(ticket_id, 130.00)
+        assert listed_price() == 130.00, "Repricing should update the listing"
+
+        self.ticket_manager.cancel_resell(ticket_id)
+        assert listed_price() is None, "Cancelled ticket should leave the marketplace"
+
+        print(f"✓ Marketplace followed listing, repricing and cancelling of ticket {ticket_id}")
+
     def test_get_my_resale_listings(self, resale_manager):
         """Test getting user's own resale listings"""
         # List a ticket for resale
@@ -896,6 +1240,31 @@ class TestTicketResale:
 
         print("✓ Correctly prevented user from buying their own ticket")
 
+    def test_purchase_resale_ticket_rejects_stale_price(self, api_client, token_manager):
+        """Test buying at a price the seller has since changed is rejected with 409 and keeps the listing"""
+        if not self.purchased_ticket:
+            pytest.skip("No ticket available for resale test")
+
+        ticket_id = self.purchased_ticket["ticket_id"]
+        self.ticket_manager.resell_ticket(ticket_id, 150.00)
+        self.ticket_manager.resell_ticket(ticket_id, 175.00)
+
+        response = api_client.post(
+            "/api/resale/purchase",
+            headers={
+                **token_manager.get_auth_header("customer2"),
+                "Content-Type": "application/json"
+            },
+            json_data={"ticket_id": ticket_id, "expected_price": 150.00},
+            expected_status=409
+        )
+        assert "175" in response.json()["detail"]
+
+        listings = self.ticket_manager.list_tickets({"ticket_id": ticket_id})
+        assert listings[0]["resell_price"] == 175.00, "Rejected purchase must leave the listing untouched"
+
+        print(f"✓ Purchase of ticket {ticket_id} at a stale price was rejected with 409")
+
     def test_resale_with_event_filter(self, resale_manager):
         """Test marketplace filtered by event"""
         # Get marketplace filtered by our test event
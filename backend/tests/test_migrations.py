@@ -0,0 +1,239 @@
+"""
+test_migrations.py - Migration Runner Tests
+-------------------------------------------
+Tests for backend/db_init/init.sh, the runner that applies the numbered migrations once each.
+Every test runs the db-init service of docker-compose against a scratch database created on
+the compose postgres, so the database of the API tests is left alone. Tests that need their
+own migrations mount a temporary directory over /app/sql.
+
+Requires the compose stack (docker compose up); skipped when docker is not available.
+
+Run with: pytest test_migrations.py -v
+"""
+
+import shutil
+import subprocess
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+MIGRATIONS_DIR = PROJECT_ROOT / "backend" / "db_init" / "sql"
+
+# PRE_RUNNER_VERSION of init.sh, the last migration the previous init.sh ran on every deploy
+PRE_RUNNER_VERSION = 18
+
+PERFORMANCE_INDEXES = [
+    "idx_tickets_type_id", "idx_tickets_owner_id", "idx_tickets_on_resale",
+    "idx_ticket_types_event_id", "idx_events_status",
+]
+
+
+def _compose(*args: str, check: bool = True) -> subprocess.CompletedProcess:
+    """Runs docker compose in the project root"""
+    return subprocess.run(
+        ["docker", "compose", *args], cwd=PROJECT_ROOT, capture_output=True, text=True, check=check, timeout=300
+    )
+
+
+def _psql(database: str, sql: str) -> str:
+    """Runs sql on database in the postgres container and returns the unaligned output"""
+    result = _compose(
+        "exec", "-T", "postgres", "sh", "-c",
+        f'psql -U "$POSTGRES_USER" -d {database} -v ON_ERROR_STOP=1 -tAc "$0"', sql,
+    )
+    return result.stdout.strip()
+
+
+class MigrationRunner:
+    """Runs the db-init service against one scratch database"""
+
+    def __init__(self, database: str):
+        self.database = database
+
+    def run(self, sql_dir: Optional[Path] = None) -> subprocess.CompletedProcess:
+        """Runs init.sh without DB_RESET, on the repo's migrations or on those in sql_dir"""
+        volumes: List[str] = []
+        if sql_dir is not None:
+            after_migrate = sql_dir.parent / "after_migrate.sql"
+            volumes = ["-v", f"{sql_dir}:/app/sql:ro", "-v", f"{after_migrate}:/app/after_migrate.sql:ro"]
+        return _compose(
+            "run", "--rm", "--no-deps", "-T", "-e", f"DB_NAME={self.database}", "-e", "DB_RESET=false",
+            *volumes, "db-init", check=False,
+        )
+
+    def rerun(self, *names: str) -> subprocess.CompletedProcess:
+        """Runs the repo's migrations names once more with psql, bypassing schema_migrations"""
+        files = " ".join(f"-f /app/sql/{name}" for name in names)
+        return _compose(
+            "run", "--rm", "--no-deps", "-T", "-e", f"DB_NAME={self.database}", "--entrypoint", "sh", "db-init", "-c",
+            f'psql -v ON_ERROR_STOP=1 -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" {files}', check=False,
+        )
+
+    def query(self, sql: str) -> str:
+        return _psql(self.database, sql)
+
+    def applied(self) -> Dict[int, str]:
+        """version -> name of the applied migrations"""
+        rows = self.query("SELECT version, name FROM schema_migrations ORDER BY applied_at, version")
+        return {int(version): name for version, name in (row.split("|") for row in rows.splitlines())}
+
+
+@pytest.fixture(scope="session")
+def compose_postgres():
+    """Skips when docker or the compose stack's postgres is not running"""
+    if shutil.which("docker") is None:
+        pytest.skip("docker is not available")
+    if _compose("ps", "--status", "running", "-q", "postgres", check=False).stdout.strip() == "":
+        pytest.skip("The compose postgres is not running")
+
+
+@pytest.fixture
+def runner(compose_postgres):
+    """Runner on a new, empty database, dropped afterwards"""
+    database = f"migrations_test_{uuid.uuid4().hex[:8]}"
+    _psql("postgres", f"CREATE DATABASE {database}")
+    yield MigrationRunner(database)
+    _psql("postgres", f"DROP DATABASE IF EXISTS {database} WITH (FORCE)")
+
+
+@pytest.fixture
+def sql_dir(tmp_path):
+    """Directory of migrations for the runner, next to an after_migrate.sql that does nothing"""
+    (tmp_path / "after_migrate.sql").write_text("SELECT 1;\n")
+    (tmp_path / "sql").mkdir()
+    return tmp_path / "sql"
+
+
+@pytest.mark.migrations
+class TestMigrationRunner:
+    """Test applying the numbered migrations"""
+
+    def test_all_migrations_then_nothing(self, runner):
+        """Test that a first run applies every migration and a second run applies none"""
+        first = runner.run()
+        assert first.returncode == 0, first.stderr
+        migrations = sorted(p.name for p in MIGRATIONS_DIR.glob("*.sql"))
+        assert sorted(runner.applied().values()) == migrations
+        for name in migrations:
+            assert f"Applying migration {name}" in first.stdout
+
+        second = runner.run()
+        assert second.returncode == 0, second.stderr
+        assert "Applying migration" not in second.stdout, "A second run should apply nothing"
+        assert sorted(runner.applied().values()) == migrations
+
+    def test_performance_indexes_are_valid(self, runner):
+        """Test that after 19_performance_indexes.sql all its indexes exist and are valid"""
+        result = runner.run()
+        assert result.returncode == 0, result.stderr
+
+        names = ", ".join(f"'{name}'" for name in PERFORMANCE_INDEXES)
+        rows = runner.query(
+            "SELECT index_class.relname, pg_index.indisvalid FROM pg_index "
+            "JOIN pg_class AS index_class ON index_class.oid = pg_index.indexrelid "
+            f"WHERE index_class.relname IN ({names}) ORDER BY 1"
+        )
+        assert rows.splitlines() == [f"{name}|t" for name in sorted(PERFORMANCE_INDEXES)]
+
+    def test_edited_migration_fails_run(self, runner, sql_dir):
+        """Test that changing an applied migration fails the run and applies nothing after it"""
+        migration = sql_dir / "01_first.sql"
+        migration.write_text("CREATE TABLE migration_test (id INTEGER);\n")
+        result = runner.run(sql_dir)
+        assert result.returncode == 0, result.stderr
+
+        migration.write_text("CREATE TABLE migration_test (id BIGINT);\n")
+        (sql_dir / "02_second.sql").write_text("ALTER TABLE migration_test ADD COLUMN name TEXT;\n")
+        result = runner.run(sql_dir)
+        assert result.returncode != 0, "A changed migration should fail the run"
+        assert "Migration 01_first.sql was changed after it was applied" in result.stdout + result.stderr
+        assert runner.applied() == {1: "01_first.sql"}
+
+    def test_no_transaction_migration(self, runner, sql_dir):
+        """Test that a no-transaction migration runs outside a transaction, and others inside one"""
+        (sql_dir / "01_table.sql").write_text("CREATE TABLE migration_test (id INTEGER);\n")
+        (sql_dir / "02_concurrent_index.sql").write_text(
+            "-- migrate:no-transaction\n"
+            "CREATE INDEX CONCURRENTLY idx_migration_test_id ON migration_test (id);\n"
+        )
+        result = runner.run(sql_dir)
+        assert result.returncode == 0, result.stderr
+        valid = runner.query("SELECT indisvalid FROM pg_index WHERE indexrelid = 'idx_migration_test_id'::regclass")
+        assert valid == "t"
+
+        (sql_dir / "03_transactional_index.sql").write_text(
+            "CREATE INDEX CONCURRENTLY idx_migration_test_id_2 ON migration_test (id);\n"
+        )
+        result = runner.run(sql_dir)
+        assert result.returncode != 0
+        assert "cannot run inside a transaction block" in result.stdout + result.stderr
+        assert 3 not in runner.applied()
+
+    def test_migrations_run_in_numeric_order(self, runner, sql_dir):
+        """Test that 100_x.sql runs after 99_x.sql, not before as by name"""
+        (sql_dir / "99_create.sql").write_text("CREATE TABLE migration_test (id INTEGER);\n")
+        (sql_dir / "100_alter.sql").write_text("ALTER TABLE migration_test ADD COLUMN name TEXT;\n")
+        result = runner.run(sql_dir)
+        assert result.returncode == 0, result.stderr
+        assert list(runner.applied()) == [99, 100]
+
+    def test_pre_runner_database_is_adopted(self, runner):
+        """Test that a database set up before schema_migrations gets its migrations recorded, not re-run"""
+        migrations = sorted(p.name for p in MIGRATIONS_DIR.glob("*.sql"))
+        pre_runner = [name for name in migrations if int(name.split("_")[0]) <= PRE_RUNNER_VERSION]
+        # Set up the way the previous init.sh did, by running every script it knew about
+        setup = runner.rerun(*sorted(pre_runner, key=lambda name: int(name.split("_")[0])))
+        assert setup.returncode == 0, setup.stderr
+        assert runner.query("SELECT to_regclass('schema_migrations') IS NULL") == "t"
+
+        result = runner.run()
+        assert result.returncode == 0, result.stderr
+        assert f"recording migrations up to {PRE_RUNNER_VERSION} as applied" in result.stdout
+        for name in pre_runner:
+            assert f"Applying migration {name}" not in result.stdout, f"{name} should not run again"
+        for name in set(migrations) - set(pre_runner):
+            assert f"Applying migration {name}" in result.stdout
+        assert sorted(runner.applied().values()) == migrations
+
+        second = runner.run()
+        assert second.returncode == 0, second.stderr
+        assert "recording migrations" not in second.stdout, "Only the first run should adopt the database"
+        assert "Applying migration" not in second.stdout
+
+    def test_inventory_backfills_leave_shards_alone(self, runner):
+        """Test that re-running 04 and 06 after a sharded sale keeps the ticket_types counters"""
+        result = runner.run()
+        assert result.returncode == 0, result.stderr
+
+        # One unit sold and two held on ticket_types before the switch to shards, then three sold
+        # and one held on the shards; totals are ticket_types + SUM(shards)
+        type_id = runner.query(
+            "WITH location AS ("
+            "    INSERT INTO locations (name, address, city, country)"
+            "    VALUES ('Shard hall', '1 Test Street', 'Warsaw', 'Poland') RETURNING location_id"
+            "), event AS ("
+            "    INSERT INTO events (organizer_id, location_id, name, start_date, end_date)"
+            "    SELECT 1, location_id, 'Sharded sale', '2030-01-01 18:00', '2030-01-01 22:00' FROM location"
+            "    RETURNING event_id"
+            ") "
+            "INSERT INTO ticket_types (event_id, max_count, price, available_from, inventory_shards, sold_count,"
+            "                          reserved_count) "
+            "SELECT event_id, 10, 50, '2029-01-01', 2, 1, 2 FROM event RETURNING type_id"
+        ).splitlines()[0]
+        runner.query(
+            "INSERT INTO ticket_type_shards (type_id, shard_no, capacity, sold_count, reserved_count) "
+            f"VALUES ({type_id}, 0, 4, 2, 1), ({type_id}, 1, 3, 1, 0); "
+            f"INSERT INTO tickets (type_id, owner_id) SELECT {type_id}, 1 FROM generate_series(1, 4); "
+            "INSERT INTO shopping_carts (customer_id) VALUES (-101), (-102); "
+            "INSERT INTO cart_items (cart_id, ticket_type_id, quantity, held_quantity, hold_shard) "
+            f"SELECT cart_id, {type_id}, 2, 2, NULL FROM shopping_carts WHERE customer_id = -101 "
+            f"UNION ALL SELECT cart_id, {type_id}, 1, 1, 0 FROM shopping_carts WHERE customer_id = -102"
+        )
+
+        result = runner.rerun("04_inventory.sql", "06_inventory_holds.sql")
+        assert result.returncode == 0, result.stderr
+        counters = runner.query(f"SELECT sold_count, reserved_count FROM ticket_types WHERE type_id = {type_id}")
+        assert counters == "1|2", "The backfills should not count units sold or held on shards twice"
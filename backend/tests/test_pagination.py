@@ -13,7 +13,7 @@ from typing import List, Dict, Any
 
 from helper import (
     APIClient, TokenManager, TestDataGenerator, UserManager, EventManager,
-    CartManager, TicketManager, ResaleManager, print_test_config
+    CartManager, TicketManager, ResaleManager, prepare_test_data
 )
 
 
@@ -65,119 +65,6 @@ def resale_manager(api_client, token_manager):
     return ResaleManager(api_client, token_manager)
 
 
-def prepare_test_data(user_manager, event_manager, cart_manager, ticket_manager):
-    """Prepare comprehensive test data for pagination tests"""
-    print_test_config()
-
-    # Create users
-    customer_data = user_manager.register_and_login_customer()
-    customer2_data = user_manager.register_and_login_customer2()
-    organizer_data = user_manager.register_and_login_organizer()
-    admin_data = user_manager.register_and_login_admin()
-
-    # Create multiple events with different characteristics
-    events = []
-    ticket_types = []
-
-    # Event 1: Music concert in the future
-    event1_data = {
-        "organizer_id": 1,
-        "name": "Rock Concert 2025",
-        "description": "An amazing rock concert with live music",
-        "start_date": (datetime.now() + timedelta(days=30)).isoformat(),
-        "end_date": (datetime.now() + timedelta(days=30, hours=3)).isoformat(),
-        "minimum_age": 18,
-        "location_id": 1,
-        "category": ["Music", "Rock", "Live"],  # This will be converted to categories
-        "total_tickets": 100,
-        "standard_ticket_price": 50.0,
-        "ticket_sales_start": datetime.now().isoformat(),
-    }
-    event1 = event_manager.create_event(1, event1_data)
-    events.append(event1)
-
-    # Event 2: Theater show
-    event2_data = {
-        "organizer_id": 1,
-        "name": "Shakespeare Theater",
-        "description": "Classic theater performance of Hamlet",
-        "start_date": (datetime.now() + timedelta(days=45)).isoformat(),
-        "end_date": (datetime.now() + timedelta(days=45, hours=2)).isoformat(),
-        "minimum_age": 12,
-        "location_id": 1,
-        "category": ["Theater", "Classic", "Drama"],
-        "total_tickets": 200,
-        "standard_ticket_price": 75.0,
-        "ticket_sales_start": datetime.now().isoformat(),
-    }
-    event2 = event_manager.create_event(1, event2_data)
-    events.append(event2)
-
-    # Event 3: Sports event
-    event3_data = {
-        "organizer_id": 1,
-        "name": "Football Championship",
-        "description": "Championship football match",
-        "start_date": (datetime.now() + timedelta(days=60)).isoformat(),
-        "end_date": (datetime.now() + timedelta(days=60, hours=2)).isoformat(),
-        "minimum_age": 0,
-        "location_id": 1,
-        "category": ["Sports", "Football", "Championship"],
-        "total_tickets": 500,
-        "standard_ticket_price": 100.0,
-        "ticket_sales_start": datetime.now().isoformat(),
-    }
-    event3 = event_manager.create_event(1, event3_data)
-    events.append(event3)
-
-    # Create additional ticket types with different prices
-    for i, event in enumerate(events):
-        # VIP ticket
-        vip_ticket = {
-            "event_id": event["event_id"],
-            "description": f"VIP Access - Event {i + 1}",
-            "max_count": 20,
-            "price": 150.0 + (i * 50),  # 150, 200, 250
-            "currency": "PLN",
-            "available_from": datetime.now().isoformat()
-        }
-        vip_type = event_manager.create_ticket_type(event["event_id"], vip_ticket)
-        ticket_types.append(vip_type)
-
-    # Purchase some tickets and list them for resale
-    purchased_tickets = []
-    # Get all ticket types for the events
-    all_ticket_types = event_manager.get_ticket_types()
-    available_types = [tt for tt in all_ticket_types if tt.get("type_id")]
-
-    for i, ticket_type in enumerate(available_types[:3]):  # Purchase from first 3 ticket types
-        try:
-            cart_manager.add_item_to_cart(ticket_type["type_id"], 1)
-            cart_manager.checkout()
-
-            # Get purchased tickets
-            tickets = ticket_manager.list_tickets()
-            if tickets:
-                ticket = tickets[-1]  # Get the most recently purchased ticket
-                purchased_tickets.append(ticket)
-
-                # List some tickets for resale at different prices
-                resale_price = ticket_type["price"] * (1.2 + i * 0.1)  # 20%, 30%, 40% markup
-                ticket_manager.resell_ticket(ticket["ticket_id"], resale_price)
-        except Exception as e:
-            print(f"Warning: Could not purchase/resell ticket type {ticket_type.get('type_id')}: {e}")
-
-    return {
-        "customer": customer_data,
-        "customer2": customer2_data,
-        "organizer": organizer_data,
-        "admin": admin_data,
-        "events": events,
-        "ticket_types": ticket_types,
-        "purchased_tickets": purchased_tickets
-    }
-
-
 @pytest.mark.pagination
 class TestEventsPagination:
     """Test events endpoint pagination and filtering"""
@@ -473,6 +360,89 @@ class TestResalePagination:
             assert 50 <= listing["resell_price"] <= 300, "All listings should be in price range"
 
 
+@pytest.mark.pagination
+class TestCursorPagination:
+    """Test cursor (after=) pagination of the list endpoints"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_manager, event_manager, cart_manager, ticket_manager):
+        """Setup test data, with enough events for a few dozen pages"""
+        self.test_data = prepare_test_data(user_manager, event_manager, cart_manager,
+                                           ticket_manager)
+        for _ in range(40):
+            event_manager.create_event()
+        self.api_client = APIClient()
+
+    def walk(self, url: str, limit: int) -> List[tuple]:
+        """Follow X-Next-Cursor from the first page to the last, returning (page, seconds) pairs"""
+        import time
+
+        pages = []
+        cursor = None
+        while True:
+            page_url = f"{url}&limit={limit}" + (f"&after={cursor}" if cursor else "")
+            start_time = time.perf_counter()
+            response = self.api_client.get(page_url)
+            pages.append((response.json(), time.perf_counter() - start_time))
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return pages
+
+    def test_events_cursor_walk_matches_offset_pages(self):
+        """Test that walking every sort order by cursor returns each event exactly once, in order"""
+        for sort_by in ["start_date", "name", "creation_date"]:
+            for sort_order in ["asc", "desc"]:
+                url = f"/api/events?sort_by={sort_by}&sort_order={sort_order}"
+                by_cursor = [e["event_id"] for page, _ in self.walk(url, 7) for e in page]
+                by_offset = []
+                page = 1
+                while True:
+                    events = self.api_client.get(f"{url}&limit=7&page={page}").json()
+                    by_offset.extend(e["event_id"] for e in events)
+                    if len(events) < 7:
+                        break
+                    page += 1
+
+                assert len(by_cursor) == len(set(by_cursor)), f"Duplicates in {sort_by} {sort_order}"
+                assert by_cursor == by_offset, f"Cursor and offset pages differ for {sort_by} {sort_order}"
+        print("✓ Cursor pages match offset pages for every sort order")
+
+    def test_deep_cursor_page_latency_stays_flat(self):
+        """Test that the last cursor pages are about as fast as the first ones"""
+        import statistics
+
+        pages = self.walk("/api/events?sort_by=start_date&sort_order=asc", 5)
+        assert len(pages) >= 10, "Need at least 10 pages to compare shallow and deep pages"
+
+        # Skip the very first request, it also pays for connection setup
+        shallow = statistics.median(seconds for _, seconds in pages[1:4])
+        deep = statistics.median(seconds for _, seconds in pages[-3:])
+        print(f"Shallow pages: {shallow * 1000:.1f}ms, deep pages: {deep * 1000:.1f}ms ({len(pages)} pages)")
+        assert deep <= shallow * 3 + 0.05, "Deep cursor pages should not get slower with depth"
+        print("✓ Deep cursor page latency stays flat")
+
+    def test_resale_marketplace_cursor_walk(self):
+        """Test cursor pagination of the resale marketplace"""
+        pages = self.walk("/api/resale/marketplace?sort_by=resell_price&sort_order=desc", 1)
+        ticket_ids = [listing["ticket_id"] for page, _ in pages for listing in page]
+        prices = [listing["resell_price"] for page, _ in pages for listing in page]
+
+        assert len(ticket_ids) == len(set(ticket_ids)), "No listing should appear twice"
+        assert prices == sorted(prices, reverse=True), "Listings should stay sorted across pages"
+        print("✓ Resale marketplace cursor pages are complete and sorted")
+
+    def test_invalid_cursor(self):
+        """Test that malformed cursors and cursors from another sort order are rejected"""
+        self.api_client.get("/api/events?after=not-a-cursor", expected_status=400)
+        self.api_client.get("/api/resale/marketplace?after=not-a-cursor", expected_status=400)
+
+        response = self.api_client.get("/api/events?sort_by=name&limit=1")
+        cursor = response.headers.get("X-Next-Cursor")
+        assert cursor, "A full page should come with a next cursor"
+        self.api_client.get(f"/api/events?sort_by=start_date&limit=1&after={cursor}", expected_status=400)
+        print("✓ Invalid cursors are rejected")
+
+
 @pytest.mark.pagination
 class TestPaginationEdgeCases:
     """Test edge cases and error handling for pagination"""
@@ -7,6 +7,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+from app.utils.db_pool import engine_options
+
 # Load .env file for local development.
 # In AWS Fargate, environment variables will be set directly.
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
@@ -18,6 +20,9 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD_SECRET_ARN = os.getenv("DB_PASSWORD_SECRET_ARN")
 AWS_REGION = os.getenv("AWS_REGION")
 DB_PASSWORD = os.getenv("DB_PASSWORD", None)
+# Reader endpoint of the cluster for read-only endpoints (see app/utils/read_routing.py); same
+# port, database and credentials as DB_URL. Unset, every query goes to DB_URL.
+DB_READ_URL = os.getenv("DB_READ_URL")
 
 # Try to get password from Secrets Manager if running in AWS
 if DB_PASSWORD_SECRET_ARN and DB_URL and DB_URL != "localhost":
@@ -79,11 +84,22 @@ DATABASE_URL = (
 
 print(f"Auth Service: Connecting to database URL: postgresql://{DB_USER}:****@{DB_URL}:{DB_PORT}/{DB_NAME}")
 
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+# SQLAlchemy setup, pool settings come from the DB_POOL_* variables (see app/utils/db_pool.py)
+engine = create_engine(DATABASE_URL, **engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base() # Even if not used for create_all, it's standard to have.
 
+# Engine on the read replica, behind get_read_db
+if DB_READ_URL:
+    print(f"Auth Service: Reading from replica: postgresql://{DB_USER}:****@{DB_READ_URL}:{DB_PORT}/{DB_NAME}")
+    read_engine = create_engine(
+        f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_READ_URL}:{DB_PORT}/{DB_NAME}", **engine_options(replica=True)
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+
 def get_db():
     db = SessionLocal()
     try:
@@ -14,9 +14,11 @@ from fastapi.security import OAuth2PasswordRequestForm
 from app.repositories.auth_repository import AuthRepository
 from app.schemas.user import UserResponse, OrganizerResponse
 from app.models import User, Customer, Organizer, Administrator
-from fastapi import Depends, APIRouter, HTTPException, BackgroundTasks, status, Query
+from fastapi import Depends, APIRouter, HTTPException, BackgroundTasks, Response, status, Query
 from sqlalchemy import and_, or_
 from app.security import INITIAL_ADMIN_EMAIL
+from app.utils.pagination import NEXT_CURSOR_HEADER, paginate
+from app.utils.read_routing import get_read_db
 
 from app.schemas.auth import (
     Token,
@@ -39,10 +41,11 @@ from app.security import (
     verify_initial_admin_credentials,
 )
 from app.services.email_service import send_account_verification_email
+from app.utils.sync_limiter import SyncLimitedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+router = APIRouter(prefix="/auth", tags=["authentication"], route_class=SyncLimitedRoute)
 
 
 @router.post("/register/customer", status_code=status.HTTP_201_CREATED)
@@ -389,7 +392,7 @@ def verify_organizer(
 
 
 @router.get("/pending-organizers", response_model=List[OrganizerResponse])
-def list_pending_organizers(db: Session = Depends(get_db),
+def list_pending_organizers(db: Session = Depends(get_read_db),
                             admin: User = Depends(get_current_admin)):
     """List all organizers pending verification (admin only)"""
     # Join User and Organizer tables to get all unverified organizers
@@ -516,8 +519,10 @@ def approve_user(user_id: int, db: Session = Depends(get_db),
 
 @router.get("/users", response_model=List[OrganizerResponse])
 def list_users(
+        response: Response,
         page: int = Query(1, ge=1, description="Page number"),
         limit: int = Query(50, ge=1, le=100, description="Items per page"),
+        after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
         search: Optional[str] = Query(None,
                                       description="Search by email, login, first_name, or last_name"),
         user_type: Optional[str] = Query(None,
@@ -527,7 +532,7 @@ def list_users(
                                             description="Filter by verification status (organizers only)"),
         sort_by: str = Query("creation_date", description="Sort field"),
         sort_order: str = Query("desc", description="Sort order (asc/desc)"),
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         admin: User = Depends(get_current_admin)
 ):
     query = db.query(User).outerjoin(Organizer, User.user_id == Organizer.user_id)
@@ -565,13 +570,12 @@ def list_users(
     if sort_by not in ["creation_date", "email", "first_name", "last_name", "user_type"]:
         sort_by = "creation_date"
 
-    if sort_order.lower() == "asc":
-        query = query.order_by(getattr(User, sort_by).asc())
-    else:
-        query = query.order_by(getattr(User, sort_by).desc())
+    sort_order = "asc" if sort_order.lower() == "asc" else "desc"
 
-    offset = (page - 1) * limit
-    users = query.offset(offset).limit(limit).all()
+    # user_id breaks ties between equal sort keys
+    users, next_cursor = paginate(query, getattr(User, sort_by), User.user_id, sort_by, sort_order, page, limit, after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     result = []
     for user in users:
@@ -607,7 +611,7 @@ def list_users(
 
 @router.get("/users/stats")
 def get_user_stats(
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         admin: User = Depends(get_current_admin)
 ):
     total_users = db.query(User).count()
@@ -640,7 +644,7 @@ def get_user_stats(
 @router.get("/users/{user_id}", response_model=OrganizerResponse)
 def get_user_details(
         user_id: int,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         admin: User = Depends(get_current_admin)
 ):
     user = db.query(User).filter(User.user_id == user_id).first()
@@ -6,8 +6,9 @@ from app.security import get_current_user
 from sqlalchemy.exc import IntegrityError
 from app.schemas.user import UserResponse, UserProfileUpdate, OrganizerResponse
 from fastapi import Depends, APIRouter, HTTPException, status
+from app.utils.sync_limiter import SyncLimitedRoute
 
-router = APIRouter(prefix="/user", tags=["user"])
+router = APIRouter(prefix="/user", tags=["user"], route_class=SyncLimitedRoute)
 
 
 @router.get("/me", response_model=Union[OrganizerResponse, UserResponse])
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+# Connection pool settings and usage of this process
+class PoolStats(BaseModel):
+    mode: str  # queue, or pgbouncer when PgBouncer does the pooling
+    pool_size: int
+    max_overflow: int
+    timeout_seconds: float
+    recycle_seconds: int
+    pre_ping: bool
+
+    # Current state, not tracked in pgbouncer mode
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    waiting: int  # Requests waiting for a connection right now
+
+    # Since the process started
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+
+    checkouts_last_minute: int
+    wait_seconds_avg_last_minute: float
+    wait_seconds_max_last_minute: float
+
+
+# Found by the event loop monitor's watchdog (debug mode)
+class BlockedLoop(BaseModel):
+    at: datetime
+    route: Optional[str] = None  # METHOD path of the request running on the loop, None for background tasks
+    blocked_seconds: float  # Loop lag the block caused, to within block_threshold_seconds / 2
+    stack: str  # Stack of the loop thread once blocked for block_threshold_seconds
+
+
+# Event loop lag of this process: how late a task scheduled on the loop gets to run
+class EventLoopMetrics(BaseModel):
+    enabled: bool
+    debug: bool
+    interval_seconds: float
+    block_threshold_seconds: float
+
+    lag_seconds: float  # Last sample
+    lag_seconds_max: float
+
+    # Since the process started
+    samples: int
+    stalls: int  # Samples over block_threshold_seconds
+
+    lag_seconds_avg_last_minute: float
+    lag_seconds_max_last_minute: float
+    stalls_last_minute: int
+
+    recent_blocks: List[BlockedLoop] = []
+
+
+# Admission of requests to def endpoints, see sync_limiter
+class SyncLimiterStats(BaseModel):
+    concurrency: int
+    queue_size: int
+    queue_timeout_seconds: float
+
+    running: int  # Requests holding a slot right now
+    waiting: int  # Requests queued for a slot right now
+
+    # Since the process started
+    admitted: int
+    rejected_queue_full: int  # 503 because the queue was full
+    rejected_timeout: int  # 503 after waiting queue_timeout_seconds
+    queue_seconds_total: float
+
+    admitted_last_minute: int
+    rejected_last_minute: int
+    queue_seconds_avg_last_minute: float
+    queue_seconds_max_last_minute: float
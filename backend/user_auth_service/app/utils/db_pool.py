@@ -0,0 +1,168 @@
+"""
+Connection pool of the service's SQLAlchemy engine.
+
+Settings come from the environment:
+- DB_POOL_SIZE (5): connections kept open
+- DB_MAX_OVERFLOW (10): extra connections opened under load, closed again when returned
+- DB_POOL_TIMEOUT_SECONDS (30): how long a request waits for a free connection before failing
+- DB_POOL_RECYCLE_SECONDS (1800): connections older than this are replaced on checkout, before
+  the database or a load balancer drops them as idle
+- DB_POOL_PRE_PING (true): test a connection on checkout and replace it if it was dropped,
+  e.g. after an Aurora failover, instead of failing the request
+- DB_PGBOUNCER (false): connect through PgBouncer in transaction pooling mode. PgBouncer does
+  the pooling, so the engine opens a connection per checkout and closes it when the session
+  ends (NullPool); the size, overflow, recycle and pre-ping settings do not apply. The service
+  keeps no session state between transactions, as that mode requires.
+
+Every process has its own pool: processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below
+the database's max_connections, or PgBouncer's max_client_conn. With a read replica
+(DB_READ_URL, see app/utils/read_routing.py) a second engine with the same settings connects
+to the reader endpoint, whose max_connections is counted separately.
+
+Time spent getting a connection is recorded, so pool_stats() shows saturation (requests
+waiting, slow checkouts, timeouts) before it turns into 500s.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, List
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.schemas.metrics import PoolStats
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+STATS_WINDOW_SECONDS = 60
+
+
+class _CheckoutStats:
+    """Connection checkouts of this process, in total and per second over the last minute"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        # [second, checkouts, total wait, max wait] for each second of the window
+        self._buckets: List[List[float]] = [[0, 0, 0.0, 0.0] for _ in range(STATS_WINDOW_SECONDS)]
+
+    def start(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def finish(self, waited: float, timed_out: bool) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            bucket = self._buckets[second % STATS_WINDOW_SECONDS]
+            if bucket[0] != second:
+                bucket[:] = [second, 0, 0.0, 0.0]
+            bucket[1] += 1
+            bucket[2] += waited
+            bucket[3] = max(bucket[3], waited)
+
+    def window(self) -> Dict[str, float]:
+        oldest = int(time.monotonic()) - STATS_WINDOW_SECONDS
+        with self._lock:
+            recent = [bucket for bucket in self._buckets if bucket[0] > oldest]
+            count = sum(bucket[1] for bucket in recent)
+            return {
+                "checkouts_last_minute": int(count),
+                "wait_seconds_avg_last_minute": sum(bucket[2] for bucket in recent) / count if count else 0.0,
+                "wait_seconds_max_last_minute": max((bucket[3] for bucket in recent), default=0.0),
+            }
+
+
+_stats = _CheckoutStats()
+_read_stats = _CheckoutStats()
+
+
+class _TimedCheckout:
+    """Records how long getting a connection from the pool took"""
+
+    _checkout_stats = _stats
+
+    def _do_get(self):
+        stats = self._checkout_stats
+        stats.start()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            stats.finish(time.perf_counter() - started, timed_out=True)
+            raise
+        except BaseException:
+            stats.finish(time.perf_counter() - started, timed_out=False)
+            raise
+        stats.finish(time.perf_counter() - started, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+class InstrumentedReadQueuePool(_TimedCheckout, QueuePool):
+    _checkout_stats = _read_stats
+
+
+class InstrumentedReadNullPool(_TimedCheckout, NullPool):
+    _checkout_stats = _read_stats
+
+
+def engine_options(replica: bool = False) -> Dict[str, Any]:
+    """Keyword arguments for create_engine; replica for the read replica's engine"""
+    if DB_PGBOUNCER:
+        return {"poolclass": InstrumentedReadNullPool if replica else InstrumentedNullPool}
+    return {
+        "poolclass": InstrumentedReadQueuePool if replica else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def pool_stats(engine: Engine) -> PoolStats:
+    pool = engine.pool
+    stats = getattr(pool, "_checkout_stats", _stats)
+    if isinstance(pool, QueuePool):
+        checked_out, checked_in, overflow = pool.checkedout(), pool.checkedin(), max(0, pool.overflow())
+    else:
+        checked_out, checked_in, overflow = None, None, None
+    return PoolStats(
+        mode="pgbouncer" if DB_PGBOUNCER else "queue",
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        timeout_seconds=DB_POOL_TIMEOUT_SECONDS,
+        recycle_seconds=DB_POOL_RECYCLE_SECONDS,
+        pre_ping=DB_POOL_PRE_PING,
+        checked_out=checked_out,
+        checked_in=checked_in,
+        overflow=overflow,
+        waiting=stats.waiting,
+        checkouts=stats.checkouts,
+        timeouts=stats.timeouts,
+        wait_seconds_total=stats.wait_seconds_total,
+        **stats.window(),
+    )
@@ -0,0 +1,147 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Every page carries an opaque cursor in the X-Next-Cursor response header; passing it back as
+?after=<cursor> returns the rows that follow. The cursor holds the sort key and the primary key
+of the last row of the page, so the next page is an index range scan that starts right after
+it, instead of an OFFSET that reads and throws away every earlier row. The primary key breaks
+ties between rows with the same sort key. page/limit keep working unchanged; a request that
+passes after= ignores page.
+
+The events and auth services are built from their own directories, so each ships a copy of this
+module. Keep the two identical.
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, and_, asc, desc, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+        raise ValueError("Unknown cursor value")
+    return value
+
+
+def encode_cursor(sort_by: str, sort_order: str, key: Any, row_id: int) -> str:
+    """Builds the cursor pointing right after the row with the given sort key and primary key"""
+    payload = json.dumps([sort_by, sort_order, _encode_value(key), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int]:
+    """Returns the (sort key, primary key) a cursor points after, 400 if it is malformed or stale"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_by, cursor_sort_order, key, row_id = json.loads(payload)
+        key = _decode_value(key)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor belongs to a different sort order, restart from the first page"
+        )
+    return key, row_id
+
+
+def _after(column, pk, descending: bool, key: Any, row_id: int):
+    """Rows strictly after (key, row_id) in ORDER BY column, pk (Postgres: NULLs last asc, first desc)"""
+    if descending:
+        if key is None:
+            return or_(column.isnot(None), and_(column.is_(None), pk < row_id))
+        return tuple_(column, pk) < tuple_(key, row_id)
+
+    if key is None:
+        return and_(column.is_(None), pk > row_id)
+    after = tuple_(column, pk) > tuple_(key, row_id)
+    if getattr(column.expression, "nullable", True):
+        return or_(after, column.is_(None))
+    return after
+
+
+def _page_query(query, column, pk, sort_by: str, sort_order: str, page: int, limit: int, after: Optional[str]):
+    """Adds the cursor condition, ordering, offset and limit of one page to a Query or Select"""
+    descending = sort_order == "desc"
+    direction = desc if descending else asc
+
+    if after:
+        key, row_id = decode_cursor(after, sort_by, sort_order)
+        query = query.filter(_after(column, pk, descending, key, row_id))
+    query = query.order_by(direction(column), direction(pk))
+    if not after:
+        query = query.offset((page - 1) * limit)
+
+    # One extra row tells whether there is a next page without a COUNT
+    return query.limit(limit + 1)
+
+
+def _split_page(
+    rows: List[Any], column, pk, sort_by: str, sort_order: str, limit: int
+) -> Tuple[List[Any], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort_by, sort_order, getattr(last, column.key), getattr(last, pk.key))
+
+
+def paginate(
+    query: Query,
+    column,
+    pk,
+    sort_by: str,
+    sort_order: str,
+    page: int,
+    limit: int,
+    after: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Orders the query by (column, pk) in sort_order and returns one page of it together with the
+    cursor of the next page (None on the last page). The page starts after the cursor when one is
+    given and at (page - 1) * limit otherwise.
+    """
+    rows = _page_query(query, column, pk, sort_by, sort_order, page, limit, after).all()
+    return _split_page(rows, column, pk, sort_by, sort_order, limit)
+
+
+async def paginate_async(
+    db: AsyncSession,
+    statement: Select,
+    column,
+    pk,
+    sort_by: str,
+    sort_order: str,
+    page: int,
+    limit: int,
+    after: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """paginate for a select() of one entity, run on an async session"""
+    result = await db.execute(_page_query(statement, column, pk, sort_by, sort_order, page, limit, after))
+    return _split_page(result.scalars().all(), column, pk, sort_by, sort_order, limit)
@@ -0,0 +1,128 @@
+"""
+Read replica routing.
+
+With DB_READ_URL set, read-only endpoints take their session from get_read_db, which is
+connected to the cluster's reader endpoint, while writes keep using get_db on the primary. A
+replica applies the primary's changes with a delay, so right after a write its author could
+read the state from before it. So that users see their own changes at once, every successful
+write request (POST, PUT, PATCH, DELETE) of an authenticated user opens a window of
+DB_STICKY_PRIMARY_SECONDS during which that user's reads stay on the primary.
+
+Windows are kept in the primary_read_windows table (18_primary_read_windows.sql), not in memory
+or a cookie, so they hold across service instances, across both services, and for the web
+client, which calls the API from another origin without cookies. A write request pays one
+upsert before its response is sent. An authenticated read pays one primary key lookup unless
+this process opened the user's window itself. Anonymous reads never touch the primary.
+
+Settings come from the environment:
+- DB_READ_URL (unset): host of the reader endpoint, see app/database.py; unset, all reads use
+  the primary and nothing here has any cost
+- DB_STICKY_PRIMARY_SECONDS (5): how long a user's reads stay on the primary after a write
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Optional
+
+import jwt
+from fastapi import Header
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from app.database import DB_READ_URL, ReadSessionLocal, SessionLocal
+from app.security import ALGORITHM, SECRET_KEY
+
+DB_STICKY_PRIMARY_SECONDS = float(os.getenv("DB_STICKY_PRIMARY_SECONDS", "5"))
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Windows opened by this process are remembered up to this many users
+LOCAL_WINDOWS_MAX = 10000
+
+logger = logging.getLogger(__name__)
+
+_OPEN_WINDOW_SQL = text(
+    "INSERT INTO primary_read_windows (user_id, until) "
+    "VALUES (:user_id, LOCALTIMESTAMP + make_interval(secs => :seconds)) "
+    "ON CONFLICT (user_id) DO UPDATE SET until = EXCLUDED.until"
+)
+_IN_WINDOW_SQL = text(
+    "SELECT EXISTS (SELECT 1 FROM primary_read_windows WHERE user_id = :user_id AND until > LOCALTIMESTAMP)"
+)
+
+# Windows opened by this process: user_id -> time.monotonic() at which it closes
+_local_windows: Dict[int, float] = {}
+
+
+def _user_id(authorization: Optional[str]) -> Optional[int]:
+    """User of a Bearer token; None for anonymous requests and invalid tokens, which write nothing"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.decode(authorization[7:].strip(), SECRET_KEY, algorithms=[ALGORITHM]).get("user_id")
+    except jwt.PyJWTError:
+        return None
+
+
+def _open_window(user_id: int) -> None:
+    now = time.monotonic()
+    if len(_local_windows) >= LOCAL_WINDOWS_MAX:
+        for closed in [user for user, until in list(_local_windows.items()) if until <= now]:
+            _local_windows.pop(closed, None)
+    _local_windows[user_id] = now + DB_STICKY_PRIMARY_SECONDS
+    db = SessionLocal()
+    try:
+        db.execute(_OPEN_WINDOW_SQL, {"user_id": user_id, "seconds": DB_STICKY_PRIMARY_SECONDS})
+        db.commit()
+    except Exception as e:
+        # The write itself is committed, only other instances may serve the user a replica read
+        logger.error(f"Could not open the primary read window of user {user_id}: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def _reads_from_primary(user_id: Optional[int]) -> bool:
+    if user_id is None:
+        return False
+    until = _local_windows.get(user_id)
+    if until is not None and until > time.monotonic():
+        return True
+    db = SessionLocal()
+    try:
+        return db.scalar(_IN_WINDOW_SQL, {"user_id": user_id})
+    finally:
+        db.close()
+
+
+class StickyPrimaryMiddleware:
+    """Opens the user's primary read window when a write request succeeds, before the response goes out"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not DB_READ_URL or scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            return await self.app(scope, receive, send)
+        user_id = _user_id(Headers(scope=scope).get("authorization"))
+        if user_id is None:
+            return await self.app(scope, receive, send)
+
+        async def send_after_opening_window(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await run_in_threadpool(_open_window, user_id)
+            await send(message)
+
+        return await self.app(scope, receive, send_after_opening_window)
+
+
+def get_read_db(authorization: Optional[str] = Header(None)):
+    """Session for read-only endpoints: on the read replica, or on the primary during the user's window"""
+    if DB_READ_URL and not _reads_from_primary(_user_id(authorization)):
+        db = ReadSessionLocal()
+    else:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,12 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import Depends, FastAPI
+from app.database import engine, read_engine
+from app.utils.db_pool import pool_stats
+from app.utils.loop_monitor import LoopMonitorMiddleware, get_event_loop_metrics, run_loop_monitor
+from app.utils.read_routing import StickyPrimaryMiddleware
+from app.utils.sync_limiter import configure_threadpool, get_sync_limiter_stats
 from app.security import get_current_user
+from app.schemas.metrics import EventLoopMetrics, PoolStats, SyncLimiterStats
+from app.utils.pagination import NEXT_CURSOR_HEADER
 from fastapi.middleware.cors import CORSMiddleware
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Size the thread pool and run the event loop monitor for the lifetime of the service"""
+    configure_threadpool()
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(run_loop_monitor(stop))
+    yield
+    stop.set()
+    await monitor
+
+
 app = FastAPI(
     title="Resellio Auth Service",
     description="Authentication microservice for Resellio ticket selling platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -15,7 +38,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(LoopMonitorMiddleware)
+app.add_middleware(StickyPrimaryMiddleware)
 
 api_sub_app = FastAPI()
 
@@ -41,6 +67,30 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/internal/db-pool", response_model=PoolStats)
+def db_pool_stats():
+    """Connection pool usage of this process; not routed by the API gateway"""
+    return pool_stats(engine)
+
+
+@app.get("/internal/db-pool/read", response_model=PoolStats)
+def read_db_pool_stats():
+    """Connection pool usage of the engine on the read replica; the primary's when DB_READ_URL is unset"""
+    return pool_stats(read_engine)
+
+
+@app.get("/internal/event-loop", response_model=EventLoopMetrics)
+def event_loop_metrics():
+    """Event loop lag of this process, and what blocked it in debug mode; not routed by the API gateway"""
+    return get_event_loop_metrics()
+
+
+@app.get("/internal/sync-limiter", response_model=SyncLimiterStats)
+def sync_limiter_stats():
+    """Admission of requests to def endpoints on this process; not routed by the API gateway"""
+    return get_sync_limiter_stats()
+
+
 @app.get("/protected")
 def protected_route(user=Depends(get_current_user)):
     """Test endpoint to verify authentication is working"""
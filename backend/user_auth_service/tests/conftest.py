@@ -0,0 +1,48 @@
+"""
+conftest.py - In-process tests of the auth service
+--------------------------------------------------
+Runs the service app in the test process through httpx's ASGI transport, without a database
+and without the lifespan, to test its request handling and metrics. The settings below are
+read when the app is imported, so they are set first.
+
+Run from backend/user_auth_service with: pytest tests -v
+"""
+
+import os
+import sys
+
+os.environ.update({
+    "DB_URL": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "resellio",
+    "DB_USER": "resellio",
+    "DB_PASSWORD": "resellio",
+    "SECRET_KEY": "in-process-tests-secret-key-of-32-bytes",
+    "DB_POOL_SIZE": "1",
+    "DB_MAX_OVERFLOW": "1",
+    "DB_POOL_TIMEOUT_SECONDS": "0.5",
+    "SYNC_CONCURRENCY": "1",
+    "SYNC_QUEUE_SIZE": "1",
+    "LOOP_MONITOR_DEBUG": "true",
+    "LOOP_MONITOR_INTERVAL_SECONDS": "0.05",
+    "LOOP_BLOCK_THRESHOLD_SECONDS": "0.1",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from main import app  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    """Run async tests on asyncio only"""
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    """HTTP client calling the app in-process"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
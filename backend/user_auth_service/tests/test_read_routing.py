@@ -0,0 +1,163 @@
+"""
+test_read_routing.py - Read Replica Routing Tests
+-------------------------------------------------
+Tests which database read-only endpoints use: the read replica by default, and the primary
+for a user during the window opened by their writes. The sessions are replaced by fakes that
+record which side they are on and keep primary_read_windows in memory.
+
+Run with: pytest tests/test_read_routing.py -v
+"""
+
+import time
+import asyncio
+from typing import Dict, List
+
+import jwt
+import pytest
+from fastapi import APIRouter, Depends, HTTPException
+
+from main import app
+from app.database import ReadSessionLocal, SessionLocal
+from app.security import ALGORITHM, SECRET_KEY
+from app.utils import read_routing
+from app.utils.read_routing import get_read_db
+
+pytestmark = pytest.mark.anyio
+
+router = APIRouter()
+
+
+@router.post("/test/read-routing/write")
+def write(fail: bool = False):
+    if fail:
+        raise HTTPException(status_code=400, detail="Write refused")
+    return {"written": True}
+
+
+@router.get("/test/read-routing/read")
+def read(db=Depends(get_read_db)):
+    return {"session": db.side}
+
+
+app.include_router(router)
+
+
+class FakeDatabase:
+    """primary_read_windows of the primary, and the statements run on it"""
+
+    def __init__(self):
+        self.windows: Dict[int, float] = {}
+        self.statements: List[tuple] = []
+        self.commits = 0
+
+
+class FakeSession:
+    """Session on the primary or the replica of a FakeDatabase"""
+
+    def __init__(self, database: FakeDatabase, side: str):
+        self.database = database
+        self.side = side
+
+    def close(self):
+        pass
+
+    def execute(self, statement, params):
+        assert self.side == "primary", "Windows must be written on the primary"
+        self.database.statements.append((statement, params))
+        self.database.windows[params["user_id"]] = time.monotonic() + params["seconds"]
+
+    def commit(self):
+        self.database.commits += 1
+
+    def scalar(self, statement, params):
+        assert statement is read_routing._IN_WINDOW_SQL
+        return self.database.windows.get(params["user_id"], 0) > time.monotonic()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Fake primary and replica, with a read replica configured"""
+    database = FakeDatabase()
+    monkeypatch.setattr(read_routing, "DB_READ_URL", "replica")
+    monkeypatch.setattr(read_routing, "SessionLocal", lambda: FakeSession(database, "primary"))
+    monkeypatch.setattr(read_routing, "ReadSessionLocal", lambda: FakeSession(database, "replica"))
+    monkeypatch.setattr(read_routing, "_local_windows", {})
+    return database
+
+
+def _auth(user_id: int) -> Dict[str, str]:
+    token = jwt.encode({"user_id": user_id, "role": "customer"}, SECRET_KEY, algorithm=ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _read_side(client, headers=None) -> str:
+    response = await client.get("/test/read-routing/read", headers=headers)
+    assert response.status_code == 200
+    return response.json()["session"]
+
+
+@pytest.mark.read_routing
+class TestReadRouting:
+    """Test the routing of reads between the primary and the read replica"""
+
+    async def test_write_opens_primary_read_window(self, client, database):
+        """Test that an authenticated write upserts the user's row in primary_read_windows"""
+        response = await client.post("/test/read-routing/write", headers=_auth(42))
+        assert response.status_code == 200
+
+        assert len(database.statements) == 1
+        statement, params = database.statements[0]
+        assert statement is read_routing._OPEN_WINDOW_SQL
+        assert params == {"user_id": 42, "seconds": read_routing.DB_STICKY_PRIMARY_SECONDS}
+        assert database.commits == 1
+        assert 42 in read_routing._local_windows
+
+    async def test_read_in_window_uses_primary(self, client, database):
+        """Test that the writer's reads go to the primary, also on instances that did not see the write"""
+        await client.post("/test/read-routing/write", headers=_auth(42))
+        assert await _read_side(client, _auth(42)) == "primary"
+
+        read_routing._local_windows.clear()
+        assert await _read_side(client, _auth(42)) == "primary", \
+            "Another instance should find the window in primary_read_windows"
+
+    async def test_other_reads_use_replica(self, client, database):
+        """Test that anonymous reads and reads of other users go to the replica"""
+        await client.post("/test/read-routing/write", headers=_auth(42))
+        assert await _read_side(client) == "replica"
+        assert await _read_side(client, _auth(7)) == "replica"
+        assert await _read_side(client, {"Authorization": "Bearer invalid"}) == "replica"
+
+    async def test_read_after_window_uses_replica(self, client, database, monkeypatch):
+        """Test that once the window has closed the user's reads go back to the replica"""
+        monkeypatch.setattr(read_routing, "DB_STICKY_PRIMARY_SECONDS", 0.1)
+        await client.post("/test/read-routing/write", headers=_auth(42))
+        assert await _read_side(client, _auth(42)) == "primary"
+
+        await asyncio.sleep(0.2)
+        assert await _read_side(client, _auth(42)) == "replica"
+
+    async def test_only_successful_authenticated_writes_open_window(self, client, database):
+        """Test that anonymous and failed writes open no window"""
+        await client.post("/test/read-routing/write")
+        response = await client.post("/test/read-routing/write?fail=true", headers=_auth(42))
+        assert response.status_code == 400
+
+        assert database.statements == []
+        assert await _read_side(client, _auth(42)) == "replica"
+
+    async def test_without_replica_reads_use_primary(self, client, database, monkeypatch):
+        """Test that with DB_READ_URL unset every read uses the primary and writes open no window"""
+        assert ReadSessionLocal is SessionLocal, \
+            "Without DB_READ_URL the read sessions should be the primary's"
+        monkeypatch.setattr(read_routing, "DB_READ_URL", None)
+
+        def no_replica():
+            raise AssertionError("The replica should not be used without DB_READ_URL")
+
+        monkeypatch.setattr(read_routing, "ReadSessionLocal", no_replica)
+
+        await client.post("/test/read-routing/write", headers=_auth(42))
+        assert database.statements == []
+        assert await _read_side(client) == "primary"
+        assert await _read_side(client, _auth(42)) == "primary"
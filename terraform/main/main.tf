@@ -83,6 +83,7 @@ module "ecs_cluster" {
   ecs_security_group_id  = module.network.ecs_security_group_id
   alb_security_group_id  = module.network.alb_security_group_id
   db_endpoint            = module.db.endpoint
+  db_reader_endpoint     = module.db.reader_endpoint
   db_password_secret_arn = aws_secretsmanager_secret.db_master_password.arn
   admin_secret_key_arn   = aws_secretsmanager_secret.admin_secret_key.arn
   sendgrid_api_key_arn   = aws_secretsmanager_secret.sendgrid_api_key.arn
@@ -95,12 +96,17 @@ module "ecs_cluster" {
   db_name                = var.db_name
 }
 
-# One-off task to initialize the database schema
+# One-off task to initialize the database schema and apply pending migrations. Runs again when a
+# migration is added (the db-init image must be pushed first), without wiping the database.
 resource "null_resource" "db_initializer" {
   triggers = {
     db_endpoint    = module.db.endpoint
     task_def_arn   = module.ecs_cluster.db_init_task_definition_arn
     force_db_reset = var.force_db_reset
+    migrations = sha1(join("", [
+      for f in sort(fileset("${path.module}/../../backend/db_init", "**")) :
+      filesha1("${path.module}/../../backend/db_init/${f}")
+    ]))
   }
 
   depends_on = [
@@ -13,6 +13,11 @@ output "db_endpoint" {
   value       = module.db.endpoint
 }
 
+output "db_reader_endpoint" {
+  description = "Reader endpoint of the Aurora cluster"
+  value       = module.db.reader_endpoint
+}
+
 output "project_name" {
   description = "The project name used for all resources"
   value       = var.project_name
@@ -197,6 +197,7 @@ resource "aws_ecs_task_definition" "auth" {
       ]
       environment = [
         { name = "DB_URL", value = var.db_endpoint },
+        { name = "DB_READ_URL", value = var.db_reader_endpoint },
         { name = "DB_USER", value = var.db_user },
         { name = "DB_NAME", value = var.db_name },
         { name = "DB_PORT", value = tostring(var.db_port) },
@@ -242,6 +243,7 @@ resource "aws_ecs_task_definition" "tickets" {
       ]
       environment = [
         { name = "DB_URL", value = var.db_endpoint },
+        { name = "DB_READ_URL", value = var.db_reader_endpoint },
         { name = "DB_USER", value = var.db_user },
         { name = "DB_NAME", value = var.db_name },
         { name = "DB_PORT", value = tostring(var.db_port) },
@@ -308,6 +310,60 @@ resource "aws_ecs_service" "tickets" {
   depends_on = [aws_lb_listener_rule.tickets]
 }
 
+# The email worker runs the tickets image with a different command and drains the email outbox
+resource "aws_ecs_task_definition" "email_worker" {
+  family                   = "${var.project_name}-email-worker"
+  cpu                      = "256"
+  memory                   = "512"
+  network_mode             = "awsvpc"
+  requires_compatibilities = ["FARGATE"]
+  execution_role_arn       = aws_iam_role.task_exec.arn
+  task_role_arn            = aws_iam_role.task_role.arn
+
+  container_definitions = jsonencode([
+    {
+      name    = "email-worker"
+      image   = var.ticket_image
+      command = ["python", "email_worker.py"]
+      environment = [
+        { name = "DB_URL", value = var.db_endpoint },
+        { name = "DB_USER", value = var.db_user },
+        { name = "DB_NAME", value = var.db_name },
+        { name = "DB_PORT", value = tostring(var.db_port) },
+        { name = "AWS_REGION", value = var.aws_region },
+        { name = "EMAIL_FROM_EMAIL", value = var.email_from_address },
+        { name = "APP_BASE_URL", value = var.app_base_url },
+        { name = "EMAIL_TRANSPORT", value = "sendgrid" }
+      ]
+      secrets = [
+        { name = "DB_PASSWORD", valueFrom = var.db_password_secret_arn },
+        { name = "EMAIL_API_KEY", valueFrom = var.sendgrid_api_key_arn }
+      ]
+      logConfiguration = {
+        logDriver = "awslogs"
+        options = {
+          awslogs-group         = aws_cloudwatch_log_group.lg.name
+          awslogs-region        = var.aws_region
+          awslogs-stream-prefix = "email-worker"
+        }
+      }
+    }
+  ])
+}
+
+resource "aws_ecs_service" "email_worker" {
+  name            = "${var.project_name}-email-worker"
+  cluster         = aws_ecs_cluster.this.id
+  task_definition = aws_ecs_task_definition.email_worker.arn
+  desired_count   = 1
+  launch_type     = "FARGATE"
+
+  network_configuration {
+    subnets         = var.private_subnet_ids
+    security_groups = [var.ecs_security_group_id]
+  }
+}
+
 resource "aws_ecs_task_definition" "db_init" {
   family                   = "${var.project_name}-db-init"
   cpu                      = "256"
@@ -15,6 +15,10 @@ variable "desired_count" {
   default = 2
 }
 variable "db_endpoint" { type = string }
+variable "db_reader_endpoint" {
+  type        = string
+  description = "Reader endpoint of the Aurora cluster, for the services' read-only endpoints"
+}
 variable "db_password_secret_arn" { type = string }
 variable "admin_secret_key_arn" {
   type        = string
@@ -28,3 +28,19 @@ resource "aws_rds_cluster_instance" "writer" {
   auto_minor_version_upgrade = false
   tags                       = { Name = "${var.project_name}-aurora-writer" }
 }
+
+# Read replicas behind the cluster's reader endpoint, used by the services' read-only endpoints.
+# Without any, the reader endpoint resolves to the writer.
+resource "aws_rds_cluster_instance" "reader" {
+  count                      = var.reader_count
+  identifier                 = "${var.project_name}-aurora-reader-${count.index + 1}"
+  cluster_identifier         = aws_rds_cluster.this.id
+  instance_class             = var.instance_class
+  engine                     = aws_rds_cluster.this.engine
+  engine_version             = aws_rds_cluster.this.engine_version
+  publicly_accessible        = false
+  auto_minor_version_upgrade = false
+  tags                       = { Name = "${var.project_name}-aurora-reader-${count.index + 1}" }
+
+  depends_on = [aws_rds_cluster_instance.writer]
+}
@@ -44,3 +44,9 @@ variable "instance_class" {
   type        = string
   default     = "db.t4g.medium"
 }
+
+variable "reader_count" {
+  description = "Number of Aurora read replicas behind the reader endpoint"
+  type        = number
+  default     = 1
+}